@@ -18,7 +18,9 @@ class CIACache(Singleton):
     <taurex.cia.picklecia.PickleCIA at 0x107a60be0>
 
     Pickle ``.db`` and HITRAN ``.cia`` files are supported and automatically
-    loaded. with priority given to ``.db`` files
+    loaded. with priority given to ``.db`` files. HITRAN files are
+    parsed once and then loaded from a binary cache
+    (see :func:`set_cia_cache_dir`)
 
 
 
@@ -26,6 +28,7 @@ class CIACache(Singleton):
     def init(self):
         self.cia_dict = {}
         self._cia_path = None
+        self._cia_cache_dir = None
         self.log = Logger('CIACache')
 
     def set_cia_path(self, cia_path):
@@ -41,6 +44,20 @@ class CIACache(Singleton):
         """
         self._cia_path = cia_path
 
+    def set_cia_cache_dir(self, path):
+        """
+        Sets the directory parsed HITRAN ``.cia`` files are cached in.
+        Defaults to ``cia`` in the user cache directory
+        (``TAUREX_CACHE_DIR`` or ``~/.cache/taurex``)
+
+        Parameters
+        ----------
+        path: str
+            Cache directory
+
+        """
+        self._cia_cache_dir = path
+
     def __getitem__(self, key):
         """
         For a CIA pair, load from the set path and return the
@@ -113,61 +130,109 @@ class CIACache(Singleton):
                 self.cia_dict[cia.pairName] = cia
         self.cia_dict[cia.pairName] = cia
 
-    def load_cia_from_path(self, path, pair_filter=None):
+    def find_cia_files(self, path):
         """
-        Searches path for CIA files, creates and loads them into the cache
-        ``.db`` will be loaded as :class:`~taurex.cia.picklecia.PickleCIA` and
-        ``.cia`` files will be loaded as
-        :class:`~taurex.cia.hitrancia.HitranCIA`
+        Finds CIA files in a path
 
         Parameters
         ----------
         path : str
             Path to search for CIA files
 
-        pair_filter : :obj:`list` of str , optional
-            If provided, the cia will only be loaded
-            if its pairname is in the list. Mostly used by the
-            :func:`__getitem__` for filtering
+        Returns
+        -------
+        :obj:`list` of :obj:`tuple`
+            ``(pairname, filename)`` with ``.db`` files first
 
         """
         from glob import glob
         from pathlib import Path
         import os
-        from taurex.cia import PickleCIA
-
-        # Find .db files
-        glob_path = os.path.join(path, '*.db')
 
-        file_list = glob(glob_path)
-        self.log.debug('Glob list: %s', glob_path)
+        file_list = glob(os.path.join(path, '*.db')) + \
+            glob(os.path.join(path, '*.cia'))
         self.log.debug('File list FOR CIA %s', file_list)
 
-        for files in file_list:
-            pairname = Path(files).stem.split('_')[0]
+        return [(Path(f).stem.split('_')[0], f) for f in file_list]
 
-            self.log.debug('pairname found %s', pairname)
+    def create_cia(self, pairname, filename):
+        """
+        Creates the CIA object for a file
 
-            if pair_filter is not None:
-                if pairname not in pair_filter:
-                    continue
-            op = PickleCIA(files, pairname)
-            self.add_cia(op)
+        """
+        from taurex.cia import PickleCIA, HitranCIA
+        if filename.endswith('.db'):
+            return PickleCIA(filename, pairname)
+        else:
+            return HitranCIA(filename, cache_dir=self._cia_cache_dir)
+
+    def prefetch(self, pairs, num_threads=None):
+        """
+        Loads several CIA pairs concurrently using a thread pool.
+        Pairs already loaded or not found in the search path(s) are
+        skipped. The time and throughput of each file is logged.
 
-        # Find .cia files
-        glob_path = os.path.join(path, '*.cia')
+        Parameters
+        ----------
+        pairs: :obj:`list` of str
+            CIA pairs to load
+
+        num_threads: int, optional
+            Number of threads to use, defaults to one per file up to
+            the number of cores
+
+        """
+        from taurex.cache.prefetch import parallel_load
+
+        if self._cia_path is None:
+            return
+
+        paths = self._cia_path
+        if isinstance(paths, str):
+            paths = [paths]
+
+        to_load = {}
+        for path in paths:
+            for pairname, filename in self.find_cia_files(path):
+                if pairname in pairs and pairname not in to_load \
+                        and pairname not in self.cia_dict:
+                    to_load[pairname] = filename
 
-        file_list = glob(glob_path)
-        self.log.debug('File list %s', file_list)
+        if len(to_load) == 0:
+            return
 
-        for files in file_list:
-            from taurex.cia import HitranCIA
-            pairname = Path(files).stem.split('_')[0]
+        self.log.info('Prefetching cia for %s', list(to_load.keys()))
+        loaded = parallel_load(self.create_cia, list(to_load.items()),
+                               self.log, num_threads=num_threads)
+        for pairname, cia in loaded:
+            self.add_cia(cia)
+
+    def load_cia_from_path(self, path, pair_filter=None):
+        """
+        Searches path for CIA files, creates and loads them into the cache
+        ``.db`` will be loaded as :class:`~taurex.cia.picklecia.PickleCIA` and
+        ``.cia`` files will be loaded as
+        :class:`~taurex.cia.hitrancia.HitranCIA`
+
+        Parameters
+        ----------
+        path : str
+            Path to search for CIA files
+
+        pair_filter : :obj:`list` of str , optional
+            If provided, the cia will only be loaded
+            if its pairname is in the list. Mostly used by the
+            :func:`__getitem__` for filtering
+
+        """
+        for pairname, filename in self.find_cia_files(path):
+
+            self.log.debug('pairname found %s', pairname)
 
             if pair_filter is not None:
                 if pairname not in pair_filter:
                     continue
-            op = HitranCIA(files)
+            op = self.create_cia(pairname, filename)
             self.add_cia(op)
 
     def load_cia(self, cia_xsec=None, cia_path=None, pair_filter=None):
@@ -0,0 +1,210 @@
+"""
+Persistent index of the opacity files in a directory
+"""
+
+from taurex.log import Logger
+from taurex.util.util import file_signature, user_cache_dir
+import hashlib
+import json
+import os
+import pathlib
+
+
+class OpacityManifest(Logger):
+    """
+    Persistent index of the molecular cross-section files in a directory.
+
+    Discovering which molecule a file holds can mean opening it (HDF5)
+    which is slow on networked filesystems. The manifest records, for each
+    file, the molecule, format, grid shape, temperature, pressure and
+    wavenumber ranges together with the file size and modification time.
+    It is stored as ``.taurex_manifest.json`` in the opacity directory (or
+    in the user cache directory if that is not writable) and an entry is
+    only rebuilt when its file changes.
+
+    Parameters
+    ----------
+    path: str
+        Directory containing opacities
+
+    """
+
+    manifest_version = 2
+
+    search_patterns = ['*.ktable.h5', '*.mmap', '*.h5', '*.hdf5', '*.pickle',
+                       '*.dat']
+    """Files to index, earlier patterns take precedence for a molecule"""
+
+    def __init__(self, path):
+        super().__init__('OpacityManifest')
+        self._path = os.path.abspath(path)
+        self._entries = {}
+        self._manifest_file = None
+        self.load()
+
+    @property
+    def path(self):
+        return self._path
+
+    def candidate_files(self):
+        """
+        Locations the manifest may be stored in order of preference
+        """
+        local = os.path.join(self._path, '.taurex_manifest.json')
+        digest = hashlib.sha1(self._path.encode('utf-8')).hexdigest()[:16]
+        fallback = os.path.join(user_cache_dir(),
+                                'manifest_{}.json'.format(digest))
+        return [local, fallback]
+
+    def load(self):
+        """
+        Loads an existing manifest from disk if available
+        """
+        for manifest_file in self.candidate_files():
+            try:
+                with open(manifest_file, 'r') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if data.get('version') != self.manifest_version or \
+                    data.get('path') != self._path:
+                continue
+            self._entries = data.get('entries', {})
+            self._manifest_file = manifest_file
+            self.debug('Loaded manifest %s', manifest_file)
+            return
+
+    def save(self):
+        """
+        Atomically writes the manifest, falling back to the user cache
+        directory if the opacity directory is not writable
+        """
+        data = {'version': self.manifest_version,
+                'path': self._path,
+                'entries': self._entries}
+        for manifest_file in self.candidate_files():
+            tmp_file = '{}.tmp{}'.format(manifest_file, os.getpid())
+            try:
+                with open(tmp_file, 'w') as f:
+                    json.dump(data, f)
+                os.replace(tmp_file, manifest_file)
+            except OSError:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+                continue
+            self._manifest_file = manifest_file
+            self.debug('Saved manifest to %s', manifest_file)
+            return
+        self.warning('Could not write opacity manifest for %s', self._path)
+
+    def file_list(self):
+        from glob import glob
+        files = []
+        seen = set()
+        for pattern in self.search_patterns:
+            for f in sorted(glob(os.path.join(self._path, pattern))):
+                if f not in seen:
+                    seen.add(f)
+                    files.append(f)
+        return files
+
+    def refresh(self):
+        """
+        Checks every file against the manifest, inspecting only new or
+        modified files, and saves the manifest if anything changed.
+
+        Returns
+        -------
+        :obj:`list` of dict
+            Entry for each file in order of precedence
+
+        """
+        changed = False
+        entries = []
+        seen = set()
+        for filename in self.file_list():
+            name = os.path.basename(filename)
+            seen.add(name)
+            signature = file_signature(filename)
+            entry = self._entries.get(name)
+            if entry is None or entry['signature'] != signature:
+                try:
+                    entry = self.inspect_file(filename)
+                except Exception as e:
+                    self.warning('Could not read opacity %s: %s', filename, e)
+                    continue
+                entry['signature'] = signature
+                self._entries[name] = entry
+                changed = True
+            entry = dict(entry)
+            entry['filename'] = filename
+            entries.append(entry)
+
+        for name in list(self._entries.keys()):
+            if name not in seen:
+                del self._entries[name]
+                changed = True
+
+        if changed:
+            self.save()
+        return entries
+
+    def entries(self, file_format=None):
+        """
+        Up to date entries, optionally only those of a particular format
+        """
+        return [e for e in self.refresh()
+                if file_format is None or e['format'] == file_format]
+
+    def molecules(self, file_format=None):
+        return [e['molecule'] for e in self.entries(file_format)]
+
+    @staticmethod
+    def _grid_info(opacity):
+        return OpacityManifest._grids_info(opacity.pressureGrid,
+                                           opacity.temperatureGrid,
+                                           opacity.wavenumberGrid)
+
+    @staticmethod
+    def _grids_info(pressure_grid, temperature_grid, wavenumber_grid):
+        return {'shape': [len(pressure_grid),
+                          len(temperature_grid),
+                          len(wavenumber_grid)],
+                't_range': [float(temperature_grid.min()),
+                            float(temperature_grid.max())],
+                'p_range': [float(pressure_grid.min()),
+                            float(pressure_grid.max())],
+                'wn_range': [float(wavenumber_grid.min()),
+                             float(wavenumber_grid.max())]}
+
+    def inspect_file(self, filename):
+        """
+        Reads the molecule name and grid information from an opacity file.
+        ``.pickle`` and ExoTransmit files are named by their filename and
+        are not opened as that would mean reading the whole file.
+        """
+        stem = pathlib.Path(filename).stem
+        if filename.endswith('.ktable.h5'):
+            from taurex.opacity.ktableopacity import KTableOpacity
+            # Only the header, the k-coefficients are not read
+            entry = {'format': 'ktable',
+                     'molecule': KTableOpacity.read_molecule_name(filename)}
+            entry.update(self._grids_info(*KTableOpacity.read_grids(filename)))
+        elif filename.endswith('.mmap'):
+            from taurex.opacity.mmapopacity import MMapOpacity
+            op = MMapOpacity(filename)
+            entry = {'format': 'mmap', 'molecule': op.moleculeName}
+            entry.update(self._grid_info(op))
+        elif filename.lower().endswith(('.hdf5', '.h5')):
+            from taurex.opacity.hdf5opacity import HDF5Opacity
+            op = HDF5Opacity(filename, in_memory=False)
+            entry = {'format': 'hdf5', 'molecule': op.moleculeName}
+            entry.update(self._grid_info(op))
+            op._spec_dict.close()
+        elif filename.endswith('.pickle'):
+            entry = {'format': 'pickle', 'molecule': stem.split('.')[0]}
+        elif filename.endswith('.dat'):
+            entry = {'format': 'exotransmit', 'molecule': stem[4:]}
+        else:
+            raise ValueError('Unknown opacity format')
+        return entry
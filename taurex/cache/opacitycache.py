@@ -4,6 +4,8 @@ Contains caching class for Molecular cross section files
 
 from .singleton import Singleton
 from taurex.log import Logger
+from collections import OrderedDict
+import numpy as np
 import pathlib
 class OpacityCache(Singleton):
     """
@@ -53,9 +55,31 @@ class OpacityCache(Singleton):
 
     Now TauREx3 will use it instead in all calculations!
 
+    A memory budget can be set with :func:`set_max_bytes`. When the
+    in-memory grids of opacities loaded from the search path exceed it, the
+    least recently used are dropped and transparently reloaded the next
+    time they are requested.
+
+    Opacities on different wavenumber grids can be resampled once at load
+    time onto a common grid with :func:`set_common_grid` so they no longer
+    need interpolating in wavenumber every time the model is run.
+
     """
     def init(self):
-        self.opacity_dict = {}
+        self.opacity_dict = OrderedDict()
+        self.ktable_dict = OrderedDict()
+        self._pressure_tables = {}
+        self._evictable = set()
+        self._max_bytes = None
+        self._manifests = {}
+        self._shared_memory = False
+        self._block_cache_bytes = None
+        self._pressure_tables = {}
+        self._dtype = np.dtype(np.float64)
+        self._shared_windows = {}
+        self._common_grid = None
+        self._common_grid_molecule = None
+        self._resample_cache_dir = None
         self._opacity_path = None
         self.log = Logger('OpacityCache')
         self._default_interpolation = 'linear'
@@ -69,8 +93,10 @@ class OpacityCache(Singleton):
         Opacities in this path must be of supported types:
 
             - HDF5 opacities
+            - ``.mmap`` memory-mapped opacities
             - ``.pickle`` opacities
-            - ExoTransmit opacities.
+            - ExoTransmit opacities
+            - ``.ktable.h5`` correlated-k tables (see :func:`get_ktable`).
 
         Parameters
         ----------
@@ -132,6 +158,404 @@ class OpacityCache(Singleton):
         self._memory_mode = in_memory
         self.clear_cache()
 
+    def set_dtype(self, dtype):
+        """
+        Sets the precision cross-sections are stored in and interpolated
+        with. ``float32`` halves memory use and bandwidth at the cost of
+        accuracy. Optical depths and spectra are still accumulated in
+        double precision. ``.mmap`` files keep the precision they were
+        written with.
+
+        Parameters
+        ----------
+        dtype: str or :obj:`numpy.dtype`
+            ``float64`` (default) or ``float32``
+
+        """
+        dtype = np.dtype(dtype)
+        if dtype not in (np.dtype(np.float32), np.dtype(np.float64)):
+            raise ValueError('Cross-section dtype must be float32 '
+                             'or float64, not {}'.format(dtype))
+        self._dtype = dtype
+        self.log.info('Cross-sections will use %s', dtype)
+        self.clear_cache()
+
+    @property
+    def dtype(self):
+        """
+        Precision cross-sections are stored and interpolated in
+        """
+        return self._dtype
+
+    def _convert_dtype(self, opacity):
+        """
+        Converts an in-memory cross-section grid to the cache dtype
+        """
+        grid = getattr(opacity, '_xsec_grid', None)
+        if type(grid) is np.ndarray and grid.dtype != self._dtype:
+            opacity._xsec_grid = grid.astype(self._dtype)
+
+    def set_common_grid(self, wngrid=None, molecule=None):
+        """
+        Resamples every opacity loaded from the search path onto a single
+        wavenumber grid when it is loaded. Each resampled opacity is
+        written as a ``.mmap`` file to the resampling cache directory
+        (see :func:`set_resample_cache_dir`) and reused until the source
+        file, grid or dtype changes. Wavenumbers outside of a molecule's
+        native grid take the edge value as they would when interpolated
+        during the model.
+
+        Parameters
+        ----------
+        wngrid: :obj:`array`, optional
+            Wavenumber grid in cm-1, e.g. one of fixed resolution
+
+        molecule: str, optional
+            Use the native grid of this molecule instead
+
+        """
+        if wngrid is not None and molecule is not None:
+            raise ValueError('Only one of wngrid or molecule can be given '
+                             'for the common grid')
+        self._common_grid = None if wngrid is None else \
+            np.sort(np.asarray(wngrid, dtype=np.float64))
+        self._common_grid_molecule = molecule
+        if wngrid is not None:
+            self.log.info('Opacities will be resampled onto a grid of '
+                          '%s points', self._common_grid.shape[0])
+        elif molecule is not None:
+            self.log.info('Opacities will be resampled onto the grid '
+                          'of %s', molecule)
+        self.clear_cache()
+
+    def set_resample_cache_dir(self, path):
+        """
+        Sets the directory resampled opacities are cached in.
+        Defaults to ``resampled`` in the user cache directory
+        (``TAUREX_CACHE_DIR`` or ``~/.cache/taurex``)
+
+        Parameters
+        ----------
+        path: str
+            Cache directory
+
+        """
+        self._resample_cache_dir = path
+
+    @property
+    def common_grid(self):
+        """
+        Wavenumber grid opacities are resampled onto at load time
+        or ``None`` if they are left on their native grids
+        """
+        if self._common_grid is None and \
+                self._common_grid_molecule is not None:
+            molecule = self._common_grid_molecule
+            entry = self._find_entry(molecule)
+            if entry is None:
+                self.log.error('Reference molecule %s for common grid '
+                               'not found', molecule)
+                raise KeyError(molecule)
+            op = self._create_native_opacity(entry, in_memory=False)
+            self._common_grid = np.array(op.wavenumberGrid, dtype=np.float64)
+        return self._common_grid
+
+    def _find_entry(self, molecule):
+        if self._opacity_path is None:
+            return None
+        paths = self._opacity_path
+        if isinstance(paths, str):
+            paths = [paths]
+        for path in paths:
+            for entry in self.xsec_entries(path):
+                if entry['molecule'] == molecule:
+                    return entry
+        return None
+
+    def resampled_filename(self, entry, wngrid):
+        """
+        Cache file for an opacity file resampled onto a grid. The name
+        depends on the source file's path, size and modification time,
+        the grid and the dtype so stale files are never reused.
+
+        Parameters
+        ----------
+        entry: dict
+            Entry from :class:`~taurex.cache.manifest.OpacityManifest`
+
+        wngrid: :obj:`array`
+            Wavenumber grid
+
+        """
+        import hashlib
+        import json
+        import os
+        from taurex.util.util import file_signature, user_cache_dir
+
+        source = os.path.abspath(entry['filename'])
+        digest = hashlib.sha1(json.dumps(
+            [source, file_signature(source), self._dtype.str]).encode('utf-8'))
+        digest.update(np.ascontiguousarray(wngrid, dtype=np.float64).tobytes())
+
+        cache_dir = self._resample_cache_dir or \
+            os.path.join(user_cache_dir(), 'resampled')
+        return os.path.join(cache_dir, '{}_{}.mmap'.format(
+            entry['molecule'], digest.hexdigest()[:16]))
+
+    def _create_resampled_opacity(self, entry, wngrid):
+        """
+        Loads an opacity resampled onto ``wngrid``, resampling and
+        caching it first if needed
+        """
+        import os
+        from taurex.opacity.interpolateopacity import InterpolatingOpacity
+        from taurex.opacity.mmapopacity import MMapOpacity, resample_to_mmap
+
+        filename = self.resampled_filename(entry, wngrid)
+        if not os.path.exists(filename):
+            op = self._create_native_opacity(entry, in_memory=False)
+            if op is not None and entry['format'] == 'hdf5' and \
+                    np.array_equal(op.wavenumberGrid, wngrid):
+                # Already on the grid so load as normal
+                return self._create_native_opacity(
+                    entry, in_memory=self._memory_mode)
+            if op is None or not isinstance(op, InterpolatingOpacity) or \
+                    np.array_equal(op.wavenumberGrid, wngrid):
+                return op
+            self.log.info('Resampling %s from %s to %s points, caching '
+                          'to %s', op.moleculeName, op.wavenumberGrid.shape[0],
+                          wngrid.shape[0], filename)
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            resample_to_mmap(op, wngrid, filename, dtype=self._dtype)
+        else:
+            self.log.info('Using resampled %s from %s', entry['molecule'],
+                          filename)
+
+        op = MMapOpacity(filename,
+                         interpolation_mode=self._default_interpolation)
+        op._molecule_name = entry['molecule']
+        return op
+
+    def set_block_cache_bytes(self, max_bytes):
+        """
+        Sets the size of the block cache each streamed HDF5 opacity
+        keeps of recently read P-T nodes
+        (see :class:`~taurex.opacity.hdf5opacity.BlockCachedGrid`).
+        Each streamed opacity can then hold this much in memory, which
+        counts towards :func:`set_max_bytes`. Disabled by default.
+
+        Parameters
+        ----------
+        max_bytes: int
+            Size of block cache per opacity in bytes, 0 to disable
+
+        """
+        self._block_cache_bytes = int(max_bytes)
+        self.clear_cache()
+
+    def set_shared_memory(self, enable):
+        """
+        When running under MPI, HDF5 cross-sections are read once per
+        node into an MPI-3 shared memory window and every rank on the
+        node uses a zero-copy view of it. This gives in-memory
+        interpolation speed without a copy per rank.
+
+        Loading and releasing opacities become collective over the node
+        so every rank must request molecules in the same order, which is
+        the case when all ranks run the same model. Without MPI this
+        behaves as normal in memory loading.
+
+        Parameters
+        ----------
+        enable: bool
+            Whether to share HDF5 cross-sections between ranks on a node
+
+        """
+        self._shared_memory = enable
+        self.clear_cache()
+
+    def _move_to_shared_memory(self, opacity):
+        """
+        Copies a streamed cross-section grid into node shared
+        memory in the cache dtype, read by the first rank on the node only
+        """
+        from taurex.mpi import allocate_shared_array, shared_rank, \
+            shared_barrier
+        grid = opacity.xsecGrid
+        window, shared = allocate_shared_array(grid.shape, self._dtype)
+        if shared_rank() == 0:
+            self.log.info('Reading %s into shared memory',
+                          opacity.moleculeName)
+            for p_idx in range(grid.shape[0]):
+                shared[p_idx] = grid[p_idx]
+        shared_barrier()
+        opacity._xsec_grid = shared
+        opacity.in_memory = True
+        self._shared_windows[opacity.moleculeName] = window
+
+    def _release_shared_memory(self, molecule):
+        from taurex.mpi import free_shared_array
+        window = self._shared_windows.pop(molecule, None)
+        free_shared_array(window)
+
+    def set_max_bytes(self, max_bytes):
+        """
+        Sets the maximum number of bytes that in-memory cross-sections
+        loaded from the search path may use. Past this the least
+        recently used are evicted and reloaded when next needed.
+        Memory-mapped grids are not counted, streamed grids count the
+        size of their block cache. Pressure tables count with, and are
+        evicted with, their molecule.
+
+        Parameters
+        ----------
+        max_bytes: int or None
+            Memory budget in bytes, ``None`` for unlimited (default)
+
+        """
+        self._max_bytes = None if max_bytes is None else int(max_bytes)
+        self.log.info('Opacity memory budget set to %s bytes', self._max_bytes)
+        self.enforce_budget()
+
+    @staticmethod
+    def opacity_nbytes(opacity):
+        """
+        Number of bytes held in memory by an opacity's grids.
+        Memory-mapped grids are not counted as they are not resident
+        in process memory. Streamed (HDF5) grids count the size their
+        block cache can grow to.
+
+        Parameters
+        ----------
+        opacity: :class:`~taurex.opacity.opacity.Opacity`
+            Opacity to measure
+
+        Returns
+        -------
+        int
+            Size in bytes
+
+        """
+        from taurex.opacity.hdf5opacity import BlockCachedGrid
+        total = 0
+        for grid_name in ('xsecGrid', 'wavenumberGrid',
+                          'temperatureGrid', 'pressureGrid'):
+            try:
+                grid = getattr(opacity, grid_name)
+            except (AttributeError, NotImplementedError):
+                continue
+            if isinstance(grid, np.ndarray) and \
+                    not isinstance(grid, np.memmap):
+                total += grid.nbytes
+            elif isinstance(grid, BlockCachedGrid):
+                total += grid.max_bytes
+        return total
+
+    def molecule_nbytes(self, molecule):
+        """
+        Number of bytes held by the cached opacity of a molecule
+        (:func:`opacity_nbytes`) and its pressure table
+        """
+        total = self.opacity_nbytes(self.opacity_dict[molecule])
+        table = self._pressure_tables.get(molecule)
+        if table is not None:
+            total += table.nbytes
+        return total
+
+    @property
+    def current_bytes(self):
+        """
+        Number of bytes currently held by all cached opacities
+        and their pressure tables
+        """
+        return sum(self.molecule_nbytes(mol) for mol in self.opacity_dict)
+
+    def pressure_table(self, molecule, pressure_profile, wngrid=None):
+        """
+        Returns the cross-sections of a molecule interpolated to a fixed
+        pressure profile
+        (:class:`~taurex.opacity.interpolateopacity.PressureTable`).
+        One table is kept per molecule and rebuilt when the opacity,
+        pressure profile or wavenumber grid changes. Tables count
+        towards the memory budget and are evicted with their opacity.
+
+        Parameters
+        ----------
+        molecule: str
+            Molecule name
+
+        pressure_profile: :obj:`array`
+            Pressure of each layer in Pa
+
+        wngrid: :obj:`array`, optional
+            Wavenumber grid to interpolate to
+
+        Returns
+        -------
+        :class:`~taurex.opacity.interpolateopacity.PressureTable`
+            Table or ``None`` if the opacity does not support them
+
+        """
+        opacity = self[molecule]
+        table = self._pressure_tables.get(molecule)
+        if table is not None and table.matches(opacity, pressure_profile,
+                                               wngrid):
+            return table
+
+        self._pressure_tables.pop(molecule, None)
+        if not hasattr(opacity, 'pressure_table'):
+            return None
+        table = opacity.pressure_table(pressure_profile, wngrid)
+        if table is None:
+            return None
+        self.log.info('Built pressure table for %s (%s bytes)', molecule,
+                      table.nbytes)
+        self._pressure_tables[molecule] = table
+        self.enforce_budget(keep=molecule)
+        return table
+
+    def drop_pressure_table(self, molecule):
+        """
+        Releases the pressure table of a molecule if there is one
+        """
+        self._pressure_tables.pop(molecule, None)
+
+    def enforce_budget(self, keep=None):
+        """
+        Evicts the least recently used opacities loaded from the
+        search path until the memory budget is satisfied. Opacities
+        added manually are never evicted.
+
+        Parameters
+        ----------
+        keep: str, optional
+            Molecule that should not be evicted
+
+        """
+        if self._max_bytes is None:
+            return
+
+        sizes = OrderedDict((mol, self.molecule_nbytes(mol))
+                            for mol in self.opacity_dict)
+        total = sum(sizes.values())
+
+        for mol, nbytes in sizes.items():
+            if total <= self._max_bytes:
+                break
+            if mol == keep or mol not in self._evictable:
+                continue
+            self.log.info('Evicting opacity %s (%s bytes) from cache',
+                          mol, nbytes)
+            del self.opacity_dict[mol]
+            self._pressure_tables.pop(mol, None)
+            self._evictable.discard(mol)
+            self._release_shared_memory(mol)
+            total -= nbytes
+
+        if total > self._max_bytes:
+            self.log.warning('Opacities use %s bytes which is above the '
+                             'budget of %s bytes', total, self._max_bytes)
+
     def set_interpolation(self,interpolation_mode):
         """
         Sets the interpolation mode for all currently loaded (and future loaded) cross-sections
@@ -182,12 +606,14 @@ class OpacityCache(Singleton):
 
         """
         if key in self.opacity_dict:
+            self.opacity_dict.move_to_end(key)
             return self.opacity_dict[key]
         else:
             #Try a load of the opacity
             self.load_opacity(molecule_filter=[key])
             #If we have it after a load then good job boys
             if key in self.opacity_dict:
+                self.enforce_budget(keep=key)
                 return self.opacity_dict[key]
             else:
                 try:
@@ -249,6 +675,89 @@ class OpacityCache(Singleton):
             self.opacity_dict[opacity.moleculeName] = opacity   
 
 
+    def get_manifest(self, path):
+        """
+        Returns the :class:`~taurex.cache.manifest.OpacityManifest`
+        indexing a directory
+
+        Parameters
+        ----------
+        path: str
+            Opacity directory
+
+        """
+        from taurex.cache.manifest import OpacityManifest
+        if path not in self._manifests:
+            self._manifests[path] = OpacityManifest(path)
+        return self._manifests[path]
+
+    def xsec_entries(self, path):
+        """
+        Manifest entries of every cross-section file in a directory,
+        k-tables are excluded
+        """
+        return [e for e in self.get_manifest(path).entries()
+                if e['format'] != 'ktable']
+
+    def search_ktable_molecules(self):
+        """
+        Find molecules with ``.ktable.h5`` correlated-k tables in set path
+
+        Returns
+        -------
+        molecules: :obj`list`
+            List of molecules with k-tables
+
+        """
+        if self._opacity_path is None:
+            return []
+        paths = self._opacity_path
+        if isinstance(paths, str):
+            paths = [paths]
+        return [mol for path in paths
+                for mol in self.get_manifest(path).molecules('ktable')]
+
+    def get_ktable(self, molecule):
+        """
+        Returns the :class:`~taurex.opacity.ktableopacity.KTableOpacity`
+        of a molecule, loading it from the search path(s) when first
+        requested. k-tables are kept separately from cross-sections so a
+        molecule can have both.
+
+        Parameters
+        ----------
+        molecule: str
+            Molecule name
+
+        Raises
+        ------
+        KeyError
+            If no k-table could be found for the molecule
+
+        """
+        from taurex.opacity.ktableopacity import KTableOpacity
+        if molecule in self.ktable_dict:
+            return self.ktable_dict[molecule]
+
+        paths = self._opacity_path or []
+        if isinstance(paths, str):
+            paths = [paths]
+        for path in paths:
+            for entry in self.get_manifest(path).entries('ktable'):
+                if entry['molecule'] == molecule:
+                    self.log.info('Loading k-table %s from %s', molecule,
+                                  entry['filename'])
+                    ktable = KTableOpacity(
+                        entry['filename'],
+                        interpolation_mode=self._default_interpolation,
+                        dtype=self._dtype)
+                    self.ktable_dict[molecule] = ktable
+                    return ktable
+
+        self.log.error('k-table for molecule %s could not be found in '
+                       'paths %s', molecule, self._opacity_path)
+        raise KeyError(molecule)
+
     def search_hdf5_molecules(self):
         """
         Find molecules with HDF5 opacities in set path
@@ -259,13 +768,19 @@ class OpacityCache(Singleton):
             List of molecules with HDF5 opacities
         
         """
-        from glob import glob
-        import os    
-        from taurex.opacity.hdf5opacity import HDF5Opacity
-        glob_path = [os.path.join(self._opacity_path,'*.h5'),os.path.join(self._opacity_path,'*.hdf5')]
-        file_list = [f for glist in glob_path for f in glob(glist)]
-        
-        return [HDF5Opacity(f,interpolation_mode=self._default_interpolation,in_memory=False).moleculeName for f in file_list ]
+        return self.get_manifest(self._opacity_path).molecules('hdf5')
+
+    def search_mmap_molecules(self):
+        """
+        Find molecules with ``.mmap`` opacities in set path
+
+        Returns
+        -------
+        molecules: :obj`list`
+            List of molecules with ``.mmap`` opacities
+
+        """
+        return self.get_manifest(self._opacity_path).molecules('mmap')
 
     def search_pickle_molecules(self):
         """
@@ -277,13 +792,7 @@ class OpacityCache(Singleton):
             List of molecules with ``.pickle`` opacities
         
         """
-
-        from glob import glob
-        import os    
-        glob_path = os.path.join(self._opacity_path,'*.pickle')
-        file_list = [f for f in glob(glob_path)]
-        
-        return [pathlib.Path(f).stem.split('.')[0] for f in file_list ]
+        return self.get_manifest(self._opacity_path).molecules('pickle')
 
     def search_exotransmit_molecules(self):
         """
@@ -295,13 +804,7 @@ class OpacityCache(Singleton):
             List of molecules with ExoTransmit opacities
         
         """
-
-        from glob import glob
-        import os    
-        glob_path = os.path.join(self._opacity_path,'*.dat')
-        file_list = [f for f in glob(glob_path)]
-        
-        return [pathlib.Path(f).stem[4:] for f in file_list ]
+        return self.get_manifest(self._opacity_path).molecules('exotransmit')
 
     def search_radis_molecules(self):
         """
@@ -325,22 +828,126 @@ class OpacityCache(Singleton):
         else:
             return []
     def find_list_of_molecules(self):
-        from glob import glob
-        import os
-        from taurex.opacity import PickleOpacity
-        pickles = []
-        hedef = []
-        exo = []
+        molecules = []
         if self._opacity_path is not None:
-        
-            pickles = self.search_pickle_molecules()
-            hedef = self.search_hdf5_molecules()
-            exo = self.search_exotransmit_molecules()
-        return list(set(pickles+hedef+exo+self.search_radis_molecules()))
+            molecules = self.get_manifest(self._opacity_path).molecules()
+        return list(set(molecules+self.search_radis_molecules()))
+
+    def create_opacity(self, entry):
+        """
+        Creates the opacity object for a manifest entry
+
+        Parameters
+        ----------
+        entry: dict
+            Entry from :class:`~taurex.cache.manifest.OpacityManifest`
+
+        Returns
+        -------
+        :class:`~taurex.opacity.opacity.Opacity`
+            Loaded opacity or ``None`` if format is unknown
+
+        """
+        wngrid = self.common_grid
+        if wngrid is not None:
+            return self._create_resampled_opacity(entry, wngrid)
+        return self._create_native_opacity(entry,
+                                           in_memory=self._memory_mode)
+
+    def _create_native_opacity(self, entry, in_memory=True):
+        from taurex.opacity import PickleOpacity
+        from taurex.opacity.hdf5opacity import HDF5Opacity
+        from taurex.opacity.exotransmit import ExoTransmitOpacity
+        from taurex.opacity.mmapopacity import MMapOpacity
+
+        files = entry['filename']
+        op = None
+        if entry['format'] == 'mmap':
+            op = MMapOpacity(files,interpolation_mode=self._default_interpolation)
+        elif entry['format'] == 'hdf5' and self._shared_memory and in_memory:
+            op = HDF5Opacity(files,interpolation_mode=self._default_interpolation,in_memory=False,
+                             block_cache_bytes=0)
+            self._move_to_shared_memory(op)
+            # Already in the cache dtype, converting would give each
+            # rank a private copy
+            return op
+        elif entry['format'] == 'hdf5':
+            op = HDF5Opacity(files,interpolation_mode=self._default_interpolation,in_memory=in_memory,
+                             block_cache_bytes=self._block_cache_bytes, dtype=self._dtype)
+        elif entry['format'] == 'pickle':
+            op = PickleOpacity(files,interpolation_mode=self._default_interpolation)
+            op._molecule_name = entry['molecule']
+        elif entry['format'] == 'exotransmit':
+            op = ExoTransmitOpacity(files,interpolation_mode=self._default_interpolation)
+        if op is not None:
+            self._convert_dtype(op)
+        return op
+
+    def prefetch(self, molecules, num_threads=None):
+        """
+        Loads the opacities of several molecules concurrently using
+        a thread pool rather than one after another on first use.
+        Molecules already loaded or not found in the search path(s)
+        are skipped. The time and throughput of each file is logged.
+
+        Parameters
+        ----------
+        molecules: :obj:`list` of str
+            Molecules to load
+
+        num_threads: int, optional
+            Number of threads to use, defaults to one per file up to
+            the number of cores
+
+        """
+        from .prefetch import parallel_load
+
+        if self._opacity_path is None:
+            return
+
+        paths = self._opacity_path
+        if isinstance(paths, str):
+            paths = [paths]
+
+        to_load = {}
+        for path in paths:
+            for entry in self.xsec_entries(path):
+                mol_name = entry['molecule']
+                if mol_name in molecules and mol_name not in to_load \
+                        and mol_name not in self.opacity_dict:
+                    to_load[mol_name] = entry
+
+        if len(to_load) == 0:
+            return
+
+        if self._shared_memory:
+            # Shared memory allocation is collective so keep the order
+            # identical on every rank
+            num_threads = 1
+
+        # Resolve the common grid before any threads need it
+        self.common_grid
+
+        self.log.info('Prefetching opacities for %s', list(to_load.keys()))
+        loaded = parallel_load(lambda mol, f: self.create_opacity(to_load[mol]),
+                               [(mol, e['filename']) for mol, e in to_load.items()],
+                               self.log, num_threads=num_threads)
+
+        for mol_name, op in loaded:
+            self.add_opacity(op, molecule_filter=[mol_name])
+            if self.opacity_dict.get(mol_name) is op:
+                self._evictable.add(mol_name)
+        self.enforce_budget()
+
     def load_opacity_from_path(self,path,molecule_filter=None):
         """
         Searches path for molecular cross-section files, creates and loads them into the cache
         ``.pickle`` will be loaded as :class:`~taurex.opacity.pickleopacity.PickleOpacity`
+        ``.mmap`` will be loaded as :class:`~taurex.opacity.mmapopacity.MMapOpacity`
+        and take precedence over other formats for the same molecule.
+        Molecules are identified through the directory's
+        :class:`~taurex.cache.manifest.OpacityManifest` so only files
+        that are needed are opened.
         
 
         Parameters
@@ -354,48 +961,21 @@ class OpacityCache(Singleton):
             :func:`__getitem__` for filtering
 
         """ 
-        from glob import glob
-        import os
-        from taurex.opacity import PickleOpacity
-        from taurex.opacity.hdf5opacity import HDF5Opacity
-        from taurex.opacity.exotransmit import ExoTransmitOpacity
-        glob_path = [os.path.join(path,'*.h5'),os.path.join(path,'*.hdf5'),os.path.join(path,'*.pickle'),os.path.join(path,'*.dat')]
-    
-        file_list = [f for glist in glob_path for f in glob(glist)]
-        self.log.debug('File list %s',file_list)
-        for files in file_list:
-            op = None
-            if files.lower().endswith(('.hdf5', '.h5')):
-                op = HDF5Opacity(files,interpolation_mode=self._default_interpolation,in_memory=False)
-                
-                if molecule_filter is not None:
-                        if not op.moleculeName in molecule_filter:
-                            continue
-                if op.moleculeName in self.opacity_dict.keys():
+        entries = self.xsec_entries(path)
+        self.log.debug('File list %s',[e['filename'] for e in entries])
+        for entry in entries:
+            mol_name = entry['molecule']
+            if molecule_filter is not None:
+                if not mol_name in molecule_filter:
                     continue
-                del op
+            if mol_name in self.opacity_dict.keys():
+                continue
 
-                op = HDF5Opacity(files,interpolation_mode=self._default_interpolation,in_memory=self._memory_mode)
-
-            elif files.endswith('pickle'):
-                splits = pathlib.Path(files).stem.split('.')
-                if molecule_filter is not None:
-                        if not splits[0] in molecule_filter:
-                            continue
-                if splits[0] in self.opacity_dict.keys():
-                    continue
-                op = PickleOpacity(files,interpolation_mode=self._default_interpolation)
-                op._molecule_name = splits[0]
-            elif files.endswith('dat'):
-                mol_name = pathlib.Path(files).stem[4:]
-                if molecule_filter is not None:
-                        if not mol_name in molecule_filter:
-                            continue
-                if mol_name in self.opacity_dict.keys():
-                    continue
-                op = ExoTransmitOpacity(files,interpolation_mode=self._default_interpolation)
+            op = self.create_opacity(entry)
             if op is not None:
                 self.add_opacity(op,molecule_filter=molecule_filter)
+                if self.opacity_dict.get(op.moleculeName) is op:
+                    self._evictable.add(op.moleculeName)
 
     def load_opacity(self,opacities=None,opacity_path=None,molecule_filter=None):
         """
@@ -445,6 +1025,10 @@ class OpacityCache(Singleton):
     
     def clear_cache(self):
         """
-        Clears all currently loaded cross-sections
+        Clears all currently loaded cross-sections and k-tables
         """
-        self.opacity_dict = {}
\ No newline at end of file
+        for mol in list(self._shared_windows.keys()):
+            self._release_shared_memory(mol)
+        self.opacity_dict = OrderedDict()
+        self.ktable_dict = OrderedDict()
+        self._evictable = set()
\ No newline at end of file
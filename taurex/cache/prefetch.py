@@ -0,0 +1,76 @@
+"""
+Helper for loading data files concurrently
+"""
+
+import os
+import time
+
+
+def parallel_load(load_function, items, log, num_threads=None):
+    """
+    Calls ``load_function(key, filename)`` for every item using a thread
+    pool and logs the time taken and throughput of each file.
+    I/O and decompression release the GIL for much of their work
+    so loading several files concurrently can reduce startup time.
+
+    Parameters
+    ----------
+    load_function: function
+        Function taking a key and filename and returning the loaded object
+
+    items: :obj:`list` of :obj:`tuple`
+        ``(key, filename)`` for each file to load
+
+    log: :class:`~taurex.log.logger.Logger`
+        Logger to report timings to
+
+    num_threads: int, optional
+        Number of threads, defaults to one per file up to the number of cores.
+        ``1`` loads serially in the order given
+
+    Returns
+    -------
+    :obj:`list` of :obj:`tuple`
+        ``(key, loaded object)`` in the same order as ``items``. Files
+        that fail to load are logged and skipped
+
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if len(items) == 0:
+        return []
+
+    if num_threads is None:
+        num_threads = min(len(items), os.cpu_count() or 1)
+    num_threads = max(int(num_threads), 1)
+
+    def timed_load(item):
+        key, filename = item
+        start = time.perf_counter()
+        try:
+            result = load_function(key, filename)
+        except Exception as e:
+            log.error('Failed to load %s from %s: %s', key, filename, e)
+            return None
+        elapsed = time.perf_counter() - start
+        size_mb = os.path.getsize(filename)/1024**2
+        log.info('Loaded %s from %s in %.3f s (%.1f MB, %.1f MB/s)',
+                 key, filename, elapsed, size_mb,
+                 size_mb/max(elapsed, 1e-9))
+        return result
+
+    start = time.perf_counter()
+    if num_threads == 1:
+        results = [timed_load(item) for item in items]
+    else:
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            results = list(executor.map(timed_load, items))
+    elapsed = time.perf_counter() - start
+
+    total_mb = sum(os.path.getsize(f) for _, f in items)/1024**2
+    log.info('Loaded %s files (%.1f MB) using %s threads in %.3f s '
+             '(%.1f MB/s)', len(items), total_mb, num_threads, elapsed,
+             total_mb/max(elapsed, 1e-9))
+
+    return [(key, result) for (key, _), result in zip(items, results)
+            if result is not None]
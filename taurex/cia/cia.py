@@ -4,6 +4,7 @@ objects.
 """
 
 from taurex.log import Logger
+from collections import OrderedDict
 import numpy as np
 
 
@@ -18,6 +19,9 @@ class CIA(Logger):
         - :func:`compute_cia`
         - :func:`temperatureGrid`
 
+    Implementing :func:`xsecGrid` as well allows whole temperature
+    profiles to be computed at once with :func:`cia_profile`
+
 
 
     Parameters
@@ -34,6 +38,11 @@ class CIA(Logger):
         super().__init__(name)
 
         self._pair_name = pair_name
+        self._resampled_grids = OrderedDict()
+
+    max_resampled_grids = 4
+    """Number of target wavenumber grids to keep resampled cross-sections
+    for"""
 
     @property
     def pairName(self):
@@ -147,6 +156,138 @@ class CIA(Logger):
 
         raise NotImplementedError
 
+    @property
+    def xsecGrid(self):
+        """
+        The native cross-section grid with shape ``(T, wn)``.
+        Optional in derived classes
+
+        Returns
+        -------
+        :obj:`array`
+            Native cross-section grid
+
+        Raises
+        ------
+        NotImplementedError
+            Only if derived class does not implement this
+
+        """
+        raise NotImplementedError
+
+    def resampled_grid(self, wngrid=None):
+        """
+        The cross-section grid interpolated onto ``wngrid`` at every
+        native temperature. The result is memoized as the target grid
+        rarely changes during a retrieval.
+
+        Parameters
+        ----------
+        wngrid : :obj:`array` , optional
+            Wavenumber grid to interpolate to, the native grid
+            is returned if not given
+
+        Returns
+        -------
+        :obj:`array`
+            Cross-section grid with shape ``(T, wngrid)``
+
+        """
+        from taurex.opacity.opacity import WavenumberPlan
+        if wngrid is None:
+            return self.xsecGrid
+
+        grids = self._resampled_grids
+        key = WavenumberPlan.grid_key(wngrid)
+        cached = grids.get(key)
+        if cached is not None and np.array_equal(cached[0], wngrid):
+            grids.move_to_end(key)
+            return cached[1]
+
+        native_grid = self.wavenumberGrid
+        xsec_grid = self.xsecGrid
+        resampled = np.empty(shape=(xsec_grid.shape[0], wngrid.shape[0]))
+        for idx, sigma in enumerate(xsec_grid):
+            resampled[idx] = np.interp(wngrid, native_grid, sigma)
+
+        grids[key] = (np.array(wngrid), resampled)
+        while len(grids) > self.max_resampled_grids:
+            grids.popitem(last=False)
+        return resampled
+
+    def accumulate_profile(self, temperature_profile, wngrid, scale, out):
+        """
+        Adds the cross-section of every layer multiplied by ``scale``
+        into ``out``. Temperatures outside of the native grid take the
+        edge cross-section. Falls back to calling :func:`cia` for each
+        layer if :func:`xsecGrid` is not implemented.
+
+        Parameters
+        ----------
+        temperature_profile : :obj:`array`
+            Temperature of each layer in Kelvin
+
+        wngrid : :obj:`array` or None
+            Wavenumber grid to interpolate to
+
+        scale : :obj:`array`
+            Factor to multiply each layer by
+
+        out : :obj:`array`
+            Array of shape ``(nlayers, wngrid)`` to accumulate into
+
+        """
+        from taurex.util.math import compute_interp_weights, \
+            accumulate_cia_profile
+        try:
+            grid = self.resampled_grid(wngrid)
+        except NotImplementedError:
+            for idx_layer, temperature in enumerate(temperature_profile):
+                out[idx_layer] += self.cia(temperature, wngrid) * \
+                    scale[idx_layer]
+            return
+
+        temperature_grid = np.asarray(self.temperatureGrid,
+                                      dtype=np.float64)
+        temperature_profile = np.asarray(temperature_profile,
+                                         dtype=np.float64)
+        if temperature_grid.shape[0] == 1:
+            grid = np.concatenate((grid, grid))
+            t_idx = np.zeros(temperature_profile.shape[0], dtype=np.int64)
+            t_weight = np.zeros(temperature_profile.shape[0])
+        else:
+            t_idx, t_weight = compute_interp_weights(temperature_profile,
+                                                     temperature_grid)
+        accumulate_cia_profile(grid, t_idx, t_weight,
+                               np.asarray(scale, dtype=np.float64), out)
+
+    def cia_profile(self, temperature_profile, wngrid=None):
+        """
+        Computes the cross-section for a whole temperature profile.
+        This is much faster than calling :func:`cia` for each layer
+        as the cross-sections are only interpolated onto ``wngrid`` once.
+
+        Parameters
+        ----------
+        temperature_profile : :obj:`array`
+            Temperature of each layer in Kelvin
+
+        wngrid : :obj:`array` , optional
+            Wavenumber grid to interpolate to
+
+        Returns
+        -------
+        :obj:`array`
+            CIA cross section of each layer with shape ``(nlayers, wn)``
+
+        """
+        nwn = self.wavenumberGrid.shape[0] if wngrid is None \
+            else wngrid.shape[0]
+        out = np.zeros(shape=(len(temperature_profile), nwn))
+        self.accumulate_profile(temperature_profile, wngrid,
+                                np.ones(len(temperature_profile)), out)
+        return out
+
     def cia(self, temperature, wngrid=None):
         """
         For a given temperature, computes the appropriate cross section.
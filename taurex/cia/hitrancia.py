@@ -160,16 +160,16 @@ class HitranCiaGrid(object):
             Master temperature grid
 
         """
-        for t in temperatures:
-            if t in self.temperature:
-                continue
-            self.debug('Tempurature %s, %s', t)
-            if t < min(self.temperature) or t > max(self.temperature):
+        self.sortTempSigma()
+        temp_grid = np.array(self.temperature)
+        missing = [t for t in temperatures if t not in temp_grid]
+        for t in missing:
+            if t < temp_grid[0] or t > temp_grid[-1]:
                 self.add_temperature(t, np.zeros_like(self.wn))
             else:
                 indicies = self.find_closest_temperature_index(t)
                 self.add_temperature(t, self.interp_linear_grid(t, *indicies))
-            self.sortTempSigma()
+        self.sortTempSigma()
 
 
 class HitranCIA(CIA):
@@ -182,6 +182,11 @@ class HitranCIA(CIA):
     across temperatures by unifying
     them into single grids.
 
+    Parsing and unifying the grids is slow so the unified grid is
+    cached as a memory-mappable binary file named after the checksum of
+    the ``.cia`` file. Later loads of the same file, from any process or
+    location, use the cached copy instead.
+
     To use it simply do:
 
     >>> h2h2 = HitranCIA('path/to/H2-He.cia')
@@ -202,13 +207,26 @@ class HitranCIA(CIA):
     filename : str
         Path to HITRAN cia file
 
+    cache_dir : str, optional
+        Directory to cache the unified grid in. Defaults to ``cia``
+        in the user cache directory
+        (``TAUREX_CACHE_DIR`` or ``~/.cache/taurex``)
+
+    use_cache : bool, optional
+        Set to ``False`` to always parse the file
+
 
     """
 
-    def __init__(self, filename):
+    cache_extension = '.trxcache'
+    """Extension of the cached unified grid"""
+
+    def __init__(self, filename, cache_dir=None, use_cache=True):
         super().__init__(self.__class__.__name__, 'None')
 
         self._filename = filename
+        self._cache_dir = cache_dir
+        self._use_cache = use_cache
         self._molecule_name = None
         self._wavenumber_grid = None
         self._temperature_grid = None
@@ -216,10 +234,79 @@ class HitranCIA(CIA):
         self._wn_dict = {}
         self.load_hitran_file(filename)
 
+    def cache_filename(self, filename, checksum):
+        """
+        Path of the cached unified grid for a file with this checksum
+        """
+        import os
+        import pathlib
+        from taurex.util.util import user_cache_dir
+        cache_dir = self._cache_dir or os.path.join(user_cache_dir(), 'cia')
+        return os.path.join(cache_dir, '{}_{}{}'.format(
+            pathlib.Path(filename).stem, checksum, self.cache_extension))
+
     def load_hitran_file(self, filename):
         """
-        Handles loading of the HITRAN file by reading and figuring
-        out the wavenumber and temperature grids and matching them up
+        Handles loading of the HITRAN file. The cached unified grid
+        is used if one exists for the file, otherwise the file is parsed
+        with :func:`parse_hitran_file` and the result cached.
+
+        Parameters
+        ----------
+        filename : str
+            Path to HITRAN cia file
+
+        """
+        from taurex.util.util import file_checksum
+        if not self._use_cache:
+            self.parse_hitran_file(filename)
+            return
+
+        cache_file = self.cache_filename(filename, file_checksum(filename))
+        if not self._load_cache(cache_file):
+            self.parse_hitran_file(filename)
+            self._write_cache(cache_file)
+
+    def _load_cache(self, cache_file):
+        """
+        Loads the unified grid from the cache, the arrays are
+        memory-mapped
+        """
+        from taurex.util.arrayfile import read_array_file
+        try:
+            arrays, attrs = read_array_file(cache_file, mmap=True)
+        except (OSError, ValueError):
+            return False
+        self.debug('Using cached grid %s', cache_file)
+        self._pair_name = attrs['pair_name']
+        self._temperature_grid = np.array(arrays['t'])
+        self._wavenumber_grid = np.array(arrays['wno'])
+        self._xsec_grid = arrays['xsecarr']
+        return True
+
+    def _write_cache(self, cache_file):
+        """
+        Writes the unified grid to the cache
+        """
+        import os
+        from taurex.util.arrayfile import write_array_file
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            write_array_file(cache_file,
+                             {'t': self._temperature_grid,
+                              'wno': self._wavenumber_grid,
+                              'xsecarr': self._xsec_grid},
+                             attrs={'pair_name': self._pair_name})
+        except OSError as e:
+            self.warning('Could not cache %s: %s', self._filename, e)
+            return
+        self.debug('Cached grid to %s', cache_file)
+
+    def parse_hitran_file(self, filename):
+        """
+        Parses the HITRAN file by reading and figuring
+        out the wavenumber and temperature grids and matching them up.
+        Each block of points is converted in a single pass.
 
         Parameters
         ----------
@@ -250,26 +337,12 @@ class HitranCIA(CIA):
 
                 wn_obj = self._wn_dict[wn_hash]
 
-                # Clear the temporary list
-                sigma_temp = []
-                wn_temp = []
-                for x in range(total_points):
-                    line = f.readline()
-                    self.debug('Line %s', line)
-                    splits = line.split()
-
-                    _wn = splits[0]
-                    _sigma = splits[1]
-                    wn_temp.append(float(_wn))
-                    _sig = float(_sigma)*1e-10
-                    if _sig < 0:
-                        _sig = 0
-                    sigma_temp.append(_sig)
+                wn_temp, sigma_temp = self.read_block(f, total_points)
 
                 # Ok we're done lets add the sigma
-                wn_obj.add_temperature(T, np.array(sigma_temp))
+                wn_obj.add_temperature(T, np.maximum(sigma_temp*1e-10, 0.0))
                 # set the wavenumber grid
-                wn_obj.wn = np.array(wn_temp)
+                wn_obj.wn = wn_temp
 
         temp_list.sort()
         self._temperature_grid = np.array(temp_list)
@@ -304,21 +377,14 @@ class HitranCIA(CIA):
 
         """
 
-        _wngrid = []
-        for w in self._wn_dict.values():
-            _wngrid.append(w.wn)
-        self._wavenumber_grid = np.concatenate(_wngrid)
+        grids = list(self._wn_dict.values())
+        self._wavenumber_grid = np.concatenate([w.wn for w in grids])
         sorted_idx = np.argsort(self._wavenumber_grid)
         self._wavenumber_grid = self._wavenumber_grid[sorted_idx]
-        _sigma_array = []
 
-        for idx, t in enumerate(self._temperature_grid):
-            _temp_sigma = []
-            for w in self._wn_dict.values():
-                _temp_sigma.append(w.Tsigma[idx][1])
-            _sigma_array.append(np.concatenate(_temp_sigma)[sorted_idx])
-
-        self._xsec_grid = np.array(_sigma_array)
+        self._xsec_grid = np.ascontiguousarray(
+            np.concatenate([np.array(w.sigma) for w in grids],
+                           axis=1)[:, sorted_idx])
 
     def find_closest_temperature_index(self, temperature):
         """
@@ -418,6 +484,36 @@ class HitranCIA(CIA):
 
         return start_wn, end_wn, total_points, T, max_cia
 
+    def read_block(self, f, total_points):
+        """
+        Reads the points following a header
+
+        Parameters
+        ----------
+        f : file object
+
+        total_points : int
+            Number of points in the block
+
+        Returns
+        -------
+        wn : :obj:`array`
+            Wavenumbers
+
+        sigma : :obj:`array`
+            Cross-sections as written in the file
+
+        """
+        lines = [f.readline() for x in range(total_points)]
+        values = np.fromstring(' '.join(lines), sep=' ')
+        if values.shape[0] % total_points == 0:
+            values = values.reshape(total_points, -1)
+        else:
+            # Lines have a varying number of columns
+            values = np.array([line.split()[:2] for line in lines],
+                              dtype=np.float64)
+        return values[:, 0], values[:, 1]
+
     @property
     def wavenumberGrid(self):
         """
@@ -445,6 +541,19 @@ class HitranCIA(CIA):
         """
         return self._temperature_grid
 
+    @property
+    def xsecGrid(self):
+        """
+        Unified cross-section grid
+
+        Returns
+        -------
+        :obj:`array`
+            Cross-sections with shape ``(T, wn)``
+
+        """
+        return self._xsec_grid
+
     def compute_cia(self, temperature):
         """
         Computes the collisionally induced absorption cross-section
@@ -79,6 +79,19 @@ class PickleCIA(CIA):
 
         return self._temperature_grid
 
+    @property
+    def xsecGrid(self):
+        """
+        Native cross-section grid
+
+        Returns
+        -------
+        :obj:`array`
+            Cross-sections with shape ``(T, wn)``
+
+        """
+        return self._xsec_grid
+
     def find_closest_temperature_index(self, temperature):
         """
         Finds the nearest indices for a particular temperature
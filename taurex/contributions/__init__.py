@@ -1,13 +1,14 @@
 """
 Modules that deal with computing contributions to optical depth
 """
-from .contribution import Contribution, contribute_tau
+from .contribution import Contribution, FusedContribution, contribute_tau
 from .absorption import AbsorptionContribution
 from .cia import CIAContribution, contribute_cia
 from .rayleigh import RayleighContribution
 from .simpleclouds import SimpleCloudsContribution
 from .leemie import LeeMieContribution
 from .flatmie import FlatMieContribution
+from .ktable import KTableContribution
 try:
     from .bhmie import BHMieContribution
 except ImportError:
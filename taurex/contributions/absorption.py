@@ -8,11 +8,204 @@ class AbsorptionContribution(Contribution):
     """
     Computes the contribution to the optical depth
     occuring from molecular absorption.
+
+    Parameters
+    ----------
+    pressure_tables: bool, optional
+        When the pressure profile is fixed, precompute for each molecule
+        its cross-sections interpolated to the pressure of every layer
+        (see :class:`~taurex.opacity.interpolateopacity.PressureTable`) so
+        only temperature is interpolated each call. Uses
+        ``nlayers x nT x nwn`` of memory per molecule, which counts towards
+        the memory budget of :class:`~taurex.cache.opacitycache.OpacityCache`
+        where the tables are kept. Tables are rebuilt if the pressure profile
+        changes and are not used whilst a pressure parameter is being fit.
     """
 
-    def __init__(self):
+    dependencies = ('temperature', 'pressure', 'chemistry')
+
+    def __init__(self, pressure_tables=False):
         super().__init__('Absorption')
         self._opacity_cache = OpacityCache()
+        self._use_pressure_tables = pressure_tables
+        self._table_gases = set()
+
+    def prepared_state(self, model, wngrid):
+        """
+        Also depends on the dtype of the cross-sections and whether
+        pressure tables are used
+        """
+        state = super().prepared_state(model, wngrid)
+        state.append(str(OpacityCache().dtype))
+        state.append(self._use_pressure_tables and
+                     not self.pressure_is_fitted(model))
+        return state
+
+    def prefetch_data(self, model):
+        """
+        Loads the cross-sections of all active gases concurrently
+        """
+        self._opacity_cache.prefetch(list(model.chemistry.activeGases))
+
+    def pressure_is_fitted(self, model):
+        """
+        Whether any parameter of the pressure profile is being fit
+        """
+        fitting_params = model.fittingParameters
+        for name in model.pressure.fitting_parameters().keys():
+            if name in fitting_params and fitting_params[name][5]:
+                return True
+        return False
+
+    def get_pressure_table(self, gas, model, wngrid):
+        """
+        Returns the pressure table of a molecule, memoized by
+        :func:`~taurex.cache.opacitycache.OpacityCache.pressure_table`,
+        or ``None`` if it cannot be used
+        """
+        table = self._opacity_cache.pressure_table(gas, model.pressureProfile,
+                                                   wngrid)
+        if table is not None:
+            self._table_gases.add(gas)
+        return table
+
+    def prepare(self, model, wngrid):
+        """
+        Computes the weighted cross-section of all active gases directly
+        into a single array. Interpolation nodes and weights are computed
+        once for each distinct temperature-pressure grid and shared by all
+        molecules using that grid, and each molecule is accumulated
+        into the final cross-section without intermediate arrays.
+
+        Parameters
+        ----------
+        model: :class:`~taurex.model.model.ForwardModel`
+            Forward model
+
+        wngrid: :obj:`array`
+            Wavenumber grid
+
+        """
+        from taurex.opacity.interpolateopacity import InterpolatingOpacity
+
+        self.debug('Preparing model with %s', wngrid.shape)
+        self._ngrid = wngrid.shape[0]
+        self._nlayers = model.nLayers
+        self._opacity_cache = OpacityCache()
+
+        sigma_xsec = np.zeros(shape=(model.nLayers, wngrid.shape[0]),
+                              dtype=self._opacity_cache.dtype)
+
+        use_tables, active_gases = self._prepare_tables(model)
+
+        temperature_profile = model.temperatureProfile
+        pressure_profile = model.pressureProfile
+
+        weight_groups = {}
+        for gas in active_gases:
+            gas_mix = model.chemistry.get_gas_mix_profile(gas)
+            xsec = self._opacity_cache[gas]
+
+            table = None
+            if use_tables:
+                table = self.get_pressure_table(gas, model, wngrid)
+
+            if table is not None:
+                sigma_xsec += \
+                    table.opacity_profile(temperature_profile) * \
+                    gas_mix[:, None]
+            elif isinstance(xsec, InterpolatingOpacity) and \
+                    isinstance(xsec.xsecGrid, np.ndarray):
+                weights = self._find_weights(weight_groups, xsec,
+                                             temperature_profile,
+                                             pressure_profile)
+                xsec.accumulate_opacity_profile(weights, gas_mix, sigma_xsec,
+                                                wngrid)
+            else:
+                sigma_xsec += \
+                    xsec.opacity_profile(temperature_profile,
+                                         pressure_profile,
+                                         wngrid)*gas_mix[:, None]
+
+        self.debug('Interpolation weights computed for %s grids',
+                   sum(len(g) for g in weight_groups.values()))
+        self.sigma_xsec = sigma_xsec
+
+    def prepare_batch(self, model, wngrid, temperature, pressure, gas_mix):
+        """
+        Computes the weighted cross-section of every model in a batch.
+        The layers of all models are stacked into a single profile so
+        each molecule is interpolated in one pass with interpolation
+        weights shared by all molecules on the same grid. Not batched
+        when pressure tables are in use.
+        """
+        from taurex.opacity.interpolateopacity import InterpolatingOpacity
+
+        if gas_mix is None or (self._use_pressure_tables and
+                               not self.pressure_is_fitted(model)):
+            return None
+
+        nbatch, nlayers = temperature.shape
+        self._ngrid = wngrid.shape[0]
+        self._nlayers = nlayers
+        self._opacity_cache = OpacityCache()
+
+        temperature_profile = temperature.ravel()
+        pressure_profile = pressure.ravel()
+        sigma_xsec = np.zeros(shape=(nbatch*nlayers, wngrid.shape[0]),
+                              dtype=self._opacity_cache.dtype)
+
+        weight_groups = {}
+        for gas, mix in gas_mix.items():
+            xsec = self._opacity_cache[gas]
+            mix = mix.ravel()
+            if isinstance(xsec, InterpolatingOpacity) and \
+                    isinstance(xsec.xsecGrid, np.ndarray):
+                weights = self._find_weights(weight_groups, xsec,
+                                             temperature_profile,
+                                             pressure_profile)
+                xsec.accumulate_opacity_profile(weights, mix, sigma_xsec,
+                                                wngrid)
+            else:
+                sigma_xsec += \
+                    xsec.opacity_profile(temperature_profile,
+                                         pressure_profile,
+                                         wngrid)*mix[:, None]
+
+        return sigma_xsec.reshape(nbatch, nlayers, wngrid.shape[0])
+
+    @staticmethod
+    def _find_weights(weight_groups, xsec, temperature_profile,
+                      pressure_profile):
+        """
+        Finds interpolation weights already computed for the
+        grid of ``xsec`` or computes them
+        """
+        from taurex.opacity.interpolateopacity import InterpolationWeights
+        group = weight_groups.setdefault(InterpolationWeights.grid_key(xsec),
+                                         [])
+        for weights in group:
+            if weights.matches(xsec):
+                return weights
+        weights = xsec.interpolation_weights(temperature_profile,
+                                             pressure_profile)
+        group.append(weights)
+        return weights
+
+    def _prepare_tables(self, model):
+        """
+        Decides whether pressure tables can be used and drops
+        those no longer needed
+        """
+        use_tables = self._use_pressure_tables and \
+            not self.pressure_is_fitted(model)
+
+        active_gases = model.chemistry.activeGases
+        for gas in list(self._table_gases):
+            if not use_tables or gas not in active_gases:
+                self._opacity_cache.drop_pressure_table(gas)
+                self._table_gases.discard(gas)
+        return use_tables, active_gases
 
     def prepare_each(self, model, wngrid):
         """
@@ -36,12 +229,15 @@ class AbsorptionContribution(Contribution):
 
         self.debug('Preparing model with %s', wngrid.shape)
         self._ngrid = wngrid.shape[0]
-        sigma_xsec = np.zeros(shape=(model.nLayers, wngrid.shape[0]))
-
         # Get the opacity cache
         self._opacity_cache = OpacityCache()
+
+        sigma_xsec = np.zeros(shape=(model.nLayers, wngrid.shape[0]),
+                              dtype=self._opacity_cache.dtype)
+
+        use_tables, active_gases = self._prepare_tables(model)
         # Loop through all active gases
-        for gas in model.chemistry.activeGases:
+        for gas in active_gases:
 
             # Clear sigma array
             sigma_xsec[...] = 0.0
@@ -52,17 +248,20 @@ class AbsorptionContribution(Contribution):
 
             # Get the cross section object relating to the gas
             xsec = self._opacity_cache[gas]
-            # Loop through the layers
-            for idx_layer, tp in enumerate(zip(model.temperatureProfile,
-                                               model.pressureProfile)):
-                self.debug('Got index,tp %s %s', idx_layer, tp)
-
-                temperature, pressure = tp
+            table = None
+            if use_tables:
+                table = self.get_pressure_table(gas, model, wngrid)
 
-                # Place into the array
-                sigma_xsec[idx_layer] += \
-                    xsec.opacity(temperature, pressure,
-                                 wngrid)*gas_mix[idx_layer]
+            # Compute all layers in one go and place into the array
+            if table is not None:
+                sigma_xsec += \
+                    table.opacity_profile(model.temperatureProfile) * \
+                    gas_mix[:, None]
+            else:
+                sigma_xsec += \
+                    xsec.opacity_profile(model.temperatureProfile,
+                                         model.pressureProfile,
+                                         wngrid)*gas_mix[:, None]
 
             # Temporarily assign to master cross-section
             self.sigma_xsec = sigma_xsec
@@ -1,4 +1,5 @@
-from .contribution import Contribution, contribute_tau
+from .contribution import Contribution, contribute_tau, \
+    contribute_tau_active
 import numpy as np
 from taurex.data.fittable import fitparam
 from taurex.external.mie import bh_mie
@@ -147,9 +148,16 @@ class BHMieContribution(Contribution):
         if model.pressureProfile[layer] <= self._cloud_bottom_pressure and \
                 model.pressureProfile[layer] >= self._cloud_top_pressure:
 
-            contribute_tau(start_layer, end_layer, density_offset,
-                           self.sigma_mie, density, path_length, self._nlayers,
-                           self._ngrid, layer, tau)
+            active = model.activeWavenumberRanges
+            if active is None:
+                contribute_tau(start_layer, end_layer, density_offset,
+                               self.sigma_mie, density, path_length,
+                               self._nlayers, self._ngrid, layer, tau)
+            else:
+                contribute_tau_active(start_layer, end_layer,
+                                      density_offset, self.sigma_mie,
+                                      density, path_length, layer, tau,
+                                      active)
 
     def build(self, model):
         """
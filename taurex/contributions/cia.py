@@ -66,6 +66,26 @@ def contribute_cia(startK, endK, density_offset, sigma, density, path, nlayers,
             tau[layer, wn] += sigma[k+layer, wn]*_path*_density*_density
 
 
+@numba.jit(nopython=True, nogil=True)
+def contribute_cia_active(startK, endK, density_offset, sigma, density, path,
+                          layer, tau, active):
+    """
+    Same as :func:`contribute_cia` but only for the ``[start, stop)``
+    wavenumber index ranges in ``active``
+
+    """
+    tau_row = tau[layer]
+    for k in range(startK, endK):
+        _density = density[k+density_offset]
+        factor = path[k]*_density*_density
+        sigma_row = sigma[k+layer]
+        for r in range(active.shape[0]):
+            _tau = tau_row[active[r, 0]:active[r, 1]]
+            _sigma = sigma_row[active[r, 0]:active[r, 1]]
+            for wn in range(_tau.shape[0]):
+                _tau[wn] += _sigma[wn]*factor
+
+
 class CIAContribution(Contribution):
     """
     Computes the contribution to the optical depth
@@ -77,6 +97,9 @@ class CIAContribution(Contribution):
         list of molecule pairs of the form ``mol1-mol2``
         e.g. ``H2-He``
     """
+
+    dependencies = ('temperature', 'chemistry')
+
     def __init__(self, cia_pairs=None):
         super().__init__('CIA')
         self._cia_pairs = cia_pairs
@@ -101,13 +124,74 @@ class CIAContribution(Contribution):
     def ciaPairs(self, value):
         self._cia_pairs = value
 
+    def prepared_state(self, model, wngrid):
+        """
+        Also depends on the pairs
+        """
+        state = super().prepared_state(model, wngrid)
+        state.append(list(self._cia_pairs))
+        return state
+
+    def prefetch_data(self, model):
+        """
+        Loads all CIA pairs concurrently
+        """
+        if self._cia_pairs:
+            self._cia_cache.prefetch(list(self._cia_pairs))
+
     def contribute(self, model, start_layer, end_layer, density_offset, layer,
                    density, tau, path_length=None):
-        if self._total_cia > 0:
+        if self._total_cia == 0:
+            return
+        active = model.activeWavenumberRanges
+        if active is None:
             contribute_cia(start_layer, end_layer, density_offset,
                            self.sigma_xsec, density, path_length,
                            self._nlayers, self._ngrid,
                            layer, tau)
+        else:
+            contribute_cia_active(start_layer, end_layer, density_offset,
+                                  self.sigma_xsec, density, path_length,
+                                  layer, tau, active)
+
+    def path_opacity(self, model, density):
+        """
+        CIA scales with the square of the density
+        """
+        return self.sigma_xsec*(density**2)[:, None]
+
+    def _cia_factor(self, model, cia):
+        chemistry = model.chemistry
+        return chemistry.get_gas_mix_profile(cia.pairOne) * \
+            chemistry.get_gas_mix_profile(cia.pairTwo)
+
+    def prepare(self, model, wngrid):
+        """
+        Computes the weighted cross-section of all pairs. Every
+        pair is accumulated straight into a single cross-section
+        with :func:`~taurex.cia.cia.CIA.accumulate_profile`
+
+        Parameters
+        ----------
+        model: :class:`~taurex.model.model.ForwardModel`
+            Forward model
+
+        wngrid: :obj:`array`
+            Wavenumber grid
+
+        """
+        self._total_cia = len(self.ciaPairs)
+        self._nlayers = model.nLayers
+        self._ngrid = wngrid.shape[0]
+        self.info('Computing CIA ')
+
+        sigma_cia = np.zeros(shape=(model.nLayers, wngrid.shape[0]))
+        temperature = model.temperatureProfile
+        for pairName in self.ciaPairs:
+            cia = self._cia_cache[pairName]
+            cia.accumulate_profile(temperature, wngrid,
+                                   self._cia_factor(model, cia), sigma_cia)
+        self.sigma_xsec = sigma_cia
 
     def prepare_each(self, model, wngrid):
         """
@@ -135,20 +219,12 @@ class CIAContribution(Contribution):
         self._ngrid = wngrid.shape[0]
         self.info('Computing CIA ')
 
-        sigma_cia = np.zeros(shape=(model.nLayers, wngrid.shape[0]))
-
-        chemistry = model.chemistry
-
+        temperature = model.temperatureProfile
         for pairName in self.ciaPairs:
             cia = self._cia_cache[pairName]
-            sigma_cia[...] = 0.0
-
-            cia_factor = chemistry.get_gas_mix_profile(cia.pairOne) * \
-                chemistry.get_gas_mix_profile(cia.pairTwo)
-
-            for idx_layer, temperature in enumerate(model.temperatureProfile):
-                _cia_xsec = cia.cia(temperature, wngrid)
-                sigma_cia[idx_layer] += _cia_xsec*cia_factor[idx_layer]
+            sigma_cia = np.zeros(shape=(model.nLayers, wngrid.shape[0]))
+            cia.accumulate_profile(temperature, wngrid,
+                                   self._cia_factor(model, cia), sigma_cia)
             self.sigma_xsec = sigma_cia
             yield pairName, sigma_cia
 
@@ -71,6 +71,25 @@ def contribute_tau(startK, endK, density_offset, sigma, density, path, nlayers,
             tau[layer, wn] += sigma[k+layer, wn]*_path*_density
 
 
+@numba.jit(nopython=True, nogil=True)
+def contribute_tau_active(startK, endK, density_offset, sigma, density, path,
+                          layer, tau, active):
+    """
+    Same as :func:`contribute_tau` but only for the ``[start, stop)``
+    wavenumber index ranges in ``active``
+
+    """
+    tau_row = tau[layer]
+    for k in range(startK, endK):
+        factor = path[k]*density[k+density_offset]
+        sigma_row = sigma[k+layer]
+        for r in range(active.shape[0]):
+            _tau = tau_row[active[r, 0]:active[r, 1]]
+            _sigma = sigma_row[active[r, 0]:active[r, 1]]
+            for wn in range(_tau.shape[0]):
+                _tau[wn] += _sigma[wn]*factor
+
+
 class Contribution(Fittable, Logger, Writeable):
     """
 
@@ -94,6 +113,15 @@ class Contribution(Fittable, Logger, Writeable):
 
     """
 
+    dependencies = None
+    """
+    Names of the model state :func:`prepare` depends on, from
+    :func:`~taurex.model.simplemodel.SimpleForwardModel.dependency_state`.
+    When set, :func:`prepare_if_changed` skips :func:`prepare` unless
+    this state, the wavenumber grid or a fitting parameter of the
+    contribution has changed. ``None`` always prepares.
+    """
+
     def __init__(self, name):
         Logger.__init__(self, name)
         Fittable.__init__(self)
@@ -101,6 +129,8 @@ class Contribution(Fittable, Logger, Writeable):
         self._total_contribution = None
         self._enabled = True
         self.sigma_xsec = None
+        self._prepared_state = None
+        self._prepared_sigma = None
 
     @property
     def order(self):
@@ -156,11 +186,102 @@ class Contribution(Fittable, Logger, Writeable):
         self.debug('SIGMA %s', self.sigma_xsec.shape)
         self.debug(' %s %s %s %s %s %s %s', start_layer, end_layer,
                    density_offset, layer, density, tau, self._ngrid)
-        contribute_tau(start_layer, end_layer, density_offset,
-                       self.sigma_xsec, density, path_length, self._nlayers,
-                       self._ngrid, layer, tau)
+        active = model.activeWavenumberRanges
+        if active is None:
+            contribute_tau(start_layer, end_layer, density_offset,
+                           self.sigma_xsec, density, path_length,
+                           self._nlayers, self._ngrid, layer, tau)
+        else:
+            contribute_tau_active(start_layer, end_layer, density_offset,
+                                  self.sigma_xsec, density, path_length,
+                                  layer, tau, active)
         self.debug('DONE')
 
+    def path_opacity(self, model, density):
+        """
+        The quantity integrated along the line of sight for each
+        layer, ``sigma*density`` for cross-section based contributions.
+        Used by models that compute every path integral at once with
+        a matrix product instead of calling :func:`contribute` for
+        each layer.
+
+        Contributions that override :func:`contribute` must also
+        override this to take part, otherwise ``None`` is returned and
+        the model falls back to calling :func:`contribute`.
+
+        Parameters
+        ----------
+        model: :class:`~taurex.model.model.ForwardModel`
+            Forward model
+
+        density: :obj:`array`
+            density profile of atmosphere
+
+        Returns
+        -------
+        :obj:`array` or None
+            Array of shape ``(nlayers, nwn)``
+
+        """
+        if not self.fusable:
+            return None
+        return self.sigma_xsec*density[:, None]
+
+    @property
+    def fusable(self):
+        """
+        Whether the optical depth has the ``sigma*density*path`` form of
+        :func:`contribute_tau` using :attr:`sigma`. This is the case
+        unless :func:`contribute` is overridden. The model sums
+        :attr:`sigma` of these contributions into a
+        :class:`FusedContribution` so they are integrated together.
+        """
+        return type(self).contribute is Contribution.contribute
+
+    def native_grid(self, model):
+        """
+        Wavenumber grid the model must be computed on if this
+        contribution imposes one (e.g. the bins of correlated-k tables).
+        Default is ``None`` so the grid of the cross-sections is used.
+
+        Parameters
+        ----------
+        model: :class:`~taurex.model.model.ForwardModel`
+            Forward model
+
+        """
+        return None
+
+    def quadrature_weights(self, model):
+        """
+        Weights of the quadrature points this contribution
+        integrates over in each spectral bin. When not ``None``
+        each point of the wavenumber grid passed to :func:`prepare`
+        is repeated once for each weight, and the resulting spectrum is
+        integrated over them with these weights. Default is ``None``
+
+        Parameters
+        ----------
+        model: :class:`~taurex.model.model.ForwardModel`
+            Forward model
+
+        """
+        return None
+
+    def prefetch_data(self, model):
+        """
+        Called during forward model build phase before :func:`build`
+        to load the data this contribution reads into its cache.
+        Does nothing by default
+
+        Parameters
+        ----------
+        model: :class:`~taurex.model.model.ForwardModel`
+            Forward model
+
+        """
+        pass
+
     def build(self, model):
         """
         Called during forward model build phase
@@ -222,17 +343,125 @@ class Contribution(Fittable, Logger, Writeable):
         self._ngrid = wngrid.shape[0]
         self._nlayers = model.nLayers
 
-        sigma_xsec = np.zeros(shape=(self._nlayers, self._ngrid))
+        sigma_xsec = None
 
         for gas, sigma in self.prepare_each(model, wngrid):
             self.debug('Gas %s', gas)
             self.debug('Sigma %s', sigma)
+            if sigma_xsec is None:
+                # Keep the precision of the cross-sections
+                sigma_xsec = np.zeros(shape=(self._nlayers, self._ngrid),
+                                      dtype=sigma.dtype)
             sigma_xsec += sigma
 
+        if sigma_xsec is None:
+            sigma_xsec = np.zeros(shape=(self._nlayers, self._ngrid))
+
         self.sigma_xsec = sigma_xsec
         self.debug('Final sigma is %s', self.sigma_xsec)
         self.info('Done')
 
+    def prepare_batch(self, model, wngrid, temperature, pressure, gas_mix):
+        """
+        Used by :func:`~taurex.model.simplemodel.SimpleForwardModel.model_batch`
+        to compute the cross-section of many models at once, each row of
+        the returned array is used as :attr:`sigma` of that model.
+        Default is ``None`` so the contribution is prepared separately for
+        each model.
+
+        Parameters
+        ----------
+        model: :class:`~taurex.model.model.ForwardModel`
+            Forward model
+
+        wngrid: :obj:`array`
+            Wavenumber grid
+
+        temperature: :obj:`array`
+            Temperature profile of each model with shape
+            ``(nbatch, nlayers)``
+
+        pressure: :obj:`array`
+            Pressure profile of each model with shape ``(nbatch, nlayers)``
+
+        gas_mix: :obj:`dict` or None
+            Mixing ratio profile of each model with shape
+            ``(nbatch, nlayers)`` for each active gas. ``None`` if the
+            models do not have the same active gases
+
+        Returns
+        -------
+        :obj:`array` or None
+            Cross-sections with shape ``(nbatch, nlayers, nwn)``
+
+        """
+        return None
+
+    def prepared_state(self, model, wngrid):
+        """
+        Everything :func:`prepare` depends on: the wavenumber grid, the
+        model state named in :attr:`dependencies` and the value of every
+        fitting parameter of the contribution.
+
+        Parameters
+        ----------
+        model: :class:`~taurex.model.model.ForwardModel`
+            Forward model
+
+        wngrid: :obj:`array`
+            Wavenumber grid
+
+        Returns
+        -------
+        :obj:`list` or None
+            ``None`` if :attr:`dependencies` is not set
+
+        """
+        if self.dependencies is None:
+            return None
+        state = [wngrid]
+        for name in self.dependencies:
+            state.extend(model.dependency_state(name))
+        state.extend(param[2]() for param in
+                     self.fitting_parameters().values())
+        return state
+
+    def prepare_if_changed(self, model, wngrid):
+        """
+        Calls :func:`prepare` unless nothing in :func:`prepared_state`
+        has changed since the last call, in which case the previous
+        cross-section is kept. Anything else replacing the cross-section,
+        such as :func:`prepare_each`, means it is prepared again.
+
+        Parameters
+        ----------
+        model: :class:`~taurex.model.model.ForwardModel`
+            Forward model
+
+        wngrid: :obj:`array`
+            Wavenumber grid
+
+        Returns
+        -------
+        bool
+            Whether :func:`prepare` was called
+
+        """
+        state = self.prepared_state(model, wngrid)
+        if state is not None and self._prepared_state is not None and \
+                self.sigma_xsec is self._prepared_sigma and \
+                len(state) == len(self._prepared_state) and \
+                all(np.array_equal(new, old) for new, old
+                    in zip(state, self._prepared_state)):
+            self.debug('Nothing changed, keeping cross-section')
+            return False
+
+        self.prepare(model, wngrid)
+        if state is not None:
+            self._prepared_state = [np.array(s, copy=True) for s in state]
+            self._prepared_sigma = self.sigma_xsec
+        return True
+
     def finalize(self, model, tau):
         """
         Called in the last phase of the calculation, after the optical
@@ -254,3 +483,59 @@ class Contribution(Fittable, Logger, Writeable):
         """
         contrib = output.create_group(self.__class__.__name__)
         return contrib
+
+
+class FusedContribution(Contribution):
+    """
+    Sum of the cross-sections of several prepared contributions that
+    have the default :func:`contribute_tau` form (see
+    :attr:`Contribution.fusable`). The path integral then runs a single
+    kernel over one buffer instead of one per contribution.
+    The buffer is reused between models when the shape allows.
+
+    """
+
+    def __init__(self):
+        super().__init__('Fused')
+        self.contributions = []
+        self._fused_sigmas = []
+
+    def fuse(self, contributions):
+        """
+        Sums :attr:`~Contribution.sigma` of prepared contributions
+
+        Parameters
+        ----------
+        contributions: :obj:`list` of :class:`Contribution`
+            Prepared contributions to fuse
+
+        """
+        sigmas = [c.sigma_xsec for c in contributions]
+        if self._is_current(contributions, sigmas):
+            return
+        self.contributions = contributions
+        self._fused_sigmas = sigmas
+        dtype = np.result_type(*sigmas)
+        if self.sigma_xsec is None or \
+                self.sigma_xsec.shape != sigmas[0].shape or \
+                self.sigma_xsec.dtype != dtype:
+            self.sigma_xsec = np.empty(sigmas[0].shape, dtype=dtype)
+        np.copyto(self.sigma_xsec, sigmas[0])
+        for sigma in sigmas[1:]:
+            self.sigma_xsec += sigma
+        self._nlayers, self._ngrid = self.sigma_xsec.shape
+        self.debug('Fused %s', [c.name for c in contributions])
+
+    def _is_current(self, contributions, sigmas):
+        """
+        Whether the buffer already holds the sum of ``sigmas``. Only
+        known when every contribution tracks its dependencies, so a
+        cross-section can only change by :func:`prepare` replacing it
+        """
+        return self.sigma_xsec is not None and \
+            len(contributions) == len(self.contributions) and \
+            all(new is old for new, old in zip(contributions,
+                                               self.contributions)) and \
+            all(new is old for new, old in zip(sigmas,
+                                               self._fused_sigmas)) and \
+            all(c.dependencies is not None for c in contributions)
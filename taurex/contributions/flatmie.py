@@ -22,6 +22,8 @@ class FlatMieContribution(Contribution):
 
     """
 
+    dependencies = ('pressure',)
+
     def __init__(self,
                  flat_mix_ratio=1e-10, flat_bottomP=-1,
                  flat_topP=-1):
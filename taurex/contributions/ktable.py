@@ -0,0 +1,248 @@
+from .contribution import Contribution
+import numpy as np
+from taurex.cache import OpacityCache
+from taurex.util.math import resort_rebin_kcoeff
+
+
+class KTableContribution(Contribution):
+    """
+    Computes the contribution to the optical depth from molecular
+    absorption using correlated-k tables
+    (:class:`~taurex.opacity.ktableopacity.KTableOpacity`).
+
+    The model is computed on the bins of the k-tables with every bin
+    repeated for each g-point, and the spectrum is then integrated over g.
+    This replaces hundreds of thousands of cross-section points with
+    ``nbins x ng`` points which is much faster for low resolution data.
+    All *active* molecules must have a k-table and all k-tables must
+    share the same bins and g-points. Other contributions (Rayleigh, CIA,
+    clouds) are evaluated at the centre of each bin. This replaces
+    :class:`~taurex.contributions.absorption.AbsorptionContribution` and
+    cannot be used with it.
+
+    Parameters
+    ----------
+    method: str, optional
+        How the k-distributions of different molecules are combined:
+
+        - ``rorr``: Random overlap with resorting and rebinning
+          (default). After adding each molecule the ``ng*ng``
+          combinations are sorted and rebinned onto the ``ng`` g-points.
+        - ``ro``: Exact random overlap. Every combination of g-points is
+          kept, so the model is computed on ``nbins x ng^nmolecules``
+          points. Only practical for a few molecules or g-points.
+
+    """
+
+    methods = ('rorr', 'ro')
+
+    dependencies = ('temperature', 'pressure', 'chemistry')
+
+    def __init__(self, method='rorr'):
+        super().__init__('KTables')
+        method = method.strip().lower()
+        if method not in self.methods:
+            raise ValueError('Unknown k-table overlap method {}, '
+                             'must be one of {}'.format(method, self.methods))
+        self._method = method
+        self._opacity_cache = OpacityCache()
+
+    @property
+    def method(self):
+        return self._method
+
+    def ktables(self, model):
+        """
+        k-table of each active gas
+        """
+        return [(gas, self._opacity_cache.get_ktable(gas))
+                for gas in model.chemistry.activeGases]
+
+    def build(self, model):
+        """
+        Checks that molecular absorption is not also computed from
+        cross-sections
+
+        Raises
+        ------
+        InvalidModelException
+            If the model also has an
+            :class:`~taurex.contributions.absorption.AbsorptionContribution`
+        """
+        from taurex.exceptions import InvalidModelException
+        from .absorption import AbsorptionContribution
+        for contrib in model.contribution_list:
+            if isinstance(contrib, AbsorptionContribution):
+                self.error('Both k-tables and cross-sections compute the '
+                           'absorption of the active molecules')
+                raise InvalidModelException('KTables and Absorption '
+                                            'contributions cannot be used '
+                                            'together')
+
+    def native_grid(self, model):
+        """
+        Centre of each k-table bin
+
+        Raises
+        ------
+        InvalidModelException
+            If the k-tables do not share the same bins
+        """
+        from taurex.exceptions import InvalidModelException
+        ktables = self.ktables(model)
+        if len(ktables) == 0:
+            return None
+        bin_edges = ktables[0][1].binEdges
+        for gas, ktable in ktables[1:]:
+            if not np.array_equal(ktable.binEdges, bin_edges):
+                self.error('k-table for %s has different bins to %s',
+                           gas, ktables[0][0])
+                raise InvalidModelException('k-tables must share the '
+                                            'same bins')
+        return ktables[0][1].wavenumberGrid
+
+    def quadrature_weights(self, model):
+        """
+        Weight of each g-point, or of each combination of g-points
+        for exact random overlap
+
+        Raises
+        ------
+        InvalidModelException
+            If the k-tables do not share the same g-points
+        """
+        from taurex.exceptions import InvalidModelException
+        ktables = self.ktables(model)
+        if len(ktables) == 0:
+            return None
+        weights = ktables[0][1].weights
+        for gas, ktable in ktables[1:]:
+            if not np.array_equal(ktable.weights, weights):
+                self.error('k-table for %s has different g-points to %s',
+                           gas, ktables[0][0])
+                raise InvalidModelException('k-tables must share the '
+                                            'same g-points')
+        weights = weights/weights.sum()
+        if self._method == 'ro':
+            combined = np.ones(1)
+            for __ in ktables:
+                combined = np.outer(combined, weights).ravel()
+            return combined
+        return weights
+
+    def _bin_range(self, ktable, wngrid, npoints):
+        """
+        Range of bins covered by the (repeated) grid
+        """
+        centres = wngrid[::npoints]
+        bin_start = ktable.wavenumberGrid.searchsorted(centres[0])
+        bin_end = bin_start + centres.shape[0]
+        if not np.array_equal(ktable.wavenumberGrid[bin_start:bin_end],
+                              centres):
+            raise ValueError('Wavenumber grid does not match k-table bins')
+        return bin_start, bin_end
+
+    def _gas_kcoeff(self, model, gas, ktable, wngrid, npoints):
+        """
+        Mixing ratio weighted k-coefficients of a molecule with
+        shape ``(nlayers, nbins, ng)``
+        """
+        bin_start, bin_end = self._bin_range(ktable, wngrid, npoints)
+        gas_mix = model.chemistry.get_gas_mix_profile(gas)
+        kcoeff = ktable.kcoeff_profile(model.temperatureProfile,
+                                       model.pressureProfile,
+                                       bin_start, bin_end)
+        return kcoeff*gas_mix[:, None, None]
+
+    def prepare(self, model, wngrid):
+        """
+        Computes the combined k-coefficients of all active gases on
+        the repeated grid from
+        :func:`~taurex.model.simplemodel.SimpleForwardModel.quadrature_grid`
+
+        Parameters
+        ----------
+        model: :class:`~taurex.model.model.ForwardModel`
+            Forward model
+
+        wngrid: :obj:`array`
+            Wavenumber grid
+
+        """
+        self._ngrid = wngrid.shape[0]
+        self._nlayers = model.nLayers
+        npoints = self.quadrature_weights(model).shape[0]
+
+        combined = None
+        weights = None
+        for gas, ktable in self.ktables(model):
+            self.info('Recomputing active gas %s k-coefficients', gas)
+            kcoeff = self._gas_kcoeff(model, gas, ktable, wngrid, npoints)
+            if combined is None:
+                combined = kcoeff
+                weights = ktable.weights/ktable.weights.sum()
+            elif self._method == 'ro':
+                combined = (combined[..., :, None] +
+                            kcoeff[..., None, :]).reshape(
+                                combined.shape[:2] + (-1,))
+            else:
+                combined = self._resort_rebin(combined, kcoeff, weights)
+
+        if combined is None:
+            self.sigma_xsec = np.zeros(shape=(self._nlayers, self._ngrid))
+        else:
+            self.sigma_xsec = combined.reshape(self._nlayers, self._ngrid)
+
+    @staticmethod
+    def _resort_rebin(k_a, k_b, weights):
+        g_edges = np.concatenate(([0.0], np.cumsum(weights)))
+        shape = k_a.shape
+        out = np.empty(shape, dtype=np.float64)
+        resort_rebin_kcoeff(k_a.reshape(-1, shape[-1]).astype(np.float64),
+                            k_b.reshape(-1, shape[-1]).astype(np.float64),
+                            weights, g_edges, out.reshape(-1, shape[-1]))
+        return out
+
+    def prepare_each(self, model, wngrid):
+        """
+        Computes the k-coefficients of each active gas on its own
+
+        Parameters
+        ----------
+        model: :class:`~taurex.model.model.ForwardModel`
+            Forward model
+
+        wngrid: :obj:`array`
+            Wavenumber grid
+
+        Yields
+        ------
+        component: :obj:`tuple` of type (str, :obj:`array`)
+            Name of molecule and its k-coefficients on the grid
+
+        """
+        self._ngrid = wngrid.shape[0]
+        self._nlayers = model.nLayers
+        npoints = self.quadrature_weights(model).shape[0]
+        ktables = self.ktables(model)
+
+        for idx, (gas, ktable) in enumerate(ktables):
+            kcoeff = self._gas_kcoeff(model, gas, ktable, wngrid, npoints)
+            if self._method == 'ro':
+                # Place along this molecule's axis of the combinations
+                ngauss = ktable.ngauss
+                shape = [self._nlayers, kcoeff.shape[1]] + \
+                    [1]*len(ktables)
+                shape[2 + idx] = ngauss
+                kcoeff = np.broadcast_to(
+                    kcoeff.reshape(shape),
+                    [self._nlayers, kcoeff.shape[1]] +
+                    [ngauss]*len(ktables))
+            self.sigma_xsec = np.ascontiguousarray(kcoeff).reshape(
+                self._nlayers, self._ngrid)
+            yield gas, self.sigma_xsec
+
+    def write(self, output):
+        contrib = super().write(output)
+        contrib.write_string('method', self._method)
+        return contrib
@@ -29,6 +29,8 @@ class LeeMieContribution(Contribution):
 
     """
 
+    dependencies = ('pressure',)
+
     def __init__(self, lee_mie_radius=0.01, lee_mie_q=40,
                  lee_mie_mix_ratio=1e-10, lee_mie_bottomP=-1,
                  lee_mie_topP=-1):
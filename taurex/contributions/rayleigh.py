@@ -7,6 +7,8 @@ class RayleighContribution(Contribution):
     Computes contribution from Rayleigh scattering
     """
 
+    dependencies = ('chemistry',)
+
     def __init__(self):
         super().__init__('Rayleigh')
 
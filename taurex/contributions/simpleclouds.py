@@ -26,6 +26,9 @@ class SimpleCloudsContribution(Contribution):
 
 
     """
+
+    dependencies = ('pressure',)
+
     def __init__(self, clouds_pressure=1e3):
         super().__init__('SimpleClouds')
         self._cloud_pressure = clouds_pressure
@@ -36,7 +39,13 @@ class SimpleCloudsContribution(Contribution):
 
     def contribute(self, model, start_layer, end_layer, density_offset, layer,
                    density, tau, path_length=None):
-        tau[layer] += self.sigma_xsec[layer, :]
+        """
+        Pressure falls with height so a path through layers
+        ``start_layer`` to ``end_layer`` is blocked by the cloud deck
+        only if its lowest layer is
+        """
+        if start_layer < end_layer:
+            tau[layer] += self.sigma_xsec[start_layer+density_offset, :]
 
     def prepare_each(self, model, wngrid):
         """
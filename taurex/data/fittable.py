@@ -76,11 +76,30 @@ def fitparam(f=None, param_name=None, param_latex=None,
     wrapper.default_bounds = default_bounds
     wrapper.default_mode = default_mode
     wrapper.decorated = 'fitparam'
-    pwrap = property(wrapper)
+    pwrap = FitParamProperty(wrapper)
 
     return pwrap
 
 
+class FitParamProperty(property):
+    """
+    Property created by :func:`fitparam`. Its setter also informs the
+    owner that the parameter has changed through
+    :func:`Fittable.fitting_parameter_changed`
+    """
+
+    def setter(self, fset):
+        param_name = self.fget.param_name
+
+        def notify_setter(obj, value):
+            fset(obj, value)
+            notify = getattr(obj, 'fitting_parameter_changed', None)
+            if notify is not None:
+                notify(param_name)
+        notify_setter.__doc__ = fset.__doc__
+        return type(self)(self.fget, notify_setter, self.fdel, self.__doc__)
+
+
 class Fittable(object):
     """
 
@@ -179,14 +198,35 @@ class Fittable(object):
             raise AttributeError(
                 'param name {} already exists'.format(param_name))
 
+        bound_fset = fset.__get__(self)
+
+        def notify_fset(value):
+            bound_fset(value)
+            self.fitting_parameter_changed(param_name)
+
         self._param_dict[param_name] = (param_name,
                                         param_latex,
                                         fget.__get__(self),
-                                        fset.__get__(self),
+                                        notify_fset,
                                         default_mode,
                                         default_fit,
                                         default_bounds)
 
+    def fitting_parameter_changed(self, param_name):
+        """
+        Called after a fitting parameter has been set, either through
+        its ``fset`` or the setter of a :func:`fitparam` property.
+        Does nothing by default, classes that cache values computed
+        from their parameters can override this to invalidate them.
+
+        Parameters
+        ----------
+        param_name: str
+            Name of the parameter that changed
+
+        """
+        pass
+
     def compile_fitparams(self):
         """
         Loops through and finds all fitting parameters in the class and adds
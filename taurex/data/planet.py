@@ -1,3 +1,4 @@
+import numpy as np
 from taurex.log import Logger
 from taurex.constants import G, RJUP, MJUP, AU
 from .fittable import fitparam, Fittable
@@ -130,6 +131,29 @@ class Planet(Fittable, Logger, Writeable):
 
         return (G * self.fullMass) / ((self.fullRadius+height)**2)
 
+    def gravity_law(self):
+        """
+        Compiled form of :func:`gravity_at_height` used by the hydrostatic
+        solver (:func:`~taurex.util.math.hydrostatic_profile`). Planets
+        with a different gravity law should override both, returning a
+        :func:`numba.njit` function of ``(height, params)`` here.
+
+        Returns
+        -------
+        law: function or None
+            Compiled gravity law, ``None`` if only :func:`gravity_at_height`
+            is overridden so the solver must call it instead
+
+        params: :obj:`array`
+            Parameters passed to ``law``
+
+        """
+        from taurex.util.math import point_mass_gravity
+        if type(self).gravity_at_height is not Planet.gravity_at_height:
+            return None, None
+        return point_mass_gravity, np.array([G * self.fullMass,
+                                             self.fullRadius])
+
     def write(self, output):
         planet = output.create_group('Planet')
 
@@ -31,8 +31,7 @@ class Isothermal(TemperatureProfile):
     def isoTemperature(self, value):
         self._iso_temp = value
 
-    @property
-    def profile(self):
+    def compute_profile(self):
         """Returns an isothermal temperature profile
 
         Returns: :obj:`array`
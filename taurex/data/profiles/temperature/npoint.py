@@ -181,8 +181,7 @@ class NPoint(TemperatureProfile):
             self.add_fittable_param(param_name, param_latex, fget_point,
                                     fset_point, 'linear', default_fit, bounds)
 
-    @property
-    def profile(self):
+    def compute_profile(self):
 
         Tnodes = [self._T_surface, *self._t_points, self._T_top]
 
@@ -49,8 +49,7 @@ class Rodgers2000(TemperatureProfile):
         weights = cov_mat[:, :]/cov_mat_sum[:, None]
         return weights.dot(self._T_layers)
 
-    @property
-    def profile(self):
+    def compute_profile(self):
 
         cov_mat = self._covariance
         if cov_mat is None:
@@ -14,8 +14,7 @@ class TemperatureArray(TemperatureProfile):
 
         self._tp_profile = np.array(tp_array)
 
-    @property
-    def profile(self):
+    def compute_profile(self):
         """Returns an isothermal temperature profile
 
         Returns: :obj:np.array(float)
@@ -12,7 +12,12 @@ class TemperatureProfile(Fittable, Logger, Writeable):
 
     Must define:
 
-    - :func:`profile`
+    - :func:`compute_profile`
+
+    The profile is computed once and cached until
+    :func:`initialize_profile` is called or a fitting parameter is set.
+    Subclasses that change what the profile depends on in other ways
+    should call :func:`invalidate_profile`.
 
     Parameters
     ----------
@@ -24,6 +29,7 @@ class TemperatureProfile(Fittable, Logger, Writeable):
     def __init__(self, name):
         Logger.__init__(self, name)
         Fittable.__init__(self)
+        self._profile_cache = None
 
     def initialize_profile(self, planet=None, nlayers=100,
                            pressure_profile=None):
@@ -45,9 +51,33 @@ class TemperatureProfile(Fittable, Logger, Writeable):
         self.nlevels = nlayers+1
         self.pressure_profile = pressure_profile
         self.planet = planet
+        self.invalidate_profile()
+
+    def invalidate_profile(self):
+        """
+        Discards the cached profile so it is computed again on next access
+        """
+        self._profile_cache = None
+
+    def fitting_parameter_changed(self, param_name):
+        self.invalidate_profile()
 
     @property
     def profile(self):
+        """
+        Temperature profile at each layer of the atmosphere, computed
+        by :func:`compute_profile` on first access
+
+        Returns
+        -------
+        temperature: :obj:`array`
+            Temperature in Kelvin
+        """
+        if self._profile_cache is None:
+            self._profile_cache = self.compute_profile()
+        return self._profile_cache
+
+    def compute_profile(self):
         """
         Must return a temperature profile at each layer of the atmosphere
 
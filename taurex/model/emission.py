@@ -1,7 +1,7 @@
 import numpy as np
 from .simplemodel import SimpleForwardModel
 from taurex.constants import PI
-from taurex.util.emission import black_body
+from taurex.util.emission import black_body_profile
 
 
 class EmissionModel(SimpleForwardModel):
@@ -89,6 +89,42 @@ class EmissionModel(SimpleForwardModel):
 
         return last_flux
 
+    def compute_layer_tau(self, density, dz, wngrid_size):
+        """
+        Computes the vertical optical depth through each layer.
+        Contributions that provide
+        :func:`~taurex.contributions.contribution.Contribution.path_opacity`
+        are computed for every layer at once, the rest one layer at a time.
+
+        Parameters
+        ----------
+        density: :obj:`array`
+            Density of each layer
+
+        dz: :obj:`array`
+            Thickness of each layer
+
+        wngrid_size: int
+            Number of wavenumber points
+
+        Returns
+        -------
+        :obj:`array`
+            Optical depth of each layer with shape ``(nlayers, nwn)``
+
+        """
+        total_layers = self.nLayers
+        layer_tau = np.zeros(shape=(total_layers, wngrid_size))
+        for contrib in self.contribution_list:
+            opacity = contrib.path_opacity(self, density)
+            if opacity is not None:
+                layer_tau += opacity*dz[:, None]
+                continue
+            for layer in range(total_layers):
+                contrib.contribute(self, layer, layer+1, 0, 0, density,
+                                   layer_tau[layer:layer+1], path_length=dz)
+        return layer_tau
+
     def path_integral(self, wngrid, return_contrib):
         dz = np.gradient(self.altitudeProfile)
 
@@ -99,50 +135,29 @@ class EmissionModel(SimpleForwardModel):
         total_layers = self.nLayers
 
         temperature = self.temperatureProfile
-        tau = np.zeros(shape=(self.nLayers, wngrid_size))
-        surface_tau = np.zeros(shape=(1, wngrid_size))
 
-        layer_tau = np.zeros(shape=(1, wngrid_size))
+        dtau = self.compute_layer_tau(density, dz, wngrid_size)
+        self.debug('dtau = %s', dtau)
 
-        dtau = np.zeros(shape=(1, wngrid_size))
+        # Optical depth from the bottom of each layer to the top of the
+        # atmosphere, with an extra row of zero for above the top
+        cumulative_tau = np.zeros(shape=(total_layers + 1, wngrid_size))
+        np.cumsum(dtau[::-1], axis=0, out=cumulative_tau[-2::-1])
+        layer_tau = cumulative_tau[1:]
+        self.debug('surface_tau = %s', cumulative_tau[0])
 
-        # Do surface first
-        # for layer in range(total_layers):
-        for contrib in self.contribution_list:
-            contrib.contribute(self, 0, total_layers, 0, 0,
-                               density, surface_tau, path_length=dz)
-        self.debug('density = %s', density[0])
-        self.debug('surface_tau = %s', surface_tau)
+        tau = np.exp(-layer_tau) - np.exp(-dtau)
 
-        BB = black_body(wngrid, temperature[0])/PI
+        BB = black_body_profile(wngrid, temperature)/PI
 
         _mu = 1.0/self._mu_quads[:, None]
         _w = self._wi_quads[:, None]
-        I = BB * (np.exp(-surface_tau*_mu))
-
-        self.debug('I1_pre %s', I)
-        # Loop upwards
-        for layer in range(total_layers):
-            layer_tau[...] = 0.0
-            dtau[...] = 0.0
-            for contrib in self.contribution_list:
-                contrib.contribute(self, layer+1, total_layers,
-                                   0, 0, density, layer_tau, path_length=dz)
-                contrib.contribute(self, layer, layer+1, 0,
-                                   0, density, dtau, path_length=dz)
-
-            _tau = np.exp(-layer_tau) - np.exp(-dtau)
-
-            tau[layer] += _tau[0]
-            # for contrib in self.contribution_list:
-
-            self.debug('Layer_tau[%s]=%s', layer, layer_tau)
-
-            dtau += layer_tau
-            self.debug('dtau[%s]=%s', layer, dtau)
-            BB = black_body(wngrid, temperature[layer])/PI
-            self.debug('BB[%s]=%s,%s', layer, temperature[layer], BB)
-            I += BB * (np.exp(-layer_tau*_mu) - np.exp(-dtau*_mu))
+
+        I = np.empty(shape=(_mu.shape[0], wngrid_size))
+        for idx, mu in enumerate(_mu[:, 0]):
+            transmittance = np.exp(-cumulative_tau*mu)
+            I[idx] = BB[0]*transmittance[0] + \
+                np.sum(BB*(transmittance[1:] - transmittance[:-1]), axis=0)
 
         self.debug('I: %s', I)
 
@@ -1,3 +1,4 @@
+import numpy as np
 from taurex.log import Logger
 from taurex.data.fittable import Fittable
 from taurex.output.writeable import Writeable
@@ -45,10 +46,121 @@ class ForwardModel(Logger, Fittable, Writeable):
         """Computes the forward model for a wngrid"""
         raise NotImplementedError
 
+    def model_batch(self, param_matrix, parameters, wngrid=None,
+                    cutoff_grid=True):
+        """
+        Runs the forward model for many sets of parameters. Each row of
+        ``param_matrix`` is set through the fitting parameters named in
+        ``parameters``, with every spectrum written into a single array.
+        The parameters are restored to their original values afterwards.
+
+        This runs :func:`model` for each row in turn. Models that can
+        share work between rows override it
+        (see :func:`~taurex.model.simplemodel.SimpleForwardModel.model_batch`).
+
+        Parameters
+        ----------
+        param_matrix: :obj:`array`
+            Parameter values with shape ``(nbatch, nparams)``
+
+        parameters: :obj:`list` of str
+            Name of the fitting parameter of each column
+
+        wngrid: :obj:`array`, optional
+            Wavenumber grid, default is to use native grid
+
+        cutoff_grid: bool
+            Run model only on ``wngrid`` given, default is ``True``
+
+        Returns
+        -------
+        native_grid: :obj:`array`
+            Native wavenumber grid, ``None`` if no row is valid
+
+        spectra: :obj:`array`
+            Spectrum of each row with shape ``(nbatch, nwn)``,
+            ``None`` if no row is valid
+
+        valid: :obj:`array`
+            ``False`` for rows where the model raised
+            :class:`~taurex.exceptions.InvalidModelException`, their
+            spectra are ``NaN``
+
+        """
+        from taurex.exceptions import InvalidModelException
+        param_matrix, params = self.batch_parameters(param_matrix,
+                                                     parameters)
+        original = [param[2]() for param in params]
+
+        nbatch = param_matrix.shape[0]
+        native_grid = None
+        spectra = None
+        valid = np.ones(nbatch, dtype=bool)
+        try:
+            for row, values in enumerate(param_matrix):
+                self.set_batch_row(params, values)
+                try:
+                    result = self.model(wngrid=wngrid,
+                                        cutoff_grid=cutoff_grid)
+                except InvalidModelException:
+                    self.debug('Row %s is not a valid model', row)
+                    valid[row] = False
+                    continue
+                if spectra is None:
+                    native_grid = result[0]
+                    spectra = np.full((nbatch,) + result[1].shape, np.nan)
+                spectra[row] = result[1]
+        finally:
+            self.set_batch_row(params, original)
+
+        return native_grid, spectra, valid
+
+    def batch_parameters(self, param_matrix, parameters):
+        """
+        Checks the parameter matrix passed to :func:`model_batch`
+        and finds the fitting parameter of each column
+
+        Returns
+        -------
+        param_matrix: :obj:`array`
+            Parameter matrix with shape ``(nbatch, nparams)``
+
+        params: :obj:`list`
+            Fitting parameter of each column
+
+        """
+        param_matrix = np.atleast_2d(param_matrix)
+        if param_matrix.shape[1] != len(parameters):
+            raise ValueError('Got {} columns for {} parameters'.format(
+                param_matrix.shape[1], len(parameters)))
+        return param_matrix, [self.fittingParameters[name]
+                              for name in parameters]
+
+    @staticmethod
+    def set_batch_row(params, values):
+        """
+        Sets the value of each fitting parameter from
+        :func:`batch_parameters`
+        """
+        for value, param in zip(values, params):
+            param[3](value)
+
     def model_full_contrib(self, wngrid=None, cutoff_grid=True):
         """Computes the forward model for a wngrid for each contribution"""
         raise NotImplementedError
 
+    @property
+    def activeWavenumberRanges(self):
+        """
+        Ranges of wavenumber indices contributions need to compute in the
+        current call to
+        :func:`~taurex.contributions.contribution.Contribution.contribute`
+        as an ``(nranges, 2)`` array of ``[start, stop)`` or ``None`` if
+        all of them are needed. Models can use this to skip wavenumbers
+        whose optical depth is already saturated.
+        """
+        return None
+
     @property
     def fittingParameters(self):
         return self._fitting_parameters
@@ -76,6 +76,11 @@ class SimpleForwardModel(ForwardModel):
 
         self._native_grid = None
 
+        self._fused_contribution = None
+
+        self._density_profile = None
+        self._density_inputs = None
+
     def _compute_inital_mu(self):
         from taurex.data.profiles.chemistry import TaurexChemistry, ConstantGas
         tc = TaurexChemistry()
@@ -194,15 +199,32 @@ class SimpleForwardModel(ForwardModel):
         self.info('Setting up profiles')
         self.initialize_profiles()
 
+        self.info('Loading opacities')
+        self.prefetch_data()
+
         self.info('Setting up contributions')
         for contrib in self.contribution_list:
             contrib.build(self)
         self.info('DONE')
 
+    def prefetch_data(self):
+        """
+        Asks each contribution to concurrently load the data it reads
+        (e.g. cross-sections or CIA pairs) so it is not loaded one
+        file after another on first use. Only data a contribution uses
+        is loaded, a model with only correlated-k tables does not load
+        any cross-sections.
+        """
+        for contrib in self.contribution_list:
+            contrib.prefetch_data(self)
+
     # altitude, gravity and scale height profile
     def _compute_altitude_gravity_scaleheight_profile(self, mu_profile=None):
         """
-        Computes altitude, gravity and scale height of the atmosphere.
+        Computes altitude, gravity and scale height of the atmosphere
+        with :func:`~taurex.util.math.hydrostatic_profile` using the
+        gravity law of the planet
+        (:func:`~taurex.data.planet.Planet.gravity_law`).
         Only call after :func:`build` has been called at least once.
 
         Parameters
@@ -213,34 +235,30 @@ class SimpleForwardModel(ForwardModel):
         """
 
         from taurex.constants import KBOLTZ
+        from taurex.util.math import hydrostatic_profile
         if mu_profile is None:
             mu_profile = self._chemistry.muProfile
 
-        # build the altitude profile from the bottom up
-        nlayers = self.pressure.nLayers
-        H = np.zeros(nlayers)
-        g = np.zeros(nlayers)
-        z = np.zeros(nlayers)
-
-        # surface gravity (0th layer)
-        g[0] = self._planet.gravity
-        # scaleheight at the surface (0th layer)
-        H[0] = (KBOLTZ*self.temperatureProfile[0])/(mu_profile[0]*g[0])
-
-        for i in range(1, nlayers):
-            deltaz = (-1.)*H[i-1]*np.log(
-                self.pressure.pressure_profile_levels[i] /
-                self.pressure.pressure_profile_levels[i-1])
-
-            z[i] = z[i-1] + deltaz  # altitude at the i-th layer
-
-            with np.errstate(over='ignore'):
-                # gravity at the i-th layer
-                g[i] = self._planet.gravity_at_height(z[i])
-                self.debug('G[%s] = %s', i, g[i])
-
-            with np.errstate(divide='ignore'):
-                H[i] = (KBOLTZ*self.temperatureProfile[i])/(mu_profile[i]*g[i])
+        pressure_levels = np.ascontiguousarray(
+            self.pressure.pressure_profile_levels, dtype=np.float64)
+        temperature = np.ascontiguousarray(self.temperatureProfile,
+                                           dtype=np.float64)
+        mu_profile = np.ascontiguousarray(mu_profile, dtype=np.float64)
+
+        gravity_law, gravity_params = self._planet.gravity_law()
+        if gravity_law is not None:
+            z, g, H = hydrostatic_profile(pressure_levels, temperature,
+                                          mu_profile, KBOLTZ, gravity_law,
+                                          gravity_params)
+        else:
+            # Gravity only available from Python, so run the same
+            # integration uncompiled
+            def planet_gravity(height, params):
+                return self._planet.gravity_at_height(height)
+            with np.errstate(over='ignore', divide='ignore'):
+                z, g, H = hydrostatic_profile.py_func(
+                    pressure_levels, temperature, mu_profile, KBOLTZ,
+                    planet_gravity, None)
 
         self.altitude_profile = z
         self.scaleheight_profile = H
@@ -263,10 +281,18 @@ class SimpleForwardModel(ForwardModel):
     @property
     def densityProfile(self):
         """
-        Atmospheric density profile in m-3
+        Atmospheric density profile in m-3. Only recomputed when the
+        pressure or temperature profile is a different array
         """
         from taurex.constants import KBOLTZ
-        return (self.pressureProfile)/(KBOLTZ*self.temperatureProfile)
+        pressure = self.pressureProfile
+        temperature = self.temperatureProfile
+        if self._density_inputs is None or \
+                self._density_inputs[0] is not pressure or \
+                self._density_inputs[1] is not temperature:
+            self._density_profile = pressure/(KBOLTZ*temperature)
+            self._density_inputs = (pressure, temperature)
+        return self._density_profile
 
     @property
     def altitudeProfile(self):
@@ -322,7 +348,9 @@ class SimpleForwardModel(ForwardModel):
         """
 
         Searches through active molecules to determine the
-        native wavenumber grid
+        native wavenumber grid. Contributions that impose their own grid
+        (see :func:`~taurex.contributions.contribution.Contribution.native_grid`)
+        take precedence.
 
         Returns
         -------
@@ -338,6 +366,11 @@ class SimpleForwardModel(ForwardModel):
         from taurex.exceptions import InvalidModelException
         from taurex.cache.opacitycache import OpacityCache
 
+        for contrib in self.contribution_list:
+            grid = contrib.native_grid(self)
+            if grid is not None:
+                return grid
+
         active_gases = self.chemistry.activeGases
 
         wavenumbergrid = \
@@ -394,18 +427,311 @@ class SimpleForwardModel(ForwardModel):
         if wngrid is not None and cutoff_grid:
             native_grid = clip_native_to_wngrid(native_grid, wngrid)
 
+        weights = self.quadrature_weights()
+        model_grid = self.quadrature_grid(native_grid, weights)
+
         # Initialize star
-        self._star.initialize(native_grid)
+        self._star.initialize(model_grid)
 
         # Prepare contributions
         for contrib in self.contribution_list:
-            contrib.prepare(self, native_grid)
+            contrib.prepare_if_changed(self, model_grid)
 
-        # Compute path integral
-        absorp, tau = self.path_integral(native_grid, False)
+        absorp, tau = self.integrate_contributions(native_grid, model_grid,
+                                                   weights)
 
         return native_grid, absorp, tau, None
 
+    def integrate_contributions(self, native_grid, model_grid, weights):
+        """
+        Computes the path integral of the prepared contributions with
+        fusable contributions summed together and integrates it over any
+        quadrature points
+
+        Parameters
+        ----------
+        native_grid: :obj:`array`
+            Wavenumber grid of the spectrum
+
+        model_grid: :obj:`array`
+            Grid the contributions were prepared on
+            (see :func:`quadrature_grid`)
+
+        weights: :obj:`array` or None
+            Quadrature weights from :func:`quadrature_weights`
+
+        Returns
+        -------
+        depth: :obj:`array`
+            Resulting depth
+
+        tau: :obj:`array`
+            Optical depth.
+
+        """
+        full_contrib_list = self.contribution_list
+        self.contribution_list = self.fuse_contributions(full_contrib_list)
+        try:
+            absorp, tau = self.path_integral(model_grid, False)
+        finally:
+            self.contribution_list = full_contrib_list
+
+        absorp, tau = self.integrate_quadrature(absorp, tau, weights)
+        self.restore_star_grid(native_grid, weights)
+        return absorp, tau
+
+    def model_batch(self, param_matrix, parameters, wngrid=None,
+                    cutoff_grid=True):
+        """
+        Runs the forward model for many sets of parameters (see
+        :func:`~taurex.model.model.ForwardModel.model_batch`) in two
+        passes. The first computes the profiles of every row, stacked
+        along a leading batch axis, and contributions that support it
+        interpolate their cross-sections for the whole batch at once
+        (:func:`~taurex.contributions.contribution.Contribution.prepare_batch`).
+        The second recomputes the profiles of each row and integrates it
+        with those cross-sections. The batched cross-sections use
+        ``nbatch x nlayers x nwn`` of memory, split large batches to
+        bound it.
+
+        Parameters
+        ----------
+        param_matrix: :obj:`array`
+            Parameter values with shape ``(nbatch, nparams)``
+
+        parameters: :obj:`list` of str
+            Name of the fitting parameter of each column
+
+        wngrid: :obj:`array`, optional
+            Wavenumber grid, default is to use native grid
+
+        cutoff_grid: bool
+            Run model only on ``wngrid`` given, default is ``True``
+
+        Returns
+        -------
+        native_grid: :obj:`array`
+            Native wavenumber grid, ``None`` if no row is valid
+
+        spectra: :obj:`array`
+            Spectrum of each row with shape ``(nbatch, nwn)``,
+            ``None`` if no row is valid
+
+        valid: :obj:`array`
+            ``False`` for rows where the model raised
+            :class:`~taurex.exceptions.InvalidModelException`, their
+            spectra are ``NaN``
+
+        """
+        from taurex.exceptions import InvalidModelException
+        param_matrix, params = self.batch_parameters(param_matrix,
+                                                     parameters)
+        original = [param[2]() for param in params]
+
+        nbatch = param_matrix.shape[0]
+        valid = np.ones(nbatch, dtype=bool)
+        batched = {}
+        try:
+            # Profiles of every row along a batch axis
+            temperature, pressure, active_gases, gas_mix = [], [], [], {}
+            for row, values in enumerate(param_matrix):
+                self.set_batch_row(params, values)
+                try:
+                    self.initialize_profiles()
+                except InvalidModelException:
+                    self.debug('Row %s is not a valid model', row)
+                    valid[row] = False
+                    continue
+                temperature.append(np.array(self.temperatureProfile))
+                pressure.append(np.array(self.pressureProfile))
+                chemistry = self.chemistry
+                active_gases.append(list(chemistry.activeGases))
+                for gas in chemistry.activeGases:
+                    gas_mix.setdefault(gas, []).append(
+                        np.array(chemistry.get_gas_mix_profile(gas)))
+
+            rows = np.flatnonzero(valid)
+            if rows.shape[0] == 0:
+                return None, None, valid
+
+            native_grid = self.nativeWavenumberGrid
+            if wngrid is not None and cutoff_grid:
+                native_grid = clip_native_to_wngrid(native_grid, wngrid)
+            weights = self.quadrature_weights()
+            model_grid = self.quadrature_grid(native_grid, weights)
+
+            # Gas mixing ratios are only batched if every row has the
+            # same active gases
+            if all(gases == active_gases[0] for gases in active_gases):
+                gas_mix = {gas: np.stack(mix) for gas, mix in gas_mix.items()}
+            else:
+                gas_mix = None
+            temperature = np.stack(temperature)
+            pressure = np.stack(pressure)
+            for contrib in self.contribution_list:
+                sigma = contrib.prepare_batch(self, model_grid, temperature,
+                                              pressure, gas_mix)
+                if sigma is not None:
+                    batched[contrib] = sigma
+
+            # Integrate each row with its batched cross-sections
+            spectra = None
+            for idx, row in enumerate(rows):
+                self.set_batch_row(params, param_matrix[row])
+                try:
+                    self.initialize_profiles()
+                    self._star.initialize(model_grid)
+                    for contrib in self.contribution_list:
+                        if contrib in batched:
+                            contrib.sigma_xsec = batched[contrib][idx]
+                        else:
+                            contrib.prepare_if_changed(self, model_grid)
+                    absorp, _ = self.integrate_contributions(
+                        native_grid, model_grid, weights)
+                except InvalidModelException:
+                    self.debug('Row %s is not a valid model', row)
+                    valid[row] = False
+                    continue
+                if spectra is None:
+                    spectra = np.full((nbatch,) + absorp.shape, np.nan)
+                spectra[row] = absorp
+        finally:
+            # Batched cross-sections are released, the next model
+            # prepares them again
+            for contrib in batched:
+                contrib.sigma_xsec = None
+            self.set_batch_row(params, original)
+
+        if spectra is None:
+            native_grid = None
+        return native_grid, spectra, valid
+
+    def dependency_state(self, name):
+        """
+        Current value of model state that contributions can depend on
+        (see
+        :attr:`~taurex.contributions.contribution.Contribution.dependencies`)
+
+        Parameters
+        ----------
+        name: str
+            One of ``temperature``, ``pressure``, ``density``,
+            ``altitude`` or ``chemistry``
+
+        Returns
+        -------
+        :obj:`list`
+            Values making up the state
+
+        """
+        if name == 'temperature':
+            return [self.temperatureProfile]
+        elif name == 'pressure':
+            return [self.pressureProfile]
+        elif name == 'density':
+            return [self.densityProfile]
+        elif name == 'altitude':
+            return [self.altitudeProfile]
+        elif name == 'chemistry':
+            chemistry = self.chemistry
+            return [chemistry.activeGases, chemistry.activeGasMixProfile,
+                    chemistry.inactiveGases, chemistry.inactiveGasMixProfile]
+        else:
+            raise KeyError('Unknown model state {}'.format(name))
+
+    def fuse_contributions(self, contributions):
+        """
+        Replaces the prepared contributions that have the default
+        ``sigma*density*path`` form with a single
+        :class:`~taurex.contributions.contribution.FusedContribution`
+        summing their cross-sections. Others, such as CIA and clouds,
+        are kept as they are.
+
+        Parameters
+        ----------
+        contributions: :obj:`list`
+            Prepared contributions
+
+        Returns
+        -------
+        :obj:`list`
+            Contributions to integrate
+
+        """
+        from taurex.contributions import FusedContribution
+        fusable = [c for c in contributions if c.fusable]
+        if len(fusable) < 2:
+            return contributions
+        if self._fused_contribution is None:
+            self._fused_contribution = FusedContribution()
+        fused = self._fused_contribution
+        fused.fuse(fusable)
+
+        result = []
+        for contrib in contributions:
+            if not contrib.fusable:
+                result.append(contrib)
+            elif contrib is fusable[0]:
+                result.append(fused)
+        return result
+
+    def quadrature_weights(self):
+        """
+        Weights of the quadrature points contributions integrate over
+        in each spectral bin, e.g. the g-points of correlated-k tables,
+        or ``None`` if there are none
+
+        Raises
+        ------
+        InvalidModelException
+            If contributions use different quadratures
+        """
+        from taurex.exceptions import InvalidModelException
+        weights = None
+        for contrib in self.contribution_list:
+            contrib_weights = contrib.quadrature_weights(self)
+            if contrib_weights is None:
+                continue
+            if weights is not None and \
+                    not np.array_equal(weights, contrib_weights):
+                self.error('Contributions use different quadratures')
+                raise InvalidModelException('Contributions use different '
+                                            'quadratures')
+            weights = contrib_weights
+        return weights
+
+    @staticmethod
+    def quadrature_grid(native_grid, weights):
+        """
+        Grid the model is computed on, each point of ``native_grid``
+        is repeated for every quadrature point
+        """
+        if weights is None:
+            return native_grid
+        return np.repeat(native_grid, weights.shape[0])
+
+    def integrate_quadrature(self, absorp, tau, weights):
+        """
+        Integrates the spectrum and optical depth computed on the grid from
+        :func:`quadrature_grid` over the quadrature points of each bin.
+        Both depend linearly on the transmittance of each point so this is
+        exact for correlated-k.
+        """
+        if weights is None:
+            return absorp, tau
+        nweights = weights.shape[0]
+        absorp = absorp.reshape(-1, nweights).dot(weights)
+        tau = tau.reshape(tau.shape[0], -1, nweights).dot(weights)
+        return absorp, tau
+
+    def restore_star_grid(self, native_grid, weights):
+        """
+        Puts the star back on the returned grid after computing
+        on a quadrature grid
+        """
+        if weights is not None:
+            self._star.initialize(native_grid)
+
     def model_contrib(self, wngrid=None, cutoff_grid=True):
         """
         Models each contribution seperately
@@ -423,15 +749,21 @@ class SimpleForwardModel(ForwardModel):
         if wngrid is not None and cutoff_grid:
             native_grid = clip_native_to_wngrid(native_grid, wngrid)
 
+        weights = self.quadrature_weights()
+        model_grid = self.quadrature_grid(native_grid, weights)
+
         # Initialize star
-        self._star.initialize(native_grid)
+        self._star.initialize(model_grid)
 
         for contrib in full_contrib_list:
             self.contribution_list = [contrib]
-            contrib.prepare(self, native_grid)
-            absorp, tau = self.path_integral(native_grid, False)
+            contrib.prepare(self, model_grid)
+            absorp, tau = self.path_integral(model_grid, False)
+            absorp, tau = self.integrate_quadrature(absorp, tau, weights)
             all_contrib_dict[contrib.name] = (absorp, tau, None)
 
+        self.restore_star_grid(native_grid, weights)
+
         self.contribution_list = full_contrib_list
         return native_grid, all_contrib_dict
 
@@ -447,7 +779,9 @@ class SimpleForwardModel(ForwardModel):
             native_grid = clip_native_to_wngrid(native_grid, wngrid)
 
         self.initialize_profiles()
-        self._star.initialize(native_grid)
+        weights = self.quadrature_weights()
+        model_grid = self.quadrature_grid(native_grid, weights)
+        self._star.initialize(model_grid)
 
         result_dict = {}
 
@@ -461,14 +795,16 @@ class SimpleForwardModel(ForwardModel):
             contrib_name = contrib.name
             contrib_res_list = []
 
-            for name, __ in contrib.prepare_each(self, native_grid):
+            for name, __ in contrib.prepare_each(self, model_grid):
                 self.info('\t%s---%s contribtuion', contrib_name, name)
-                absorp, tau = self.path_integral(native_grid, False)
+                absorp, tau = self.path_integral(model_grid, False)
+                absorp, tau = self.integrate_quadrature(absorp, tau, weights)
                 contrib_res_list.append((name, absorp, tau, None))
 
             result_dict[contrib_name] = contrib_res_list
 
         self.contribution_list = full_contrib_list
+        self.restore_star_grid(native_grid, weights)
         return native_grid, result_dict
 
     def compute_error(self, samples, wngrid=None, binner=None):
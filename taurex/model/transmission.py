@@ -38,8 +38,34 @@ class TransmissionModel(SimpleForwardModel):
     atm_max_pressure: float, optional
         Pressure at BOA. Used if ``pressure_profile`` is not defined.
 
+    path_integral_mode: str, optional
+        How the optical depth along each line of sight is computed:
+
+        - ``layer``: Each contribution integrates one layer at a time
+          (default)
+        - ``matrix``: The path lengths form an ``(nlayers, nlayers)``
+          matrix and contributions are summed into a single opacity so
+          the optical depth is one (multithreaded) matrix product.
+          Contributions that cannot be written as a path integral
+          are still computed a layer at a time.
+
+    saturation_threshold: float, optional
+        In ``layer`` mode, once the optical depth at a wavenumber exceeds
+        this value the deeper layers are not integrated at that
+        wavenumber and take the optical depth of the layer above.
+        This assumes the optical depth of a line of sight is never below
+        that of the line of sight above it. Deeper lines of sight have
+        shorter paths through the upper layers, so this does not hold
+        when the opacity is concentrated high in the atmosphere, e.g. a
+        high-altitude haze. When it holds the error in the transmittance
+        is below ``exp(-saturation_threshold)``. Default is ``None``,
+        every wavenumber of every layer is integrated (``none`` in input
+        files).
+
     """
 
+    path_integral_modes = ('layer', 'matrix')
+
     def __init__(self,
                  planet=None,
                  star=None,
@@ -48,7 +74,9 @@ class TransmissionModel(SimpleForwardModel):
                  chemistry=None,
                  nlayers=100,
                  atm_min_pressure=1e-4,
-                 atm_max_pressure=1e6):
+                 atm_max_pressure=1e6,
+                 path_integral_mode='layer',
+                 saturation_threshold=None):
 
         super().__init__(self.__class__.__name__, planet,
                          star,
@@ -59,32 +87,123 @@ class TransmissionModel(SimpleForwardModel):
                          atm_min_pressure,
                          atm_max_pressure)
 
-    def compute_path_length(self, dz):
-
-        dl = []
-
+        self.pathIntegralMode = path_integral_mode
+        self.saturationThreshold = saturation_threshold
+        self._active_ranges = None
+
+    @property
+    def pathIntegralMode(self):
+        """
+        Method used to compute the optical depth, see
+        ``path_integral_mode``
+        """
+        return self._path_integral_mode
+
+    @pathIntegralMode.setter
+    def pathIntegralMode(self, value):
+        value = value.strip().lower()
+        if value not in self.path_integral_modes:
+            raise ValueError('Unknown path integral mode {}, must be one '
+                             'of {}'.format(value, self.path_integral_modes))
+        self._path_integral_mode = value
+
+    @property
+    def saturationThreshold(self):
+        """
+        Optical depth above which deeper layers are no longer integrated
+        """
+        return self._saturation_threshold
+
+    @saturationThreshold.setter
+    def saturationThreshold(self, value):
+        if value is False or (isinstance(value, str) and
+                              value.strip().lower() == 'none'):
+            value = None
+        self._saturation_threshold = None if value is None else float(value)
+
+    @property
+    def activeWavenumberRanges(self):
+        """
+        Wavenumbers not yet saturated in the layer being integrated
+        """
+        return self._active_ranges
+
+    range_overhead = 8
+    """Cost of skipping to the next range of unsaturated wavenumbers
+    relative to integrating a single wavenumber"""
+
+    def compute_active_ranges(self, unsaturated):
+        """
+        Ranges of unsaturated wavenumbers to integrate. ``None`` if it is
+        cheaper to integrate every wavenumber, which is the case when
+        few are saturated or they are too scattered.
+
+        Parameters
+        ----------
+        unsaturated: :obj:`array`
+            Boolean array of wavenumbers still to integrate
+
+        Returns
+        -------
+        :obj:`array` or None
+            ``(nranges, 2)`` array of ``[start, stop)``
+
+        """
+        edges = np.diff(unsaturated.astype(np.int8), prepend=0, append=0)
+        starts = np.flatnonzero(edges == 1)
+        cost = np.count_nonzero(unsaturated) + \
+            self.range_overhead*starts.shape[0]
+        if cost >= unsaturated.shape[0]:
+            return None
+        return np.stack((starts, np.flatnonzero(edges == -1)), axis=1)
+
+    def compute_path_length_matrix(self, dz):
+        """
+        Computes the path length through every layer of the line of sight
+        grazing each layer
+
+        Parameters
+        ----------
+        dz: :obj:`array`
+            Thickness of each layer
+
+        Returns
+        -------
+        :obj:`array`
+            Upper triangular matrix where element ``[layer, k]`` is the
+            path length through layer ``k`` of the line of sight at
+            ``layer``
+
+        """
         planet_radius = self._planet.fullRadius
-        total_layers = self.nLayers
 
         z = self.altitudeProfile
         self.debug('Computing path_length: \n z=%s \n dz=%s', z, dz)
 
-        for layer in range(0, total_layers):
+        p = (planet_radius + dz[0]/2 + z)**2
+        top = (planet_radius + dz[0]/2 + z + dz/2)**2
 
-            p = (planet_radius+dz[0]/2 + z[layer])**2
-            k = np.zeros(shape=(self.nLayers-layer))
-            k[0] = np.sqrt((planet_radius + dz[0]/2. + z[layer] +
-                            dz[layer]/2.)**2 - p)
+        # Distance along the line of sight to the top of each layer
+        chord = np.sqrt(np.maximum(top[None, :] - p[:, None], 0.0))
+        chord = np.triu(chord)
 
-            k[1:] = np.sqrt((planet_radius + dz[0]/2 + z[layer+1:] +
-                             dz[layer+1:]/2)**2 - p)
+        return 2.0*np.diff(chord, axis=1, prepend=0.0)
 
-            k[1:] -= np.sqrt((planet_radius + dz[0]/2 +
-                              z[layer:self.nLayers-1] +
-                              dz[layer:self.nLayers-1]/2)**2 - p)
+    def compute_path_length(self, dz):
+        """
+        Computes the path length through each layer of the line of sight
+        grazing each layer
+
+        Returns
+        -------
+        :obj:`list` of :obj:`array`
+            For each layer, the path lengths through it and the layers
+            above it
 
-            dl.append(k*2.0)
-        return dl
+        """
+        path_matrix = self.compute_path_length_matrix(dz)
+        return [path_matrix[layer, layer:]
+                for layer in range(self.nLayers)]
 
     def path_integral(self, wngrid, return_contrib):
 
@@ -92,36 +211,106 @@ class TransmissionModel(SimpleForwardModel):
 
         wngrid_size = wngrid.shape[0]
 
-        path_length = self.compute_path_length(dz)
-
         density_profile = self.densityProfile
 
         total_layers = self.nLayers
 
-        path_length = self.compute_path_length(dz)
+        path_matrix = self.compute_path_length_matrix(dz)
+        path_length = [path_matrix[layer, layer:]
+                       for layer in range(total_layers)]
         self.path_length = path_length
 
+        if self._path_integral_mode == 'matrix':
+            tau = self.matrix_path_integral(path_matrix, density_profile,
+                                            wngrid_size)
+            absorption, tau = self.compute_absorption(tau, dz)
+            return absorption, tau
+
         tau = np.zeros(shape=(total_layers, wngrid_size), dtype=np.float64)
 
-        for layer in range(total_layers):
+        threshold = self._saturation_threshold
+        saturated = None
 
-            self.debug('Computing layer %s', layer)
-            dl = path_length[layer]
+        # Work down from the top so saturated wavenumbers can be skipped
+        try:
+            for layer in reversed(range(total_layers)):
 
-            endK = total_layers-layer
+                self.debug('Computing layer %s', layer)
+                dl = path_length[layer]
 
-            for contrib in self.contribution_list:
-                if tau[layer].min() > 10:
-                    break
-                self.debug('Adding contribution from %s', contrib.name)
-                contrib.contribute(self, 0, endK, layer, layer,
-                                   density_profile, tau, path_length=dl)
+                endK = total_layers-layer
+
+                if saturated is None or not saturated.all():
+                    for contrib in self.contribution_list:
+                        self.debug('Adding contribution from %s',
+                                   contrib.name)
+                        contrib.contribute(self, 0, endK, layer, layer,
+                                           density_profile, tau,
+                                           path_length=dl)
+
+                if saturated is not None:
+                    tau[layer, saturated] = tau[layer+1, saturated]
+
+                if threshold is not None:
+                    saturated = tau[layer] > threshold
+                    self._active_ranges = \
+                        self.compute_active_ranges(~saturated)
+        finally:
+            self._active_ranges = None
 
         self.debug('tau %s %s', tau, tau.shape)
 
         absorption, tau = self.compute_absorption(tau, dz)
         return absorption, tau
 
+    def matrix_path_integral(self, path_matrix, density_profile,
+                             wngrid_size):
+        """
+        Computes the optical depth of every layer with a single
+        matrix product of the path lengths and the sum of
+        :func:`~taurex.contributions.contribution.Contribution.path_opacity`
+        of all contributions.
+
+        Parameters
+        ----------
+        path_matrix: :obj:`array`
+            Path lengths from :func:`compute_path_length_matrix`
+
+        density_profile: :obj:`array`
+            Density of each layer
+
+        wngrid_size: int
+            Number of wavenumber points
+
+        Returns
+        -------
+        :obj:`array`
+            Optical depth with shape ``(nlayers, nwn)``
+
+        """
+        total_layers = self.nLayers
+        opacity = np.zeros(shape=(total_layers, wngrid_size),
+                           dtype=np.float64)
+        remaining = []
+        for contrib in self.contribution_list:
+            contrib_opacity = contrib.path_opacity(self, density_profile)
+            if contrib_opacity is None:
+                remaining.append(contrib)
+            else:
+                self.debug('Adding contribution from %s', contrib.name)
+                opacity += contrib_opacity
+
+        tau = path_matrix.dot(opacity)
+
+        for contrib in remaining:
+            self.debug('Adding contribution from %s by layer',
+                       contrib.name)
+            for layer in range(total_layers):
+                contrib.contribute(self, 0, total_layers-layer, layer, layer,
+                                   density_profile, tau,
+                                   path_length=path_matrix[layer, layer:])
+        return tau
+
     def compute_absorption(self, tau, dz):
 
         tau = np.exp(-tau)
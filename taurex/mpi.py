@@ -108,3 +108,97 @@ def only_master_rank(f):
         if get_rank() == 0:
             return f(*args, **kwargs)
     return wrapper
+
+
+@lru_cache(maxsize=2)
+def shared_comm():
+    """Gets the communicator of all processes on the same node
+    (sharing memory) or returns None if mpi is not installed
+
+    Returns
+    -------
+    :obj:`MPI.Intracomm`:
+        Node communicator or None if MPI is not installed
+
+    """
+    try:
+        from mpi4py import MPI
+    except ImportError:
+        return None
+
+    return MPI.COMM_WORLD.Split_type(MPI.COMM_TYPE_SHARED)
+
+
+def shared_rank():
+    """Gets rank of process within its node or returns 0 if
+    mpi is not installed
+
+    Returns
+    -------
+    int:
+        Node rank of process or 0 if MPI is not installed
+
+    """
+    comm = shared_comm()
+    if comm is None:
+        return 0
+    return comm.Get_rank()
+
+
+def shared_barrier():
+    """Synchronises processes on the same node"""
+    comm = shared_comm()
+    if comm is not None:
+        comm.Barrier()
+
+
+def allocate_shared_array(shape, dtype):
+    """Allocates an array in an MPI-3 shared memory window that is
+    shared by all processes on the same node. The memory is owned by the
+    first rank on the node and all others get a zero-copy view of it.
+    This is collective over the node so all processes must call it
+    in the same order.
+
+    If MPI is not installed a normal array is allocated.
+
+    Parameters
+    ----------
+    shape: tuple
+        Shape of array
+
+    dtype:
+        Data type of array
+
+    Returns
+    -------
+    window: :obj:`MPI.Win`
+        Shared window, pass to :func:`free_shared_array` to release.
+        None if MPI is not installed
+
+    array: :obj:`array`
+        View of the shared memory
+
+    """
+    import numpy as np
+    dtype = np.dtype(dtype)
+    comm = shared_comm()
+    if comm is None:
+        return None, np.empty(shape, dtype=dtype)
+
+    from mpi4py import MPI
+    nbytes = int(np.prod(shape))*dtype.itemsize
+    if comm.Get_rank() != 0:
+        nbytes = 0
+
+    window = MPI.Win.Allocate_shared(nbytes, dtype.itemsize, comm=comm)
+    buf, itemsize = window.Shared_query(0)
+    array = np.ndarray(buffer=buf, dtype=dtype, shape=shape)
+
+    return window, array
+
+
+def free_shared_array(window):
+    """Releases memory from :func:`allocate_shared_array`.
+    Collective over the node."""
+    if window is not None:
+        window.Free()
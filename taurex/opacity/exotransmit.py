@@ -16,52 +16,114 @@ class ExoTransmitOpacity(InterpolatingOpacity):
         self.in_memory = in_memory
         self._load_exo_transmit(filename)
 
+    sidecar_extension = '.trxcache'
+    """Extension of the binary copy written next to the text file"""
+
+    def sidecar_candidates(self, filename):
+        """
+        Locations the binary copy may be stored in, next to the
+        file or in the user cache directory if that is not writable
+        """
+        import hashlib
+        import os
+        from taurex.util.util import user_cache_dir
+        filename = os.path.abspath(filename)
+        digest = hashlib.sha1(filename.encode('utf-8')).hexdigest()[:16]
+        fallback = os.path.join(user_cache_dir(), 'exotransmit',
+                                '{}_{}{}'.format(pathlib.Path(filename).stem,
+                                                 digest,
+                                                 self.sidecar_extension))
+        return [filename + self.sidecar_extension, fallback]
+
     def _load_exo_transmit(self, filename):
+        from taurex.util.util import file_signature
         self.debug('Loading opacity from {}'.format(filename))
 
-        with open(filename, 'r') as f:
-            lines = f.readlines()
-
-        self._temperature_grid = np.array(
-            [float(l) for l in lines[0].split()])  # *t_conversion
-
-        self._pressure_grid = np.array(
-            [float(l) for l in lines[1].split()])*1e5
+        signature = file_signature(filename)
+        if not self._load_sidecar(filename, signature):
+            self._parse_exo_transmit(filename)
+            self._write_sidecar(filename, signature)
 
         self._min_pressure = self._pressure_grid.min()
         self._max_pressure = self._pressure_grid.max()
         self._min_temperature = self._temperature_grid.min()
         self._max_temperature = self._temperature_grid.max()
-
-        wn_grid = []
-
-        for ln in lines[2:]:
-            arr = np.array([float(l) for l in ln.split()])
-            if arr.shape[0] == 1:
-                wn_grid.append(10000*1e-6/arr[0])
-
-        wn_grid = np.array(wn_grid)
-
+        self._resolution = np.average(np.diff(self._wavenumber_grid))
+
+    def _load_sidecar(self, filename, signature):
+        """
+        Loads the binary copy if one exists for this version of the file
+        """
+        from taurex.util.arrayfile import read_array_file
+        for sidecar in self.sidecar_candidates(filename):
+            try:
+                arrays, attrs = read_array_file(sidecar,
+                                                mmap=not self.in_memory)
+            except (OSError, ValueError):
+                continue
+            if attrs.get('signature') != signature:
+                continue
+            self.debug('Using binary copy %s', sidecar)
+            self._temperature_grid = np.array(arrays['t'])
+            self._pressure_grid = np.array(arrays['p'])
+            self._wavenumber_grid = np.array(arrays['wno'])
+            self._xsec_grid = arrays['xsecarr']
+            return True
+        return False
+
+    def _write_sidecar(self, filename, signature):
+        """
+        Writes a binary copy so later loads skip parsing
+        """
+        import os
+        from taurex.util.arrayfile import write_array_file
+        arrays = {'t': self._temperature_grid,
+                  'p': self._pressure_grid,
+                  'wno': self._wavenumber_grid,
+                  'xsecarr': self._xsec_grid}
+        for sidecar in self.sidecar_candidates(filename):
+            try:
+                os.makedirs(os.path.dirname(sidecar), exist_ok=True)
+                write_array_file(sidecar, arrays,
+                                 attrs={'signature': signature})
+            except OSError:
+                continue
+            self.debug('Wrote binary copy to %s', sidecar)
+            return
+        self.warning('Could not write binary copy of %s', filename)
+
+    def _parse_exo_transmit(self, filename):
+        """
+        Parses the text file. The file is the temperature grid, the
+        pressure grid in bar and then for each wavelength (in m) a line
+        holding the wavelength followed by a line for each pressure
+        holding the pressure and the cross-section at each temperature.
+        As every block has the same size the whole body is read in one
+        pass and reshaped.
+        """
+        with open(filename, 'r') as f:
+            self._temperature_grid = np.array(f.readline().split(),
+                                              dtype=np.float64)
+            self._pressure_grid = np.array(f.readline().split(),
+                                           dtype=np.float64)*1e5
+            body = np.fromstring(f.read(), sep=' ')
+
+        ntemp = self._temperature_grid.shape[0]
+        npress = self._pressure_grid.shape[0]
+        block_size = 1 + npress*(1 + ntemp)
+        if body.shape[0] % block_size != 0:
+            raise ValueError('{} is not a valid ExoTransmit file, expected '
+                             'blocks of {} values'.format(filename,
+                                                          block_size))
+        blocks = body.reshape(-1, block_size)
+
+        wn_grid = 10000*1e-6/blocks[:, 0]
         grid_sort = wn_grid.argsort()
         self._wavenumber_grid = wn_grid[grid_sort]
 
-        pressure_count = 0
-        lambda_count = -1
-        self._xsec_grid = np.empty(shape=(self.pressureGrid.shape[0],
-                                          self.temperatureGrid.shape[0],
-                                          self.wavenumberGrid.shape[0]))
-
-        for ln in lines[2:]:
-            arr = np.array([float(l) for l in ln.split()])
-            if arr.shape[0] == 1:
-                lambda_count += 1
-                pressure_count = 0
-            else:
-                self._xsec_grid[pressure_count, :,
-                                lambda_count] = arr[1:] + 1e-60
-                pressure_count += 1
-
-        self._xsec_grid = self._xsec_grid[:, :, grid_sort]*10000
+        xsec = blocks[:, 1:].reshape(-1, npress, 1 + ntemp)[:, :, 1:]
+        self._xsec_grid = np.ascontiguousarray(
+            np.transpose(xsec[grid_sort], (1, 2, 0)) + 1e-60)*10000
 
     @property
     def wavenumberGrid(self):
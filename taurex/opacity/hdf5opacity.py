@@ -1,16 +1,143 @@
 from .interpolateopacity import InterpolatingOpacity
+from collections import OrderedDict
 import pickle
 import numpy as np
 import pathlib
 
 
+class BlockCachedGrid:
+    """
+    Wraps a streamed ``(P, T, wn)`` :obj:`h5py.Dataset` with a bounded
+    least-recently-used cache of ``(p, t)`` rows.
+
+    Interpolation reads ``grid[p, t, wn_slice]`` for a handful of P-T nodes
+    over and over during a retrieval. Each such read is cached, keyed by the
+    node and wavenumber range, so repeated reads come from memory. Any
+    other kind of indexing is passed directly to the dataset.
+
+    Parameters
+    ----------
+    dataset: :obj:`h5py.Dataset`
+        Cross-section dataset
+
+    max_bytes: int
+        Maximum size of the cache in bytes
+
+    dtype: optional
+        Data type to convert cached blocks to, defaults to that of
+        the dataset
+
+    """
+
+    def __init__(self, dataset, max_bytes, dtype=None):
+        self._dataset = dataset
+        self._max_bytes = max_bytes
+        self._dtype = np.dtype(dtype or dataset.dtype)
+        self._blocks = OrderedDict()
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def shape(self):
+        return self._dataset.shape
+
+    @property
+    def dtype(self):
+        return self._dtype
+
+    @property
+    def ndim(self):
+        return self._dataset.ndim
+
+    def __len__(self):
+        return len(self._dataset)
+
+    @property
+    def nbytes(self):
+        """Number of bytes currently cached"""
+        return self._nbytes
+
+    @property
+    def max_bytes(self):
+        """
+        Number of bytes the cache can grow to, at most the size of the
+        whole dataset
+        """
+        full_bytes = int(np.prod(self.shape))*self._dtype.itemsize
+        return min(self._max_bytes, full_bytes)
+
+    def cache_info(self):
+        """
+        Returns
+        -------
+        dict
+            Hits, misses, number of cached blocks and their size in bytes
+
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+                'blocks': len(self._blocks), 'nbytes': self._nbytes}
+
+    def clear(self):
+        self._blocks = OrderedDict()
+        self._nbytes = 0
+
+    def _block_key(self, item):
+        if not isinstance(item, tuple) or len(item) not in (2, 3):
+            return None
+        p_idx, t_idx = item[0], item[1]
+        if not isinstance(p_idx, (int, np.integer)) or \
+                not isinstance(t_idx, (int, np.integer)):
+            return None
+        wn_slice = item[2] if len(item) == 3 else slice(None)
+        if not isinstance(wn_slice, slice) or \
+                wn_slice.step not in (None, 1):
+            return None
+        num_p, num_t, num_wn = self._dataset.shape
+        if not (-num_p <= p_idx < num_p and -num_t <= t_idx < num_t):
+            return None
+        start, stop, _ = wn_slice.indices(num_wn)
+        return (int(p_idx) % num_p, int(t_idx) % num_t, start, stop)
+
+    def __getitem__(self, item):
+        key = self._block_key(item)
+        if key is None or self._max_bytes <= 0:
+            return self._dataset[item]
+
+        block = self._blocks.get(key)
+        if block is not None:
+            self.hits += 1
+            self._blocks.move_to_end(key)
+            return block
+
+        self.misses += 1
+        p_idx, t_idx, start, stop = key
+        block = self._dataset[p_idx, t_idx, start:stop].astype(self._dtype,
+                                                               copy=False)
+        block.flags.writeable = False
+
+        if block.nbytes <= self._max_bytes:
+            self._blocks[key] = block
+            self._nbytes += block.nbytes
+            while self._nbytes > self._max_bytes:
+                _, old = self._blocks.popitem(last=False)
+                self._nbytes -= old.nbytes
+
+        return block
+
+
 class HDF5Opacity(InterpolatingOpacity):
     """
     This is the base class for computing opactities
 
     """
 
-    def __init__(self, filename, interpolation_mode='exp', in_memory=False):
+    default_block_cache_bytes = 0
+    """Default size of the block cache when streaming, disabled so
+    streaming keeps nothing in memory unless asked to"""
+
+    def __init__(self, filename, interpolation_mode='exp', in_memory=False,
+                 block_cache_bytes=None, dtype=None):
         super().__init__('HDF5Opacity:{}'.format(pathlib.Path(filename).stem[0:10]),
                          interpolation_mode=interpolation_mode)
 
@@ -18,6 +145,10 @@ class HDF5Opacity(InterpolatingOpacity):
         self._molecule_name = None
         self._spec_dict = None
         self.in_memory = in_memory
+        if block_cache_bytes is None:
+            block_cache_bytes = self.default_block_cache_bytes
+        self._block_cache_bytes = block_cache_bytes
+        self._dtype = dtype
         self._load_hdf_file(filename)
 
     @property
@@ -51,8 +182,17 @@ class HDF5Opacity(InterpolatingOpacity):
 
         self._pressure_grid = self._spec_dict['p'][:]*p_conversion
 
-        if self.in_memory:
-            self._xsec_grid = self._spec_dict['xsecarr'][...]
+        xsec_dataset = self._spec_dict['xsecarr']
+        if self.in_memory and self._dtype is not None:
+            # Let HDF5 convert while reading rather than making a copy
+            self._xsec_grid = np.empty(xsec_dataset.shape, dtype=self._dtype)
+            xsec_dataset.read_direct(self._xsec_grid)
+        elif self.in_memory:
+            self._xsec_grid = xsec_dataset[...]
+        elif self._block_cache_bytes > 0:
+            self._xsec_grid = BlockCachedGrid(xsec_dataset,
+                                              self._block_cache_bytes,
+                                              dtype=self._dtype)
         else:
             self._xsec_grid = self._spec_dict['xsecarr']
 
@@ -62,6 +202,9 @@ class HDF5Opacity(InterpolatingOpacity):
         if isinstance(self._molecule_name, np.ndarray):
             self._molecule_name = self._molecule_name[0]
 
+        if isinstance(self._molecule_name, bytes):
+            self._molecule_name = self._molecule_name.decode()
+
         self._min_pressure = self._pressure_grid.min()
         self._max_pressure = self._pressure_grid.max()
         self._min_temperature = self._temperature_grid.min()
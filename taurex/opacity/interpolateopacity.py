@@ -4,6 +4,170 @@ from .opacity import Opacity
 from taurex.util.math import *
 
 
+class InterpolationWeights:
+    """
+    Grid nodes and interpolation weights of every layer of an atmosphere
+    on a particular temperature and pressure grid. These only depend on
+    the grids so can be computed once per model and shared by every
+    molecule with the same grids
+    (see :func:`InterpolatingOpacity.accumulate_opacity_profile`).
+    Follows the same edge rules as
+    :func:`InterpolatingOpacity.interp_bilinear_grid`.
+
+    Parameters
+    ----------
+    temperature_grid: :obj:`array`
+        Temperature grid of cross-sections
+
+    pressure_grid: :obj:`array`
+        Pressure grid of cross-sections
+
+    temperature_profile: :obj:`array`
+        Temperature of each layer in Kelvin
+
+    pressure_profile: :obj:`array`
+        Pressure of each layer in Pa
+
+    """
+
+    def __init__(self, temperature_grid, pressure_grid, temperature_profile,
+                 pressure_profile):
+        self.temperature_grid = temperature_grid
+        self.pressure_grid = pressure_grid
+
+        T = np.asarray(temperature_profile, dtype=np.float64)
+        P = np.asarray(pressure_profile, dtype=np.float64)
+
+        self.t_idx0, self.t_idx1, self.t_weight, t_edge, below_t = \
+            self._nodes(temperature_grid, T)
+        self.p_idx0, self.p_idx1, self.p_weight, p_edge, below_p = \
+            self._nodes(pressure_grid, P)
+
+        self.skip = below_t & below_p
+
+        Tmin = temperature_grid[self.t_idx0]
+        Tmax = temperature_grid[self.t_idx1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.t_exp_factor = np.where(
+                t_edge, 0.0, Tmax*(T - Tmin)/(T*(Tmax - Tmin)))
+
+    @staticmethod
+    def _nodes(grid, values):
+        last = grid.shape[0] - 1
+        idx_min = grid.searchsorted(values, side='right') - 1
+        below = values < grid[0]
+        above = values >= grid[last]
+        edge = below | above
+        idx0 = np.where(above, last, np.where(below, 0, idx_min))
+        idx1 = np.where(edge, idx0, idx_min + 1)
+        x0 = grid[idx0]
+        x1 = grid[idx1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.where(edge, 0.0, (values - x0)/(x1 - x0))
+        return idx0, idx1, weight, edge, below
+
+    @staticmethod
+    def grid_key(opacity):
+        return (opacity.temperatureGrid.shape[0],
+                opacity.temperatureGrid[0], opacity.temperatureGrid[-1],
+                opacity.pressureGrid.shape[0],
+                opacity.pressureGrid[0], opacity.pressureGrid[-1])
+
+    def matches(self, opacity):
+        """
+        Whether these weights can be used for an opacity
+        """
+        temperature_grid = opacity.temperatureGrid
+        pressure_grid = opacity.pressureGrid
+        return (temperature_grid is self.temperature_grid or
+                np.array_equal(temperature_grid, self.temperature_grid)) and \
+            (pressure_grid is self.pressure_grid or
+             np.array_equal(pressure_grid, self.pressure_grid))
+
+
+class PressureTable:
+    """
+    Cross-sections of an :class:`InterpolatingOpacity` already interpolated
+    to the pressure of each layer, with shape ``(nlayers, T, wn)``.
+    When the pressure profile is fixed only a temperature interpolation
+    is needed per layer. Built by :func:`InterpolatingOpacity.pressure_table`
+
+    """
+
+    def __init__(self, opacity, pressure_profile, plan=None):
+        self.opacity = opacity
+        self.pressure_profile = np.array(pressure_profile, dtype=np.float64)
+        self.plan = plan
+
+        grid = opacity.xsecGrid
+        if plan is None:
+            wn_start, wn_end = 0, grid.shape[2]
+        else:
+            wn_start, wn_end = plan.wn_slice.start, plan.wn_slice.stop
+
+        p_idx_min = opacity.pressureGrid.searchsorted(self.pressure_profile,
+                                                      side='right') - 1
+        self.below_pressure = self.pressure_profile < opacity.pressureGrid[0]
+        self.table = np.empty(shape=(self.pressure_profile.shape[0],
+                                     grid.shape[1], wn_end - wn_start),
+                              dtype=grid.dtype)
+        build_pressure_table(grid, self.pressure_profile,
+                             opacity.pressureGrid, p_idx_min,
+                             wn_start, wn_end, self.table)
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+    def matches(self, opacity, pressure_profile, wngrid=None):
+        """
+        Whether the table is valid for this opacity, pressure profile and
+        wavenumber grid
+        """
+        if opacity is not self.opacity:
+            return False
+        if not np.array_equal(pressure_profile, self.pressure_profile):
+            return False
+        if wngrid is None:
+            return self.plan is None
+        return self.plan is not None and \
+            self.plan.matches(opacity.wavenumberGrid, wngrid)
+
+    def opacity_profile(self, temperature_profile):
+        """
+        Computes the cross-section for every layer
+
+        Parameters
+        ----------
+        temperature_profile: :obj:`array`
+            Temperature of each layer in Kelvin
+
+        Returns
+        -------
+        :obj:`array`
+            Cross-sections with shape ``(nlayers, nwn)``
+
+        """
+        opacity = self.opacity
+        if opacity._interp_mode not in ('linear', 'exp'):
+            raise ValueError(
+                'Unknown interpolation mode {}'.format(opacity._interp_mode))
+        temperature_profile = np.asarray(temperature_profile, dtype=np.float64)
+        t_idx_min = opacity.temperatureGrid.searchsorted(temperature_profile,
+                                                         side='right') - 1
+        nlayers = temperature_profile.shape[0]
+        result = np.zeros(shape=(nlayers, self.table.shape[2]),
+                          dtype=self.table.dtype)
+        interp_xsec_temperature(self.table, temperature_profile,
+                                opacity.temperatureGrid, t_idx_min,
+                                self.below_pressure,
+                                opacity._interp_mode == 'exp',
+                                np.full(nlayers, 1/10000), result)
+        if self.plan is None:
+            return result
+        return self.plan.resample(result)
+
+
 class InterpolatingOpacity(Opacity):
     """
     Provides interpolation methods
@@ -76,6 +240,13 @@ class InterpolatingOpacity(Opacity):
             self.debug('Maximum Temperature pressure reached. Using last')
             return self.xsecGrid[-1, -1, wngrid_filter].ravel()
 
+        # Off opposite corners of the grid, use the corner
+        if check_pressure_max and check_temperature_min:
+            return self.xsecGrid[-1, 0, wngrid_filter].ravel()
+
+        if check_temperature_max and check_pressure_min:
+            return self.xsecGrid[0, -1, wngrid_filter].ravel()
+
         # Max pressure
         if check_pressure_max:
             self.debug('Max pressure reached. Interpolating temperature only')
@@ -97,10 +268,10 @@ class InterpolatingOpacity(Opacity):
             self.debug('Min temeprature reached. Interpolating pressure only')
             return self.interp_pressure_only(P, p_idx_min, p_idx_max, 0, wngrid_filter).ravel()
 
-        q_11 = self.xsecGrid[p_idx_min, t_idx_min][wngrid_filter].ravel()
-        q_12 = self.xsecGrid[p_idx_min, t_idx_max][wngrid_filter].ravel()
-        q_21 = self.xsecGrid[p_idx_max, t_idx_min][wngrid_filter].ravel()
-        q_22 = self.xsecGrid[p_idx_max, t_idx_max][wngrid_filter].ravel()
+        q_11 = self.xsecGrid[p_idx_min, t_idx_min, wngrid_filter].ravel()
+        q_12 = self.xsecGrid[p_idx_min, t_idx_max, wngrid_filter].ravel()
+        q_21 = self.xsecGrid[p_idx_max, t_idx_min, wngrid_filter].ravel()
+        q_22 = self.xsecGrid[p_idx_max, t_idx_max, wngrid_filter].ravel()
 
         Tmax = self.temperatureGrid[t_idx_max]
         Tmin = self.temperatureGrid[t_idx_min]
@@ -118,3 +289,183 @@ class InterpolatingOpacity(Opacity):
     def compute_opacity(self, temperature, pressure, wngrid=None):
 
         return self.interp_bilinear_grid(temperature, pressure, *self.find_closest_index(temperature, pressure), wngrid) / 10000
+
+    def compute_opacity_profile(self, temperature_profile, pressure_profile,
+                                wn_start=0, wn_end=None):
+        """
+        Interpolates the cross-section grid for every layer at once using
+        :func:`~taurex.util.math.interp_xsec_profile`. Requires
+        :func:`xsecGrid` to be an in-memory array.
+
+        Parameters
+        ----------
+        temperature_profile: :obj:`array`
+            Temperature of each layer in Kelvin
+
+        pressure_profile: :obj:`array`
+            Pressure of each layer in Pa
+
+        wn_start: int, optional
+            First index of native wavenumber grid to compute
+
+        wn_end: int, optional
+            Last index (exclusive) of native wavenumber grid to compute
+
+        Returns
+        -------
+        :obj:`array`
+            Cross-sections with shape ``(nlayers, wn_end-wn_start)``
+
+        """
+        if self._interp_mode not in ('linear', 'exp'):
+            raise ValueError(
+                'Unknown interpolation mode {}'.format(self._interp_mode))
+
+        if wn_end is None:
+            wn_end = self.wavenumberGrid.shape[0]
+
+        temperature_profile = np.asarray(temperature_profile, dtype=np.float64)
+        pressure_profile = np.asarray(pressure_profile, dtype=np.float64)
+
+        t_idx_min, _, p_idx_min, _ = \
+            self.find_closest_index(temperature_profile, pressure_profile)
+
+        nlayers = temperature_profile.shape[0]
+        result = np.zeros(shape=(nlayers, wn_end-wn_start),
+                          dtype=self.xsecGrid.dtype)
+        weights = np.full(nlayers, 1/10000)
+
+        interp_xsec_profile(self.xsecGrid, temperature_profile,
+                            pressure_profile, self.temperatureGrid,
+                            self.pressureGrid, t_idx_min, p_idx_min,
+                            wn_start, wn_end, self._interp_mode == 'exp',
+                            weights, result)
+
+        return result
+
+    def interpolation_weights(self, temperature_profile, pressure_profile):
+        """
+        Computes the :class:`InterpolationWeights` of each layer on this
+        opacity's temperature and pressure grid. These can be reused for
+        any opacity with the same grids.
+        """
+        return InterpolationWeights(self.temperatureGrid, self.pressureGrid,
+                                    temperature_profile, pressure_profile)
+
+    def accumulate_opacity_profile(self, weights, scale, out, wngrid=None):
+        """
+        Interpolates the cross-section of every layer using precomputed
+        :class:`InterpolationWeights` and adds it, scaled, directly into
+        ``out``. Requires :func:`xsecGrid` to be an in-memory array.
+
+        Parameters
+        ----------
+        weights: :class:`InterpolationWeights`
+            Weights computed on this opacity's temperature and pressure grid
+
+        scale: :obj:`array`
+            Factor to multiply each layer by e.g. mixing ratio
+
+        out: :obj:`array`
+            Array of shape ``(nlayers, nwn)`` to accumulate into
+
+        wngrid: :obj:`array`, optional
+            Wavenumber grid of ``out``
+
+        """
+        if self._interp_mode not in ('linear', 'exp'):
+            raise ValueError(
+                'Unknown interpolation mode {}'.format(self._interp_mode))
+
+        plan = None
+        wn_start, wn_end = 0, self.wavenumberGrid.shape[0]
+        if wngrid is not None:
+            plan = self.wavenumber_plan(wngrid)
+            wn_start, wn_end = plan.wn_slice.start, plan.wn_slice.stop
+
+        scale = np.asarray(scale, dtype=np.float64)/10000
+
+        if plan is None or plan.is_native:
+            target = out
+        else:
+            target = np.zeros(shape=(out.shape[0], wn_end - wn_start),
+                              dtype=out.dtype)
+
+        accumulate_xsec_weights(self.xsecGrid, weights.p_idx0, weights.p_idx1,
+                                weights.t_idx0, weights.t_idx1,
+                                weights.p_weight, weights.t_weight,
+                                weights.t_exp_factor, weights.skip,
+                                self._interp_mode == 'exp', wn_start, wn_end,
+                                scale, target)
+
+        if target is not out:
+            out += plan.resample(target)
+
+    def pressure_table(self, pressure_profile, wngrid=None):
+        """
+        Precomputes a :class:`PressureTable` for a fixed pressure profile
+        so that only temperature needs to be interpolated each time.
+        Requires :func:`xsecGrid` to be an in-memory array.
+
+        Parameters
+        ----------
+        pressure_profile: :obj:`array`
+            Pressure of each layer in Pa
+
+        wngrid: :obj:`array`, optional
+            Wavenumber grid to interpolate to
+
+        Returns
+        -------
+        :class:`PressureTable`
+            Table or ``None`` if the cross-sections are not in memory
+
+        """
+        if not isinstance(self.xsecGrid, np.ndarray):
+            return None
+        plan = None
+        if wngrid is not None:
+            plan = self.wavenumber_plan(wngrid)
+        return PressureTable(self, pressure_profile, plan)
+
+    def opacity_profile(self, temperature_profile, pressure_profile,
+                        wngrid=None):
+        """
+        Computes the cross-section for every layer of an atmosphere
+        in a single vectorized pass rather than calling :func:`opacity`
+        per layer. Falls back to the per-layer method if the
+        cross-sections are not held in memory.
+
+        Parameters
+        ----------
+        temperature_profile: :obj:`array`
+            Temperature of each layer in Kelvin
+
+        pressure_profile: :obj:`array`
+            Pressure of each layer in Pa
+
+        wngrid: :obj:`array`, optional
+            Wavenumber grid to interpolate to
+
+        Returns
+        -------
+        :obj:`array`
+            Cross-sections with shape ``(nlayers, nwn)``
+
+        """
+        if not isinstance(self.xsecGrid, np.ndarray):
+            return super().opacity_profile(temperature_profile,
+                                           pressure_profile, wngrid)
+
+        if wngrid is None:
+            return self.compute_opacity_profile(temperature_profile,
+                                                pressure_profile)
+
+        plan = self.wavenumber_plan(wngrid)
+
+        orig = self.compute_opacity_profile(temperature_profile,
+                                            pressure_profile,
+                                            plan.wn_slice.start,
+                                            plan.wn_slice.stop)
+
+        return plan.resample(orig)
@@ -0,0 +1,362 @@
+from .interpolateopacity import InterpolatingOpacity
+from taurex.util.math import compute_interp_weights, apply_interp_weights
+import numpy as np
+import pathlib
+
+
+class KTableOpacity(InterpolatingOpacity):
+    """
+    Correlated-k tables stored in the ``.ktable.h5`` format.
+
+    Rather than sampling cross-sections at every wavenumber, each spectral
+    bin holds the k-coefficients of its sorted absorption distribution
+    at ``ng`` quadrature points in cumulative probability *g*, giving a
+    ``(P, T, bin, g)`` grid. Interpolation in temperature and pressure is
+    identical to other cross-sections. Use with
+    :class:`~taurex.contributions.ktable.KTableContribution` and create
+    tables from existing cross-sections with :func:`build_ktable` or
+    ``tools/xsec_to_ktable.py``.
+
+    The file contains:
+
+    - ``kcoeff``: k-coefficients with shape ``(P, T, bin, g)`` in cm2/molecule
+    - ``bin_edges``: wavenumber edges of the bins in cm-1
+    - ``samples``: g of each quadrature point
+    - ``weights``: quadrature weight of each point
+    - ``t``: temperature grid in K
+    - ``p``: pressure grid, with a ``units`` attribute
+    - ``mol_name``: molecule name
+
+    Parameters
+    ----------
+    filename: str
+        Path to ``.ktable.h5`` file
+
+    interpolation_mode: str, optional
+        ``linear`` or ``exp`` interpolation in temperature
+
+    dtype: optional
+        dtype to store k-coefficients in, defaults to that of the file
+
+    """
+
+    def __init__(self, filename, interpolation_mode='linear', dtype=None):
+        super().__init__('KTableOpacity:{}'.format(
+            pathlib.Path(filename).stem[0:10]),
+            interpolation_mode=interpolation_mode)
+
+        self._filename = filename
+        self._molecule_name = None
+        self._dtype = dtype
+        self._load_ktable_file(filename)
+
+    @staticmethod
+    def read_molecule_name(filename):
+        """
+        Reads just the molecule name from a ``.ktable.h5`` file
+        """
+        import h5py
+        with h5py.File(filename, 'r') as f:
+            return _decode_name(f['mol_name'][()])
+
+    @staticmethod
+    def read_grids(filename):
+        """
+        Reads just the grids from a ``.ktable.h5`` file without
+        the k-coefficients
+
+        Returns
+        -------
+        pressure_grid: :obj:`array`
+            Pressure grid in Pa
+
+        temperature_grid: :obj:`array`
+            Temperature grid in K
+
+        wavenumber_grid: :obj:`array`
+            Centre of each bin
+        """
+        import h5py
+        with h5py.File(filename, 'r') as f:
+            bin_edges = f['bin_edges'][:]
+            return _read_pressure(f), f['t'][:], \
+                0.5*(bin_edges[:-1] + bin_edges[1:])
+
+    def _load_ktable_file(self, filename):
+        import h5py
+        self.debug('Loading k-tables from {}'.format(filename))
+
+        with h5py.File(filename, 'r') as f:
+            self._bin_edges = f['bin_edges'][:]
+            self._samples = f['samples'][:]
+            self._weights = f['weights'][:]
+            self._temperature_grid = f['t'][:]
+            self._pressure_grid = _read_pressure(f)
+
+            kcoeff = f['kcoeff']
+            self._kcoeff_grid = np.empty(kcoeff.shape,
+                                         dtype=self._dtype or kcoeff.dtype)
+            kcoeff.read_direct(self._kcoeff_grid)
+            self._molecule_name = _decode_name(f['mol_name'][()])
+
+        self._wavenumber_grid = 0.5*(self._bin_edges[:-1] +
+                                     self._bin_edges[1:])
+        self._resolution = np.average(np.diff(self._wavenumber_grid))
+
+        # Flatten the bin and g dimension so the cross-section
+        # interpolation kernels can be used unchanged
+        npress, ntemp, nbins, ngauss = self._kcoeff_grid.shape
+        self._xsec_grid = self._kcoeff_grid.reshape(npress, ntemp,
+                                                    nbins*ngauss)
+
+        self._min_pressure = self._pressure_grid.min()
+        self._max_pressure = self._pressure_grid.max()
+        self._min_temperature = self._temperature_grid.min()
+        self._max_temperature = self._temperature_grid.max()
+
+    @property
+    def moleculeName(self):
+        return self._molecule_name
+
+    @property
+    def xsecGrid(self):
+        """
+        k-coefficients with the bin and g dimensions flattened
+        """
+        return self._xsec_grid
+
+    @property
+    def kcoeffGrid(self):
+        """
+        k-coefficients with shape ``(P, T, bin, g)``
+        """
+        return self._kcoeff_grid
+
+    @property
+    def wavenumberGrid(self):
+        """
+        Centre of each bin
+        """
+        return self._wavenumber_grid
+
+    @property
+    def binEdges(self):
+        return self._bin_edges
+
+    @property
+    def samples(self):
+        """
+        g of each quadrature point
+        """
+        return self._samples
+
+    @property
+    def weights(self):
+        """
+        Quadrature weight of each g-point
+        """
+        return self._weights
+
+    @property
+    def ngauss(self):
+        return self._weights.shape[0]
+
+    @property
+    def temperatureGrid(self):
+        return self._temperature_grid
+
+    @property
+    def pressureGrid(self):
+        return self._pressure_grid
+
+    @property
+    def resolution(self):
+        return self._resolution
+
+    def kcoeff_profile(self, temperature_profile, pressure_profile,
+                       bin_start=0, bin_end=None):
+        """
+        Interpolates the k-coefficients for every layer
+
+        Parameters
+        ----------
+        temperature_profile: :obj:`array`
+            Temperature of each layer in Kelvin
+
+        pressure_profile: :obj:`array`
+            Pressure of each layer in Pa
+
+        bin_start: int, optional
+            First bin to compute
+
+        bin_end: int, optional
+            Last bin (exclusive) to compute
+
+        Returns
+        -------
+        :obj:`array`
+            k-coefficients in m2 with shape ``(nlayers, nbins, ng)``
+
+        """
+        if bin_end is None:
+            bin_end = self._wavenumber_grid.shape[0]
+        ngauss = self.ngauss
+        result = self.compute_opacity_profile(temperature_profile,
+                                              pressure_profile,
+                                              bin_start*ngauss,
+                                              bin_end*ngauss)
+        return result.reshape(result.shape[0], bin_end - bin_start, ngauss)
+
+    def compute_opacity(self, temperature, pressure, wngrid=None):
+        """
+        Mean k-coefficient of each bin
+        """
+        bin_start, bin_end, _ = \
+            wngrid.indices(self._wavenumber_grid.shape[0])
+        return self.kcoeff_profile(np.array([temperature]),
+                                   np.array([pressure]),
+                                   bin_start, bin_end)[0].dot(self._weights)
+
+    def opacity_profile(self, temperature_profile, pressure_profile,
+                        wngrid=None):
+        """
+        Mean k-coefficient of each bin for every layer
+        """
+        if wngrid is None:
+            return self.kcoeff_profile(temperature_profile,
+                                       pressure_profile).dot(self._weights)
+
+        plan = self.wavenumber_plan(wngrid)
+        bin_start, bin_end, _ = \
+            plan.wn_slice.indices(self._wavenumber_grid.shape[0])
+        return plan.resample(
+            self.kcoeff_profile(temperature_profile, pressure_profile,
+                                bin_start, bin_end).dot(self._weights))
+
+    def pressure_table(self, pressure_profile, wngrid=None):
+        return None
+
+
+def _read_pressure(f):
+    import astropy.units as u
+    pressure_units = f['p'].attrs['units']
+    try:
+        p_conversion = u.Unit(pressure_units).to(u.Pa)
+    except ValueError:
+        p_conversion = u.Unit(pressure_units, format="cds").to(u.Pa)
+    return f['p'][:]*p_conversion
+
+
+def _decode_name(name):
+    if isinstance(name, np.ndarray):
+        name = name[0]
+    if isinstance(name, bytes):
+        name = name.decode()
+    return name
+
+
+def gauss_legendre_g(ngauss):
+    """
+    Gauss-Legendre quadrature points and weights on ``0 <= g <= 1``
+    """
+    samples, weights = np.polynomial.legendre.leggauss(ngauss)
+    return 0.5*(samples + 1.0), 0.5*weights
+
+
+def compute_kcoeff(wavenumber_grid, xsec, bin_edges, samples):
+    """
+    Computes the k-coefficients of cross-sections in each bin by sorting
+    the cross-sections inside it and sampling the resulting cumulative
+    distribution at each g. Bins without any native points take the
+    cross-section interpolated at their centre.
+
+    Parameters
+    ----------
+    wavenumber_grid: :obj:`array`
+        Native wavenumber grid of the cross-sections
+
+    xsec: :obj:`array`
+        Cross-sections with shape ``(..., nwn)``
+
+    bin_edges: :obj:`array`
+        Wavenumber edges of each bin
+
+    samples: :obj:`array`
+        g of each quadrature point
+
+    Returns
+    -------
+    :obj:`array`
+        k-coefficients with shape ``(..., nbins, ng)``
+
+    """
+    nbins = bin_edges.shape[0] - 1
+    ngauss = samples.shape[0]
+    kcoeff = np.empty(xsec.shape[:-1] + (nbins, ngauss), dtype=xsec.dtype)
+    starts = wavenumber_grid.searchsorted(bin_edges[:-1], side='left')
+    stops = wavenumber_grid.searchsorted(bin_edges[1:], side='left')
+
+    for b in range(nbins):
+        npoints = stops[b] - starts[b]
+        if npoints == 0:
+            centre = np.array([0.5*(bin_edges[b] + bin_edges[b+1])])
+            idx, weight = compute_interp_weights(centre, wavenumber_grid)
+            kcoeff[..., b, :] = apply_interp_weights(xsec, idx, weight)
+            continue
+        ordered = np.sort(xsec[..., starts[b]:stops[b]], axis=-1)
+        if npoints == 1:
+            kcoeff[..., b, :] = ordered
+            continue
+        position = np.clip(samples*npoints - 0.5, 0, npoints - 1)
+        idx = np.minimum(position.astype(int), npoints - 2)
+        weight = position - idx
+        kcoeff[..., b, :] = ordered[..., idx]*(1.0 - weight) + \
+            ordered[..., idx + 1]*weight
+    return kcoeff
+
+
+def build_ktable(opacity, bin_edges, filename, ngauss=20):
+    """
+    Builds a ``.ktable.h5`` file from the cross-sections of an
+    :class:`~taurex.opacity.interpolateopacity.InterpolatingOpacity`
+    using Gauss-Legendre quadrature in g. Cross-sections are read one
+    pressure at a time so streamed HDF5 opacities can be used.
+
+    Parameters
+    ----------
+    opacity: :class:`~taurex.opacity.interpolateopacity.InterpolatingOpacity`
+        Cross-sections to convert
+
+    bin_edges: :obj:`array`
+        Increasing wavenumber edges of each bin in cm-1
+
+    filename: str
+        Output filename, should end with ``.ktable.h5``
+
+    ngauss: int, optional
+        Number of g-points in each bin
+
+    """
+    import h5py
+    bin_edges = np.asarray(bin_edges, dtype=np.float64)
+    samples, weights = gauss_legendre_g(ngauss)
+    wavenumber_grid = opacity.wavenumberGrid
+    xsec_grid = opacity.xsecGrid
+    npress = len(opacity.pressureGrid)
+    ntemp = len(opacity.temperatureGrid)
+
+    with h5py.File(filename, 'w') as f:
+        f.create_dataset('bin_edges', data=bin_edges)
+        f.create_dataset('samples', data=samples)
+        f.create_dataset('weights', data=weights)
+        f.create_dataset('t', data=opacity.temperatureGrid)
+        p_dataset = f.create_dataset('p', data=opacity.pressureGrid)
+        p_dataset.attrs['units'] = 'Pa'
+        f.create_dataset('mol_name', data=opacity.moleculeName)
+        kcoeff = f.create_dataset(
+            'kcoeff', shape=(npress, ntemp, bin_edges.shape[0] - 1, ngauss),
+            dtype=xsec_grid.dtype)
+        for p_idx in range(npress):
+            kcoeff[p_idx] = compute_kcoeff(wavenumber_grid,
+                                           np.asarray(xsec_grid[p_idx]),
+                                           bin_edges, samples)
@@ -0,0 +1,216 @@
+from .interpolateopacity import InterpolatingOpacity
+import numpy as np
+import pathlib
+from taurex.util.arrayfile import write_array_file, read_array_file, \
+    read_array_file_header
+from taurex.util.math import compute_interp_weights, apply_interp_weights
+
+
+class MMapOpacity(InterpolatingOpacity):
+    """
+    Cross-sections stored in the raw binary ``.mmap`` format.
+
+    The ``(P, T, wn)`` cross-section grid is memory-mapped rather than
+    read so loading is near instantaneous and every process on a node
+    shares a single physical copy of the file through the page cache.
+    Use :func:`convert_to_mmap` or ``tools/xsec_to_mmap.py`` to create
+    these files from existing opacities.
+
+    """
+
+    def __init__(self, filename, interpolation_mode='linear', in_memory=False):
+        super().__init__('MMapOpacity:{}'.format(pathlib.Path(filename).stem[0:10]),
+                         interpolation_mode=interpolation_mode)
+
+        self._filename = filename
+        self._molecule_name = None
+        self.in_memory = in_memory
+        self._load_mmap_file(filename)
+
+    @staticmethod
+    def read_molecule_name(filename):
+        """
+        Reads just the molecule name from a ``.mmap`` file
+        """
+        return read_array_file_header(filename)['attrs']['mol_name']
+
+    @property
+    def moleculeName(self):
+        return self._molecule_name
+
+    @property
+    def xsecGrid(self):
+        return self._xsec_grid
+
+    def _load_mmap_file(self, filename):
+        self.debug('Loading opacity from {}'.format(filename))
+
+        arrays, attrs = read_array_file(filename, mmap=not self.in_memory)
+
+        self._wavenumber_grid = np.array(arrays['bin_edges'])
+        self._temperature_grid = np.array(arrays['t'])
+        self._pressure_grid = np.array(arrays['p'])
+        self._xsec_grid = arrays['xsecarr']
+
+        self._resolution = np.average(np.diff(self._wavenumber_grid))
+        self._molecule_name = attrs['mol_name']
+
+        self._min_pressure = self._pressure_grid.min()
+        self._max_pressure = self._pressure_grid.max()
+        self._min_temperature = self._temperature_grid.min()
+        self._max_temperature = self._temperature_grid.max()
+
+    @property
+    def wavenumberGrid(self):
+        return self._wavenumber_grid
+
+    @property
+    def temperatureGrid(self):
+        return self._temperature_grid
+
+    @property
+    def pressureGrid(self):
+        return self._pressure_grid
+
+    @property
+    def resolution(self):
+        return self._resolution
+
+
+def write_mmap_opacity(filename, molecule_name, temperature_grid,
+                       pressure_grid, wavenumber_grid, xsec_grid,
+                       dtype=None, **attrs):
+    """
+    Writes a cross-section grid into the ``.mmap`` format
+
+    Parameters
+    ----------
+    filename: str
+        Output filename, should end with ``.mmap``
+
+    molecule_name: str
+        Name of molecule
+
+    temperature_grid: :obj:`array`
+        Temperature grid in Kelvin
+
+    pressure_grid: :obj:`array`
+        Pressure grid in Pa
+
+    wavenumber_grid: :obj:`array`
+        Wavenumber grid in cm-1
+
+    xsec_grid: :obj:`array`
+        Cross-sections with shape ``(P, T, wn)``. Can be anything that
+        supports slicing such as a :obj:`h5py.Dataset` and is copied in
+        chunks.
+
+    dtype: optional
+        dtype to store cross-sections as, defaults to that of ``xsec_grid``
+
+    attrs:
+        Any additional attributes to store in the header
+
+    """
+    expected_shape = (len(pressure_grid), len(temperature_grid),
+                      len(wavenumber_grid))
+    if tuple(xsec_grid.shape) != expected_shape:
+        raise ValueError('Cross-section grid has shape {} but expected '
+                         '{}'.format(xsec_grid.shape, expected_shape))
+
+    if isinstance(molecule_name, bytes):
+        molecule_name = molecule_name.decode()
+
+    attrs['mol_name'] = molecule_name
+    arrays = {'t': np.asarray(temperature_grid, dtype=np.float64),
+              'p': np.asarray(pressure_grid, dtype=np.float64),
+              'bin_edges': np.asarray(wavenumber_grid, dtype=np.float64),
+              'xsecarr': xsec_grid}
+    dtypes = {}
+    if dtype is not None:
+        dtypes['xsecarr'] = dtype
+
+    write_array_file(filename, arrays, attrs=attrs, dtypes=dtypes)
+
+
+def convert_to_mmap(opacity, filename, dtype=None):
+    """
+    Converts any :class:`~taurex.opacity.interpolateopacity.InterpolatingOpacity`
+    (e.g. :class:`~taurex.opacity.hdf5opacity.HDF5Opacity` or
+    :class:`~taurex.opacity.pickleopacity.PickleOpacity`) into the ``.mmap``
+    format. Streamed HDF5 opacities are copied in chunks.
+
+    Parameters
+    ----------
+    opacity: :class:`~taurex.opacity.interpolateopacity.InterpolatingOpacity`
+        Opacity to convert
+
+    filename: str
+        Output filename, should end with ``.mmap``
+
+    dtype: optional
+        dtype to store cross-sections as
+
+    """
+    write_mmap_opacity(filename, opacity.moleculeName,
+                       opacity.temperatureGrid, opacity.pressureGrid,
+                       opacity.wavenumberGrid, opacity.xsecGrid, dtype=dtype)
+
+
+class _ResampledGrid:
+    """
+    Array-like view of a ``(P, T, wn)`` cross-section grid linearly
+    interpolated onto a new wavenumber grid. Slicing along the first
+    axis resamples one pressure at a time so neither the source nor the
+    result ever needs to be fully in memory.
+    """
+
+    def __init__(self, xsec_grid, idx, weight, dtype):
+        self._xsec_grid = xsec_grid
+        self._idx = idx
+        self._weight = weight
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(xsec_grid.shape[:2]) + (idx.shape[0],)
+
+    def __getitem__(self, key):
+        p_indices = range(self.shape[0])[key]
+        out = np.empty((len(p_indices),) + self.shape[1:], dtype=self.dtype)
+        for out_idx, p_idx in enumerate(p_indices):
+            out[out_idx] = apply_interp_weights(
+                np.asarray(self._xsec_grid[p_idx]), self._idx, self._weight)
+        return out
+
+
+def resample_to_mmap(opacity, wavenumber_grid, filename, dtype=None):
+    """
+    Linearly interpolates the cross-sections of an
+    :class:`~taurex.opacity.interpolateopacity.InterpolatingOpacity`
+    onto a new wavenumber grid and writes them in the ``.mmap`` format.
+    As with :func:`~taurex.opacity.opacity.Opacity.opacity`, wavenumbers
+    outside of the native grid take the edge value.
+
+    Parameters
+    ----------
+    opacity: :class:`~taurex.opacity.interpolateopacity.InterpolatingOpacity`
+        Opacity to resample
+
+    wavenumber_grid: :obj:`array`
+        Increasing wavenumber grid in cm-1 to resample onto
+
+    filename: str
+        Output filename, should end with ``.mmap``
+
+    dtype: optional
+        dtype to store cross-sections as, defaults to that of the opacity
+
+    """
+    wavenumber_grid = np.asarray(wavenumber_grid, dtype=np.float64)
+    native_grid = opacity.wavenumberGrid
+    idx, weight = compute_interp_weights(wavenumber_grid, native_grid)
+    xsec_grid = opacity.xsecGrid
+    resampled = _ResampledGrid(xsec_grid, idx, weight,
+                               dtype or xsec_grid.dtype)
+    write_mmap_opacity(filename, opacity.moleculeName,
+                       opacity.temperatureGrid, opacity.pressureGrid,
+                       wavenumber_grid, resampled,
+                       native_wavenumber_points=int(native_grid.shape[0]))
@@ -1,15 +1,120 @@
 from taurex.log import Logger
+from taurex.util.math import compute_interp_weights, apply_interp_weights
+from collections import OrderedDict
 import numpy as np
 
 
+class WavenumberPlan:
+    """
+    Memoized description of how to map the native wavenumber grid of an
+    opacity onto a target grid. Holds the slice of the native grid covering
+    the target grid, whether that slice is identical to the target grid and
+    if not, the precomputed interpolation indices and weights.
+
+    The caller's grid is kept by reference so passing the same array
+    again is matched without comparing every point, it should not be
+    modified in place afterwards.
+
+    """
+
+    def __init__(self, native_grid, wngrid):
+        self.native_grid = native_grid
+        self.source_grid = wngrid
+        self.wngrid = np.array(wngrid)
+        self.key = WavenumberPlan.grid_key(wngrid)
+
+        start = native_grid.searchsorted(wngrid.min(), side='left')
+        stop = native_grid.searchsorted(wngrid.max(), side='right')
+        self.wn_slice = slice(start, stop)
+
+        clipped_grid = native_grid[self.wn_slice]
+        self.clipped_grid = clipped_grid
+        self.is_native = np.array_equal(clipped_grid, wngrid)
+
+        self.idx = None
+        self.weight = None
+        if not self.is_native and clipped_grid.shape[0] > 1:
+            self.idx, self.weight = compute_interp_weights(self.wngrid,
+                                                           clipped_grid)
+
+    @staticmethod
+    def grid_key(wngrid):
+        return (wngrid.shape[0], wngrid[0], wngrid[-1])
+
+    def matches(self, native_grid, wngrid):
+        """
+        Whether this plan was built for these grids
+        """
+        if native_grid is not self.native_grid:
+            return False
+        if wngrid is self.source_grid:
+            return True
+        if self.key == WavenumberPlan.grid_key(wngrid) and \
+                np.array_equal(self.wngrid, wngrid):
+            # Later lookups with this array take the fast path
+            self.source_grid = wngrid
+            return True
+        return False
+
+    def resample(self, values):
+        """
+        Maps values on the clipped native grid onto the target grid.
+        ``values`` may have any leading dimensions.
+        """
+        if self.is_native:
+            return values
+        if self.idx is None:
+            # Too few native points to precompute, let numpy deal with it
+            return np.array([np.interp(self.wngrid, self.clipped_grid, v)
+                             for v in np.atleast_2d(values)]).reshape(
+                                 values.shape[:-1] + self.wngrid.shape)
+        return apply_interp_weights(values, self.idx, self.weight)
+
+
 class Opacity(Logger):
     """
     This is the base class for computing opactities
 
     """
 
+    max_wavenumber_plans = 4
+    """Number of target wavenumber grids to memoize plans for"""
+
     def __init__(self, name):
         super().__init__(name)
+        self._wavenumber_plans = OrderedDict()
+
+    def wavenumber_plan(self, wngrid):
+        """
+        Returns the (memoized) :class:`WavenumberPlan` mapping the native
+        wavenumber grid onto ``wngrid``. The target grid rarely changes
+        during a retrieval so the filter and interpolation weights only
+        need to be computed once.
+
+        Parameters
+        ----------
+        wngrid: :obj:`array`
+            Target wavenumber grid
+
+        Returns
+        -------
+        :class:`WavenumberPlan`
+
+        """
+        native_grid = self.wavenumberGrid
+        plans = self._wavenumber_plans
+        key = WavenumberPlan.grid_key(wngrid)
+
+        plan = plans.get(key)
+        if plan is not None and plan.matches(native_grid, wngrid):
+            plans.move_to_end(key)
+            return plan
+
+        plan = WavenumberPlan(native_grid, wngrid)
+        plans[key] = plan
+        while len(plans) > self.max_wavenumber_plans:
+            plans.popitem(last=False)
+        return plan
 
     @property
     def resolution(self):
@@ -37,21 +142,38 @@ class Opacity(Logger):
     def opacity(self, temperature, pressure, wngrid=None):
 
         if wngrid is None:
-            wngrid_filter = slice(None)
-        else:
-            wngrid_filter = np.where((self.wavenumberGrid >= wngrid.min()) & (
-                self.wavenumberGrid <= wngrid.max()))[0]
+            return self.compute_opacity(temperature, pressure, slice(None))
+
+        plan = self.wavenumber_plan(wngrid)
+
+        orig = self.compute_opacity(temperature, pressure, plan.wn_slice)
+
+        return plan.resample(orig)
+
+    def opacity_profile(self, temperature_profile, pressure_profile,
+                        wngrid=None):
+        """
+        Computes the cross-section for every layer of an atmosphere.
+        By default this calls :func:`opacity` for each layer, formats that
+        can do better should override it.
+
+        Parameters
+        ----------
+        temperature_profile: :obj:`array`
+            Temperature of each layer in Kelvin
 
-        orig = self.compute_opacity(temperature, pressure, wngrid_filter)
+        pressure_profile: :obj:`array`
+            Pressure of each layer in Pa
 
-        if wngrid is None or np.array_equal(self.wavenumberGrid.take(wngrid_filter), wngrid):
-            return orig
-        else:
-            # min_max =  (self.wavenumberGrid <= wngrid.max() ) & (self.wavenumberGrid >= wngrid.min())
+        wngrid: :obj:`array`, optional
+            Wavenumber grid to interpolate to
 
-            # total_bins = self.wavenumberGrid[min_max].shape[0]
-            # if total_bins > wngrid.shape[0]:
-            #     return np.append(np.histogram(self.wavenumberGrid,wngrid, weights=orig)[0]/np.histogram(self.wavenumberGrid,wngrid)[0],0)
+        Returns
+        -------
+        :obj:`array`
+            Cross-sections with shape ``(nlayers, nwn)``
 
-            # else:
-            return np.interp(wngrid, self.wavenumberGrid[wngrid_filter], orig)
+        """
+        return np.array([self.opacity(temperature, pressure, wngrid)
+                         for temperature, pressure
+                         in zip(temperature_profile, pressure_profile)])
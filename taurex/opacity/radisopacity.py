@@ -85,3 +85,9 @@ class RadisHITRANOpacity(Logger):
 
             # else:
             return np.interp(wngrid, self.wavenumberGrid, orig)
+
+    def opacity_profile(self, temperature_profile, pressure_profile,
+                        wngrid=None):
+        return np.array([self.opacity(temperature, pressure, wngrid)
+                         for temperature, pressure
+                         in zip(temperature_profile, pressure_profile)])
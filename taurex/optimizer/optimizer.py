@@ -354,6 +354,62 @@ class Optimizer(Logger):
 
         return res
 
+    def chisq_batch(self, param_matrix, data, datastd):
+        """
+        Computes the Chi-Squared of many sets of parameters at once
+        using :func:`~taurex.model.model.ForwardModel.model_batch`, with
+        the spectra of all rows binned together. Each row gives the same
+        result as :func:`chisq_trans`, but the model is left with its
+        current parameters.
+
+        Parameters
+        ----------
+        param_matrix : :obj:`array`
+            Parameter values with shape ``(nbatch, nparams)`` in the
+            order and fitting space of :func:`fit_names`
+
+        data : obj:`ndarray`
+            Observed spectrum
+
+        datastd : obj:`ndarray`
+            Observed spectrum error
+
+        Returns
+        -------
+        :obj:`array`
+            chi-squared of each row
+
+        """
+        param_matrix = np.atleast_2d(np.asarray(param_matrix,
+                                                dtype=np.float64))
+        native_matrix = np.empty_like(param_matrix)
+        names = []
+        for idx, param in enumerate(self.fitting_parameters):
+            name, latex, fget, fset, mode, to_fit, bounds = param
+            native_matrix[:, idx] = param_matrix[:, idx]
+            if mode == 'log':
+                native_matrix[:, idx] = 10**param_matrix[:, idx]
+            names.append(name)
+
+        obs_bins = self._observed.wavenumberGrid
+        native_grid, spectra, valid = self._model.model_batch(
+            native_matrix, names, wngrid=obs_bins)
+
+        chisq = np.full(param_matrix.shape[0], 1e100)
+        if not valid.any():
+            return chisq
+
+        # Every row is binned at once along the last axis
+        _, final_models, _, _ = self._binner.bin_model(
+            (native_grid, spectra[valid], None, None))
+        res = (data.ravel() - final_models.reshape(final_models.shape[0], -1))\
+            / datastd.ravel()
+        res = np.nansum(res*res, axis=1)
+        res[res == 0] = np.nan
+        chisq[valid] = res
+
+        return chisq
+
     def compute_fit(self):
         """
         Unimplemented. When inheriting this should be overwritten
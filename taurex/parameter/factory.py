@@ -290,6 +290,9 @@ def generate_contributions(config):
             contributions.append(create_klass(config[key],CIAContribution))
         elif key == 'Rayleigh':
             contributions.append(create_klass(config[key],RayleighContribution))
+        elif key == 'KTables':
+            from taurex.contributions import KTableContribution
+            contributions.append(create_klass(config[key],KTableContribution))
         elif key == 'SimpleClouds':
              from taurex.contributions import SimpleCloudsContribution
              contributions.append(create_klass(config[key],SimpleCloudsContribution))
@@ -51,11 +51,59 @@ class ParameterParser(Logger):
                 CIACache().set_cia_path(config['Global']['cia_path'])
             except KeyError:
                 self.warning('No cia path set, cia cannot be used in model')
+
+            try:
+                CIACache().set_cia_cache_dir(config['Global']['cia_cache'])
+            except KeyError:
+                pass
             
             try:
                 OpacityCache().set_memory_mode(config['Global']['xsec_in_memory'])
             except KeyError:
                 self.warning('Xsecs will be loaded in memory')
+
+            try:
+                OpacityCache().set_dtype(config['Global']['xsec_dtype'])
+            except KeyError:
+                pass
+
+            try:
+                OpacityCache().set_block_cache_bytes(config['Global']['xsec_block_cache_bytes'])
+            except KeyError:
+                pass
+
+            try:
+                OpacityCache().set_shared_memory(config['Global']['xsec_shared_memory'])
+            except KeyError:
+                pass
+
+            try:
+                OpacityCache().set_resample_cache_dir(config['Global']['xsec_grid_cache'])
+            except KeyError:
+                pass
+
+            if 'xsec_grid_molecule' in config['Global'] and \
+                    'xsec_grid_res' in config['Global']:
+                raise ValueError('Only one of xsec_grid_molecule or '
+                                 'xsec_grid_res can be given')
+
+            try:
+                OpacityCache().set_common_grid(molecule=config['Global']['xsec_grid_molecule'])
+            except KeyError:
+                pass
+
+            try:
+                from taurex.util.util import create_grid_res
+                start, end, res = config['Global']['xsec_grid_res']
+                wlgrid = create_grid_res(res, start, end)[:, 0].flatten()
+                OpacityCache().set_common_grid(wngrid=10000/wlgrid[::-1])
+            except KeyError:
+                pass
+
+            try:
+                OpacityCache().set_max_bytes(config['Global']['xsec_cache_bytes'])
+            except KeyError:
+                self.info('No memory budget set for xsecs')
             
             try:
                 OpacityCache().enable_radis(config['Global']['use_radis'])
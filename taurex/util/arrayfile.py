@@ -0,0 +1,175 @@
+"""
+Simple raw binary container for large numpy arrays.
+
+A file consists of a short magic string, a JSON header describing every
+array and a set of page aligned contiguous arrays. Because the arrays are
+stored raw they can be memory-mapped with :obj:`numpy.memmap` so that
+loading is near instantaneous and processes on the same machine share a
+single physical copy through the page cache.
+"""
+
+import json
+import os
+import struct
+import numpy as np
+
+ARRAY_FILE_MAGIC = b'TRXARR01'
+"""Identifies a taurex array file"""
+
+ALIGNMENT = 4096
+"""Byte alignment of each array in the file"""
+
+_COPY_CHUNK_BYTES = 256*1024*1024
+
+
+def _align(offset):
+    return ((offset + ALIGNMENT - 1)//ALIGNMENT)*ALIGNMENT
+
+
+def _write_array(f, array, dtype):
+    """
+    Writes an array-like in chunks along its first axis so that
+    :obj:`h5py.Dataset` or memory-mapped inputs never need to be fully
+    loaded into memory.
+    """
+    shape = array.shape
+    if len(shape) == 0:
+        f.write(np.asarray(array, dtype=dtype).tobytes())
+        return
+    row_bytes = max(int(np.prod(shape[1:]))*dtype.itemsize, 1)
+    step = max(_COPY_CHUNK_BYTES//row_bytes, 1)
+    for start in range(0, shape[0], step):
+        chunk = np.ascontiguousarray(array[start:start+step], dtype=dtype)
+        f.write(chunk.tobytes())
+
+
+def write_array_file(filename, arrays, attrs=None, dtypes=None):
+    """
+    Writes arrays into a raw binary array file. The file is written
+    to a temporary file first and moved into place so readers never
+    see a partially written file.
+
+    Parameters
+    ----------
+    filename: str
+        Output filename
+
+    arrays: dict
+        Name and array-like (:obj:`array`, :obj:`h5py.Dataset`, etc.)
+        to store
+
+    attrs: dict, optional
+        Extra JSON serializable attributes to store in the header
+
+    dtypes: dict, optional
+        Name and dtype to convert an array to when writing
+
+    """
+    dtypes = dtypes or {}
+    header = {'arrays': {}, 'attrs': attrs or {}}
+
+    array_info = []
+    for name, array in arrays.items():
+        if not hasattr(array, 'shape') or not hasattr(array, 'dtype'):
+            array = np.asarray(array)
+        dtype = np.dtype(dtypes.get(name, array.dtype))
+        nbytes = int(np.prod(array.shape))*dtype.itemsize
+        array_info.append((name, array, dtype, nbytes))
+
+    # The header size determines the offsets so iterate until stable
+    header_size = 0
+    while True:
+        offset = _align(len(ARRAY_FILE_MAGIC) + 8 + header_size)
+        for name, array, dtype, nbytes in array_info:
+            header['arrays'][name] = {'dtype': dtype.str,
+                                      'shape': list(array.shape),
+                                      'offset': offset}
+            offset = _align(offset + nbytes)
+        header_bytes = json.dumps(header).encode('utf-8')
+        if len(header_bytes) <= header_size:
+            break
+        header_size = len(header_bytes) + 64
+
+    header_bytes = header_bytes.ljust(header_size)
+
+    tmp_filename = '{}.tmp{}'.format(filename, os.getpid())
+    try:
+        with open(tmp_filename, 'wb') as f:
+            f.write(ARRAY_FILE_MAGIC)
+            f.write(struct.pack('<Q', header_size))
+            f.write(header_bytes)
+            for name, array, dtype, nbytes in array_info:
+                f.seek(header['arrays'][name]['offset'])
+                _write_array(f, array, dtype)
+            f.truncate(_align(f.tell()))
+        os.replace(tmp_filename, filename)
+    finally:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+
+
+def read_array_file_header(filename):
+    """
+    Reads only the header of an array file
+
+    Parameters
+    ----------
+    filename: str
+        Array file to read
+
+    Returns
+    -------
+    header: dict
+        Contains ``arrays`` describing the stored arrays and ``attrs``
+
+    Raises
+    ------
+    ValueError
+        If the file is not an array file
+
+    """
+    with open(filename, 'rb') as f:
+        magic = f.read(len(ARRAY_FILE_MAGIC))
+        if magic != ARRAY_FILE_MAGIC:
+            raise ValueError('{} is not a taurex array file'.format(filename))
+        header_size, = struct.unpack('<Q', f.read(8))
+        return json.loads(f.read(header_size).decode('utf-8'))
+
+
+def read_array_file(filename, mmap=True):
+    """
+    Reads all arrays in an array file
+
+    Parameters
+    ----------
+    filename: str
+        Array file to read
+
+    mmap: bool, optional
+        Memory-map arrays (default) rather than reading them into memory
+
+    Returns
+    -------
+    arrays: dict
+        Name and :obj:`array` (or read-only :obj:`numpy.memmap`)
+
+    attrs: dict
+        Attributes stored in the header
+
+    """
+    header = read_array_file_header(filename)
+    arrays = {}
+    for name, info in header['arrays'].items():
+        dtype = np.dtype(info['dtype'])
+        shape = tuple(info['shape'])
+        count = int(np.prod(shape))
+        if mmap and count > 0:
+            arrays[name] = np.memmap(filename, dtype=dtype, mode='r',
+                                     offset=info['offset'], shape=shape)
+        else:
+            with open(filename, 'rb') as f:
+                f.seek(info['offset'])
+                arrays[name] = np.fromfile(f, dtype=dtype,
+                                           count=count).reshape(shape)
+    return arrays, header['attrs']
+
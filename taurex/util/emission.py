@@ -30,6 +30,28 @@ def black_body(lamb,temp):
     return _black_body_vec(wl,temp)
 
 
+def black_body_profile(lamb, temperatures):
+    """
+    Black body spectral emission density of every temperature at once
+
+    Parameters
+    ----------
+    lamb: :obj:`array`
+        Wavenumber grid in cm-1
+
+    temperatures: :obj:`array`
+        Temperatures in Kelvin
+
+    Returns
+    -------
+    :obj:`array`
+        Array of shape ``(ntemperatures, nwn)``
+
+    """
+    wl = _convert_lamb(lamb)
+    return _black_body_vec(wl[None, :], np.asarray(temperatures)[:, None])
+
+
 def black_body_numexpr(lamb, temp):
     import numexpr as ne
     wl = ne.evaluate('10000*1e-6/lamb')
@@ -2,6 +2,7 @@
 
 import numba
 import numpy as np
+import numexpr as ne
 
 from numba import vectorize, float64
 import math
@@ -138,6 +139,575 @@ def intepr_bilin(x11, x12, x21, x22, T, Tmin, Tmax, P, Pmin, Pmax):
     return res
 
 
+@numba.njit(nogil=True, error_model='numpy')
+def _interp_lin_value(x11, x12, T, Tmin, Tmax):
+    return (x11*(Tmax - Tmin) - (T - Tmin)*(x11 - x12))/(Tmax - Tmin)
+
+
+@numba.njit(nogil=True, error_model='numpy')
+def _interp_exp_value(x11, x12, T, Tmin, Tmax):
+    return x11*np.exp(Tmax*(-T + Tmin)*np.log(x11/x12)/(T*(Tmax - Tmin)))
+
+
+@numba.njit(nogil=True, error_model='numpy')
+def interp_xsec_profile(xsec_grid, temperature, pressure, temperature_grid,
+                        pressure_grid, t_idx_min, p_idx_min, wn_start, wn_end,
+                        exp_mode, weights, out):
+    """
+    Interpolates a ``(P, T, wn)`` cross-section grid for every layer of an
+    atmosphere in a single pass and accumulates the result into ``out``.
+
+    Follows the same rules as
+    :func:`~taurex.opacity.interpolateopacity.InterpolatingOpacity.interp_bilinear_grid`:
+    layers outside of the grid are clamped to its edges and a layer below
+    both the minimum temperature and pressure contributes nothing.
+
+    Parameters
+    ----------
+    xsec_grid: :obj:`array`
+        Cross-section grid with shape ``(P, T, wn)``
+
+    temperature: :obj:`array`
+        Temperature of each layer in Kelvin
+
+    pressure: :obj:`array`
+        Pressure of each layer in Pa
+
+    temperature_grid: :obj:`array`
+        Native temperature grid of ``xsec_grid``
+
+    pressure_grid: :obj:`array`
+        Native pressure grid of ``xsec_grid``
+
+    t_idx_min: :obj:`array`
+        Index of nearest temperature to the left of each layer
+
+    p_idx_min: :obj:`array`
+        Index of nearest pressure to the left of each layer
+
+    wn_start: int
+        First wavenumber index to use
+
+    wn_end: int
+        Last wavenumber index (exclusive) to use
+
+    exp_mode: bool
+        Use exponential interpolation in temperature instead of linear
+
+    weights: :obj:`array`
+        Factor to scale each layer by before accumulating
+
+    out: :obj:`array`
+        Array of shape ``(nlayers, wn_end-wn_start)`` to accumulate into
+
+    """
+    nwn = wn_end - wn_start
+    last_t = temperature_grid.shape[0] - 1
+    last_p = pressure_grid.shape[0] - 1
+    min_t = temperature_grid[0]
+    max_t = temperature_grid[last_t]
+    min_p = pressure_grid[0]
+    max_p = pressure_grid[last_p]
+
+    for layer in range(temperature.shape[0]):
+        T = temperature[layer]
+        P = pressure[layer]
+        w = weights[layer]
+        t_min = t_idx_min[layer]
+        p_min = p_idx_min[layer]
+        t_max = t_min + 1
+        p_max = p_min + 1
+
+        if t_max == 0 and p_max == 0:
+            continue
+
+        check_p_max = P >= max_p
+        check_t_max = T >= max_t
+        check_p_min = P < min_p
+        check_t_min = T < min_t
+
+        if check_p_max or check_t_max or check_p_min or check_t_min:
+            # Edge of the grid, reduce to a single (or no) interpolation
+            if (check_p_max or check_p_min) and \
+                    (check_t_max or check_t_min):
+                # Off a corner of the grid
+                p = last_p if check_p_max else 0
+                t = last_t if check_t_max else 0
+                for wn in range(nwn):
+                    out[layer, wn] += w*xsec_grid[p, t, wn_start + wn]
+            elif check_p_max or check_p_min:
+                p = last_p if check_p_max else 0
+                Tmin = temperature_grid[t_min]
+                Tmax = temperature_grid[t_max]
+                for wn in range(nwn):
+                    x11 = xsec_grid[p, t_min, wn_start + wn]
+                    x12 = xsec_grid[p, t_max, wn_start + wn]
+                    if exp_mode:
+                        val = _interp_exp_value(x11, x12, T, Tmin, Tmax)
+                    else:
+                        val = _interp_lin_value(x11, x12, T, Tmin, Tmax)
+                    out[layer, wn] += w*val
+            else:
+                t = last_t if check_t_max else 0
+                Pmin = pressure_grid[p_min]
+                Pmax = pressure_grid[p_max]
+                for wn in range(nwn):
+                    x11 = xsec_grid[p_min, t, wn_start + wn]
+                    x12 = xsec_grid[p_max, t, wn_start + wn]
+                    out[layer, wn] += w*_interp_lin_value(x11, x12, P,
+                                                          Pmin, Pmax)
+            continue
+
+        Tmin = temperature_grid[t_min]
+        Tmax = temperature_grid[t_max]
+        Pmin = pressure_grid[p_min]
+        Pmax = pressure_grid[p_max]
+        for wn in range(nwn):
+            x11 = xsec_grid[p_min, t_min, wn_start + wn]
+            x12 = xsec_grid[p_min, t_max, wn_start + wn]
+            x21 = xsec_grid[p_max, t_min, wn_start + wn]
+            x22 = xsec_grid[p_max, t_max, wn_start + wn]
+            # Linear in pressure first, then temperature
+            fx0 = _interp_lin_value(x11, x21, P, Pmin, Pmax)
+            fx1 = _interp_lin_value(x12, x22, P, Pmin, Pmax)
+            if exp_mode:
+                val = _interp_exp_value(fx0, fx1, T, Tmin, Tmax)
+            else:
+                val = _interp_lin_value(fx0, fx1, T, Tmin, Tmax)
+            out[layer, wn] += w*val
+
+
+@numba.njit(nogil=True, error_model='numpy')
+def build_pressure_table(xsec_grid, pressure, pressure_grid, p_idx_min,
+                         wn_start, wn_end, out):
+    """
+    Interpolates a ``(P, T, wn)`` cross-section grid in pressure only for
+    every layer of an atmosphere giving a ``(nlayers, T, wn)`` table.
+    Layers outside of the pressure grid take its edge values. Combined with
+    :func:`interp_xsec_temperature` this gives the same result as
+    :func:`interp_xsec_profile`.
+
+    Parameters
+    ----------
+    xsec_grid: :obj:`array`
+        Cross-section grid with shape ``(P, T, wn)``
+
+    pressure: :obj:`array`
+        Pressure of each layer in Pa
+
+    pressure_grid: :obj:`array`
+        Native pressure grid of ``xsec_grid``
+
+    p_idx_min: :obj:`array`
+        Index of nearest pressure to the left of each layer
+
+    wn_start: int
+        First wavenumber index to use
+
+    wn_end: int
+        Last wavenumber index (exclusive) to use
+
+    out: :obj:`array`
+        Array of shape ``(nlayers, T, wn_end-wn_start)`` to write into
+
+    """
+    nwn = wn_end - wn_start
+    num_t = xsec_grid.shape[1]
+    last_p = pressure_grid.shape[0] - 1
+
+    for layer in range(pressure.shape[0]):
+        P = pressure[layer]
+        p_min = p_idx_min[layer]
+        if P >= pressure_grid[last_p] or P < pressure_grid[0]:
+            p = last_p if P >= pressure_grid[last_p] else 0
+            for t in range(num_t):
+                for wn in range(nwn):
+                    out[layer, t, wn] = xsec_grid[p, t, wn_start + wn]
+            continue
+        Pmin = pressure_grid[p_min]
+        Pmax = pressure_grid[p_min + 1]
+        for t in range(num_t):
+            for wn in range(nwn):
+                out[layer, t, wn] = _interp_lin_value(
+                    xsec_grid[p_min, t, wn_start + wn],
+                    xsec_grid[p_min + 1, t, wn_start + wn], P, Pmin, Pmax)
+
+
+@numba.njit(nogil=True, error_model='numpy')
+def interp_xsec_temperature(table, temperature, temperature_grid, t_idx_min,
+                            below_pressure, exp_mode, weights, out):
+    """
+    Interpolates a table from :func:`build_pressure_table` in temperature
+    for every layer and accumulates the result into ``out``
+
+    Parameters
+    ----------
+    table: :obj:`array`
+        Pressure interpolated table with shape ``(nlayers, T, wn)``
+
+    temperature: :obj:`array`
+        Temperature of each layer in Kelvin
+
+    temperature_grid: :obj:`array`
+        Native temperature grid of the table
+
+    t_idx_min: :obj:`array`
+        Index of nearest temperature to the left of each layer
+
+    below_pressure: :obj:`array`
+        Whether each layer was below the minimum pressure of the grid.
+        Layers also below the minimum temperature contribute nothing
+
+    exp_mode: bool
+        Use exponential interpolation in temperature instead of linear
+
+    weights: :obj:`array`
+        Factor to scale each layer by before accumulating
+
+    out: :obj:`array`
+        Array of shape ``(nlayers, wn)`` to accumulate into
+
+    """
+    nwn = table.shape[2]
+    last_t = temperature_grid.shape[0] - 1
+
+    for layer in range(temperature.shape[0]):
+        T = temperature[layer]
+        w = weights[layer]
+        t_min = t_idx_min[layer]
+        if T >= temperature_grid[last_t] or T < temperature_grid[0]:
+            if T < temperature_grid[0] and below_pressure[layer]:
+                continue
+            t = last_t if T >= temperature_grid[last_t] else 0
+            for wn in range(nwn):
+                out[layer, wn] += w*table[layer, t, wn]
+            continue
+        Tmin = temperature_grid[t_min]
+        Tmax = temperature_grid[t_min + 1]
+        for wn in range(nwn):
+            if exp_mode:
+                val = _interp_exp_value(table[layer, t_min, wn],
+                                        table[layer, t_min + 1, wn],
+                                        T, Tmin, Tmax)
+            else:
+                val = _interp_lin_value(table[layer, t_min, wn],
+                                        table[layer, t_min + 1, wn],
+                                        T, Tmin, Tmax)
+            out[layer, wn] += w*val
+
+
+@numba.njit(nogil=True, error_model='numpy')
+def accumulate_xsec_weights(xsec_grid, p_idx0, p_idx1, t_idx0, t_idx1,
+                            p_weight, t_weight, t_exp_factor, skip,
+                            exp_mode, wn_start, wn_end, scale, out):
+    """
+    Accumulates ``scale[layer]*xsec`` into ``out`` for every layer using
+    precomputed grid nodes and weights (see
+    :class:`~taurex.opacity.interpolateopacity.InterpolationWeights`).
+    As the nodes and weights only depend on the temperature and pressure
+    grid they can be shared by every molecule with the same grids.
+
+    Parameters
+    ----------
+    xsec_grid: :obj:`array`
+        Cross-section grid with shape ``(P, T, wn)``
+
+    p_idx0, p_idx1: :obj:`array`
+        Pressure nodes of each layer
+
+    t_idx0, t_idx1: :obj:`array`
+        Temperature nodes of each layer, equal if no interpolation
+        in temperature is needed
+
+    p_weight: :obj:`array`
+        Linear weight of ``p_idx1``
+
+    t_weight: :obj:`array`
+        Linear weight of ``t_idx1``
+
+    t_exp_factor: :obj:`array`
+        Exponent used for exponential interpolation in temperature
+
+    skip: :obj:`array`
+        Layers that contribute nothing
+
+    exp_mode: bool
+        Use exponential interpolation in temperature instead of linear
+
+    wn_start: int
+        First wavenumber index to use
+
+    wn_end: int
+        Last wavenumber index (exclusive) to use
+
+    scale: :obj:`array`
+        Factor to scale each layer by before accumulating
+
+    out: :obj:`array`
+        Array of shape ``(nlayers, wn_end-wn_start)`` to accumulate into
+
+    """
+    nwn = wn_end - wn_start
+    for layer in range(p_idx0.shape[0]):
+        if skip[layer]:
+            continue
+        s = scale[layer]
+        p0 = p_idx0[layer]
+        p1 = p_idx1[layer]
+        t0 = t_idx0[layer]
+        t1 = t_idx1[layer]
+        wp = p_weight[layer]
+        wt = t_weight[layer]
+        a = t_exp_factor[layer]
+        for wn in range(nwn):
+            idx = wn_start + wn
+            fx0 = xsec_grid[p0, t0, idx]*(1.0 - wp) + \
+                xsec_grid[p1, t0, idx]*wp
+            if t0 == t1:
+                out[layer, wn] += s*fx0
+                continue
+            fx1 = xsec_grid[p0, t1, idx]*(1.0 - wp) + \
+                xsec_grid[p1, t1, idx]*wp
+            if exp_mode:
+                out[layer, wn] += s*fx0*np.exp(-a*np.log(fx0/fx1))
+            else:
+                out[layer, wn] += s*(fx0*(1.0 - wt) + fx1*wt)
+
+
+@numba.njit(nogil=True, error_model='numpy')
+def resort_rebin_kcoeff(k_a, k_b, weights, g_edges, out):
+    """
+    Combines the k-distributions of two absorbers assuming their
+    absorption lines are randomly overlapping, then resorts and rebins the
+    ``ng*ng`` combined k-coefficients back onto the original g-points.
+    The k-coefficients in each g interval are averaged so the mean
+    absorption coefficient of each row is conserved.
+
+    Parameters
+    ----------
+    k_a, k_b: :obj:`array`
+        Ascending k-coefficients with shape ``(nrows, ng)``
+
+    weights: :obj:`array`
+        Quadrature weights of the g-points, summing to one
+
+    g_edges: :obj:`array`
+        Edges of the g interval of each g-point with length ``ng+1``
+
+    out: :obj:`array`
+        Array of shape ``(nrows, ng)`` to store the result in
+
+    """
+    nrows, ng = k_a.shape
+    heap_v = np.empty(ng)
+    heap_i = np.empty(ng, dtype=np.int64)
+    col = np.empty(ng, dtype=np.int64)
+    for row in range(nrows):
+        a = k_a[row]
+        b = k_b[row]
+        if b[ng - 1] == 0.0:
+            out[row] = a
+            continue
+        if a[ng - 1] == 0.0:
+            out[row] = b
+            continue
+        # Each row of the sum matrix a[i] + b[j] is already sorted so
+        # merge them with a heap rather than sorting all ng*ng values.
+        # As a is ascending the first column is already a valid heap
+        for i in range(ng):
+            heap_v[i] = a[i] + b[0]
+            heap_i[i] = i
+            col[i] = 0
+        size = ng
+
+        target = 0
+        acc = 0.0
+        g = 0.0
+        while size > 0:
+            i = heap_i[0]
+            j = col[i]
+            k = heap_v[0]
+            g_end = g + weights[i]*weights[j]
+            while target < ng - 1 and g_end > g_edges[target + 1]:
+                acc += k*(g_edges[target + 1] - g)
+                out[row, target] = acc/(g_edges[target + 1] -
+                                        g_edges[target])
+                acc = 0.0
+                g = g_edges[target + 1]
+                target += 1
+            acc += k*(g_end - g)
+            g = g_end
+
+            # Replace the smallest with the next in its row and sift down
+            j += 1
+            col[i] = j
+            if j < ng:
+                heap_v[0] = a[i] + b[j]
+            else:
+                size -= 1
+                heap_v[0] = heap_v[size]
+                heap_i[0] = heap_i[size]
+            pos = 0
+            value = heap_v[0]
+            index = heap_i[0]
+            while True:
+                child = 2*pos + 1
+                if child >= size:
+                    break
+                if child + 1 < size and heap_v[child + 1] < heap_v[child]:
+                    child += 1
+                if heap_v[child] >= value:
+                    break
+                heap_v[pos] = heap_v[child]
+                heap_i[pos] = heap_i[child]
+                pos = child
+            heap_v[pos] = value
+            heap_i[pos] = index
+        out[row, ng - 1] = acc/(g_edges[ng] - g_edges[ng - 1])
+
+
+@numba.njit(nogil=True, error_model='numpy')
+def accumulate_cia_profile(cia_grid, t_idx, t_weight, scale, out):
+    """
+    Linearly interpolates a CIA grid in temperature for every layer
+    and accumulates ``scale[layer]*sigma`` into ``out``
+
+    Parameters
+    ----------
+    cia_grid: :obj:`array`
+        Cross-sections with shape ``(T, wn)``
+
+    t_idx: :obj:`array`
+        Temperature node to the left of each layer
+
+    t_weight: :obj:`array`
+        Linear weight of the node to the right
+
+    scale: :obj:`array`
+        Factor to scale each layer by before accumulating
+
+    out: :obj:`array`
+        Array of shape ``(nlayers, wn)`` to accumulate into
+
+    """
+    nwn = cia_grid.shape[1]
+    for layer in range(t_idx.shape[0]):
+        s = scale[layer]
+        if s == 0.0:
+            continue
+        t0 = t_idx[layer]
+        wt = t_weight[layer]
+        for wn in range(nwn):
+            out[layer, wn] += s*(cia_grid[t0, wn]*(1.0 - wt) +
+                                 cia_grid[t0 + 1, wn]*wt)
+
+
+@numba.njit(nogil=True, error_model='numpy')
+def point_mass_gravity(height, params):
+    """
+    Gravity in ms-2 at ``height`` metres above the surface of a
+    spherical planet. ``params`` is ``[G*M, radius]``
+    """
+    return params[0]/((params[1] + height)**2)
+
+
+@numba.njit(nogil=True, error_model='numpy')
+def hydrostatic_profile(pressure_levels, temperature, mu, kboltz,
+                        gravity_law, gravity_params):
+    """
+    Integrates hydrostatic equilibrium upwards from the surface to find
+    the altitude, gravity and scale height of each layer. The surface
+    layer is at zero altitude.
+
+    Parameters
+    ----------
+    pressure_levels: :obj:`array`
+        Pressure at the boundaries of each layer from the surface up
+
+    temperature: :obj:`array`
+        Temperature of each layer
+
+    mu: :obj:`array`
+        Mean molecular weight of each layer
+
+    kboltz: float
+        Boltzmann constant
+
+    gravity_law: function
+        Compiled function ``gravity_law(height, gravity_params)``
+        giving the gravity at a height above the surface, see
+        :func:`point_mass_gravity`
+
+    gravity_params: :obj:`array`
+        Parameters of ``gravity_law``
+
+    Returns
+    -------
+    z: :obj:`array`
+        Altitude of each layer
+
+    g: :obj:`array`
+        Gravity of each layer
+
+    H: :obj:`array`
+        Scale height of each layer
+
+    """
+    nlayers = temperature.shape[0]
+    z = np.zeros(nlayers)
+    g = np.zeros(nlayers)
+    H = np.zeros(nlayers)
+
+    g[0] = gravity_law(0.0, gravity_params)
+    H[0] = (kboltz*temperature[0])/(mu[0]*g[0])
+    for i in range(1, nlayers):
+        deltaz = (-1.)*H[i-1]*np.log(pressure_levels[i] /
+                                     pressure_levels[i-1])
+        z[i] = z[i-1] + deltaz
+        g[i] = gravity_law(z[i], gravity_params)
+        H[i] = (kboltz*temperature[i])/(mu[i]*g[i])
+    return z, g, H
+
+
+def compute_interp_weights(x, xp):
+    """
+    Precomputes the indices and weights needed to linearly interpolate
+    from ``xp`` onto ``x``. Equivalent to :func:`numpy.interp` where values
+    outside of ``xp`` take the edge value.
+
+    Parameters
+    ----------
+    x: :obj:`array`
+        Coordinates to interpolate to
+
+    xp: :obj:`array`
+        Increasing coordinates of the data points, at least two
+
+    Returns
+    -------
+    idx: :obj:`array`
+        Index of the data point to the left of each coordinate
+
+    weight: :obj:`array`
+        Weight of the data point to the right of each coordinate
+
+    """
+    idx = np.clip(xp.searchsorted(x, side='right') - 1, 0, xp.shape[0] - 2)
+    x0 = xp[idx]
+    x1 = xp[idx + 1]
+    weight = np.clip((x - x0)/(x1 - x0), 0.0, 1.0)
+    return idx, weight
+
+
+def apply_interp_weights(fp, idx, weight):
+    """
+    Interpolates ``fp`` along its last axis using weights from
+    :func:`compute_interp_weights`
+
+    """
+    return fp[..., idx]*(1.0 - weight) + fp[..., idx + 1]*weight
+
+
 class OnlineVariance(object):
     """USes the M2 algorithm to compute the variance in a streaming fashion"""
 
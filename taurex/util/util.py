@@ -514,4 +514,65 @@ def create_grid_res(resolution, wave_min, wave_max):
         width_list.append(width)
         wave_list.append(wave)
 
-    return np.array((wave_list ,width_list)).T
\ No newline at end of file
+    return np.array((wave_list ,width_list)).T
+
+def file_signature(filename):
+    """
+    Cheap signature of a file from its size and modification time.
+    Used to detect when something derived from a file is stale.
+
+    Parameters
+    ----------
+    filename: str
+        File to sign
+
+    Returns
+    -------
+    :obj:`list`
+        ``[size, mtime_ns]``
+
+    """
+    import os
+    stat = os.stat(filename)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def user_cache_dir():
+    """
+    Directory used to store cached files. This is ``TAUREX_CACHE_DIR``
+    if set, otherwise ``~/.cache/taurex``. Created if it does not exist.
+    """
+    import os
+    path = os.environ.get('TAUREX_CACHE_DIR',
+                          os.path.join(os.path.expanduser('~'),
+                                       '.cache', 'taurex'))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def file_checksum(filename, block_size=2**20):
+    """
+    SHA-1 checksum of the contents of a file. Unlike
+    :func:`file_signature` this does not change when a file is
+    copied or touched, only when its contents do.
+
+    Parameters
+    ----------
+    filename: str
+        File to checksum
+
+    block_size: int, optional
+        Number of bytes read at a time
+
+    Returns
+    -------
+    str
+        Hex digest
+
+    """
+    import hashlib
+    digest = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
@@ -75,6 +75,180 @@ class TestOpacityCache(unittest.TestCase):
 
         self.assertIn('optest2', opList)
 
+    def test_prefetch(self):
+        opacity = OpacityCache()
+        opacity.clear_cache()
+        opacity.set_opacity_path(self.test_dir)
+
+        opacity.prefetch(['optest1', 'optest3', 'optest5', 'notamolecule'],
+                         num_threads=3)
+        self.assertEqual(set(opacity.opacity_dict.keys()),
+                         {'optest1', 'optest3', 'optest5'})
+        np.testing.assert_equal(opacity['optest3'].xsecGrid,
+                                self.opacity_list[3].xsecGrid)
+        opacity.clear_cache()
+
+    def test_memory_budget(self):
+        opacity = OpacityCache()
+        opacity.clear_cache()
+        opacity.set_opacity_path(self.test_dir)
+
+        single_size = opacity.opacity_nbytes(self.opacity_list[0])
+        opacity.set_max_bytes(single_size*2.5)
+
+        opacity['optest0']
+        opacity['optest1']
+        opacity['optest0']
+        opacity['optest2']
+
+        # optest1 was least recently used
+        self.assertNotIn('optest1', opacity.opacity_dict)
+        self.assertIn('optest0', opacity.opacity_dict)
+        self.assertIn('optest2', opacity.opacity_dict)
+        self.assertLessEqual(opacity.current_bytes, single_size*2.5)
+
+        # Reloaded transparently
+        self.assertEqual(opacity['optest1'].moleculeName, 'optest1')
+        self.assertNotIn('optest0', opacity.opacity_dict)
+
+        opacity.set_max_bytes(None)
+        opacity.clear_cache()
+
+    def test_common_grid(self):
+        import os
+        from taurex.opacity.mmapopacity import MMapOpacity
+        cache_dir = path.join(self.test_dir, 'resampled')
+        wngrid = np.linspace(500, 9000, 700)
+
+        opacity = OpacityCache()
+        opacity.set_opacity_path(self.test_dir)
+        opacity.set_resample_cache_dir(cache_dir)
+        opacity.set_common_grid(wngrid=wngrid)
+
+        resampled = opacity['optest0']
+        self.assertIsInstance(resampled, MMapOpacity)
+        self.assertEqual(resampled.moleculeName, 'optest0')
+        np.testing.assert_equal(resampled.wavenumberGrid, wngrid)
+        original = self.opacity_list[0]
+        np.testing.assert_allclose(
+            resampled.xsecGrid[3, 4],
+            np.interp(wngrid, original.wavenumberGrid,
+                      original.xsecGrid[3, 4]))
+
+        # The cached file is reused
+        cached = os.listdir(cache_dir)
+        self.assertEqual(len(cached), 1)
+        mtime = os.stat(path.join(cache_dir, cached[0])).st_mtime_ns
+        opacity.clear_cache()
+        opacity['optest0']
+        self.assertEqual(os.listdir(cache_dir), cached)
+        self.assertEqual(
+            os.stat(path.join(cache_dir, cached[0])).st_mtime_ns, mtime)
+
+        # Opacities already on the grid of the reference are untouched
+        opacity.set_common_grid(molecule='optest1')
+        np.testing.assert_equal(opacity.common_grid,
+                                original.wavenumberGrid)
+        np.testing.assert_equal(opacity['optest2'].xsecGrid,
+                                self.opacity_list[2].xsecGrid)
+
+        opacity.set_common_grid()
+        opacity.set_resample_cache_dir(None)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+
+class TestSharedMemoryOpacity(unittest.TestCase):
+
+    def setUp(self):
+        import h5py
+        self.test_dir = tempfile.mkdtemp()
+        self.xsec = np.random.rand(3, 4, 10)
+        with h5py.File(path.join(self.test_dir, 'CO.h5'), 'w') as f:
+            f['bin_edges'] = np.linspace(100, 1000, 10)
+            f['t'] = np.linspace(100, 1000, 4)
+            p = f.create_dataset('p', data=np.logspace(0, 2, 3))
+            p.attrs['units'] = 'bar'
+            f['xsecarr'] = self.xsec
+            f['mol_name'] = 'CO'
+
+    def test_shared_memory(self):
+        opacity = OpacityCache()
+        opacity.set_shared_memory(True)
+        opacity.set_opacity_path(self.test_dir)
+
+        co = opacity['CO']
+        self.assertIsInstance(co.xsecGrid, np.ndarray)
+        np.testing.assert_equal(co.xsecGrid, self.xsec)
+        self.assertIn('CO', opacity._shared_windows)
+
+        opacity.set_shared_memory(False)
+        self.assertEqual(len(opacity._shared_windows), 0)
+
+    def test_shared_memory_dtype(self):
+        import taurex.mpi
+        allocated = []
+
+        def allocate(shape, dtype):
+            window, array = allocate_shared_array(shape, dtype)
+            allocated.append(array)
+            return window, array
+
+        allocate_shared_array = taurex.mpi.allocate_shared_array
+        opacity = OpacityCache()
+        opacity.set_dtype('float32')
+        opacity.set_shared_memory(True)
+        opacity.set_opacity_path(self.test_dir)
+        self.addCleanup(opacity.set_dtype, 'float64')
+        self.addCleanup(opacity.set_shared_memory, False)
+
+        with patch('taurex.mpi.allocate_shared_array', side_effect=allocate):
+            co = opacity['CO']
+        # The shared array is used directly rather than a converted copy
+        self.assertIs(co.xsecGrid, allocated[0])
+        self.assertEqual(co.xsecGrid.dtype, np.float32)
+        np.testing.assert_equal(co.xsecGrid, self.xsec.astype(np.float32))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+
+class TestOpacityManifest(unittest.TestCase):
+
+    def setUp(self):
+        from taurex.opacity.mmapopacity import write_mmap_opacity
+        self.test_dir = tempfile.mkdtemp()
+        with open(path.join(self.test_dir, 'H2O.R1000.pickle'), 'wb') as f:
+            pickle.dump({}, f)
+        write_mmap_opacity(path.join(self.test_dir, 'co.mmap'), 'CO',
+                           np.linspace(100, 1000, 4), np.logspace(0, 5, 3),
+                           np.linspace(100, 1000, 10),
+                           np.random.rand(3, 4, 10))
+
+    def test_manifest(self):
+        from taurex.cache.manifest import OpacityManifest
+        manifest = OpacityManifest(self.test_dir)
+        entries = {e['molecule']: e for e in manifest.entries()}
+
+        self.assertEqual(set(entries.keys()), {'H2O', 'CO'})
+        self.assertEqual(entries['CO']['format'], 'mmap')
+        self.assertEqual(entries['CO']['shape'], [3, 4, 10])
+        self.assertEqual(entries['CO']['wn_range'], [100.0, 1000.0])
+        self.assertTrue(path.isfile(path.join(self.test_dir,
+                                              '.taurex_manifest.json')))
+
+        # A new manifest reads from disk and does not reinspect files
+        manifest = OpacityManifest(self.test_dir)
+        with patch.object(OpacityManifest, 'inspect_file') as inspect:
+            self.assertEqual(set(manifest.molecules()), {'H2O', 'CO'})
+            inspect.assert_not_called()
+
+        # Removed files are dropped
+        import os
+        os.remove(path.join(self.test_dir, 'H2O.R1000.pickle'))
+        self.assertEqual(manifest.molecules(), ['CO'])
+
     def tearDown(self):
         shutil.rmtree(self.test_dir)
 
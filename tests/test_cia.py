@@ -64,3 +64,79 @@ class PickleCIATest(unittest.TestCase):
             100000000), self.pop._xsec_grid[-1])
         np.testing.assert_equal(self.pop.cia(
             0.0000001), self.pop._xsec_grid[0])
+
+    def test_cia_profile(self):
+        temperatures = np.array([10.0, 200.0, 210.0, 237.5, 249.0, 1000.0])
+        wngrid = np.linspace(15, 10005, 50)
+        for grid in (None, wngrid, wngrid):
+            expected = np.array([self.pop.cia(t, grid)
+                                 for t in temperatures])
+            np.testing.assert_allclose(
+                self.pop.cia_profile(temperatures, grid), expected,
+                rtol=1e-12)
+        self.assertEqual(len(self.pop._resampled_grids), 1)
+
+        scale = np.arange(6.0)
+        out = np.ones((6, 50))
+        self.pop.accumulate_profile(temperatures, wngrid, scale, out)
+        np.testing.assert_allclose(
+            out, 1 + self.pop.cia_profile(temperatures, wngrid) *
+            scale[:, None], rtol=1e-12)
+
+
+class HitranCIATest(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        import os
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.test_dir, 'cache')
+        self.filename = os.path.join(self.test_dir, 'H2-He_test.cia')
+        self.wn = [np.linspace(20, 500, 5), np.linspace(501, 1000, 4)]
+        self.temps = [[200.0, 400.0], [200.0, 300.0, 400.0]]
+        self.sigma = [np.random.rand(2, 5), np.random.rand(3, 4)]
+        self.write_file()
+
+    def write_file(self):
+        with open(self.filename, 'w') as f:
+            for wn, temps, sigma in zip(self.wn, self.temps, self.sigma):
+                for T, sig in zip(temps, sigma):
+                    f.write('{:>20}{:10.3f}{:10.3f}{:7d}{:7.1f}{:10.3E}\n'.format(
+                        'H2-He', wn[0], wn[-1], wn.shape[0], T, sig.max()))
+                    for w, s in zip(wn, sig):
+                        f.write(' {:10.4f} {:.6E}\n'.format(w, s))
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.test_dir)
+
+    def check(self, cia):
+        self.assertEqual(cia.pairName, 'H2-He')
+        np.testing.assert_equal(cia.temperatureGrid, [200.0, 300.0, 400.0])
+        np.testing.assert_allclose(cia.wavenumberGrid,
+                                   np.concatenate(self.wn), rtol=1e-6)
+        xsec = cia._xsec_grid
+        np.testing.assert_allclose(xsec[::2, :5], self.sigma[0]*1e-10,
+                                   rtol=1e-6)
+        # Missing temperature interpolated
+        np.testing.assert_allclose(xsec[1, :5],
+                                   0.5*(xsec[0, :5] + xsec[2, :5]))
+        np.testing.assert_allclose(xsec[:, 5:], self.sigma[1]*1e-10,
+                                   rtol=1e-6)
+
+    def test_load_and_cache(self):
+        import os
+        from taurex.cia.hitrancia import HitranCIA
+        self.check(HitranCIA(self.filename, cache_dir=self.cache_dir))
+        cached = os.listdir(self.cache_dir)
+        self.assertEqual(len(cached), 1)
+
+        cia = HitranCIA(self.filename, cache_dir=self.cache_dir)
+        self.assertEqual(len(cia._wn_dict), 0)
+        self.check(cia)
+
+        # New contents means a new cache entry
+        self.sigma[0] = self.sigma[0]*2
+        self.write_file()
+        self.check(HitranCIA(self.filename, cache_dir=self.cache_dir))
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
@@ -20,3 +20,468 @@ class SimpleForwardModelTest(unittest.TestCase):
 
     def test_init(self):
         model = SimpleForwardModel('test')
+
+
+def gen_opacities(test_dir, molecules=('H2O', 'CH4'), seed=0):
+    """Writes random cross-sections of a sensible magnitude"""
+    rng = np.random.RandomState(seed)
+    for mol in molecules:
+        data = {'t': np.linspace(300, 3000, 10),
+                'p': np.logspace(-5, 2, 8),
+                'name': mol,
+                'wno': np.linspace(300, 10000, 2000),
+                'xsecarr': 10**rng.normal(-18, 1, (8, 10, 2000))}
+        with open(path.join(test_dir, '{}.pickle'.format(mol)), 'wb') as f:
+            pickle.dump(data, f)
+
+
+def build_transmission_model(**kwargs):
+    from taurex.model import TransmissionModel
+    from taurex.data.profiles.chemistry import TaurexChemistry, ConstantGas
+    from taurex.data.profiles.temperature import Guillot2010
+    from taurex.contributions import AbsorptionContribution, \
+        RayleighContribution
+    chemistry = TaurexChemistry()
+    chemistry.addGas(ConstantGas('H2O', 1e-4))
+    chemistry.addGas(ConstantGas('CH4', 1e-5))
+    model = TransmissionModel(chemistry=chemistry,
+                              temperature_profile=Guillot2010(),
+                              nlayers=30, **kwargs)
+    model.add_contribution(AbsorptionContribution())
+    model.add_contribution(RayleighContribution())
+    model.build()
+    return model
+
+
+class TransmissionModelTest(unittest.TestCase):
+
+    def setUp(self):
+        from taurex.cache import OpacityCache
+        self.test_dir = tempfile.mkdtemp()
+        gen_opacities(self.test_dir)
+        OpacityCache().clear_cache()
+        OpacityCache().set_opacity_path(self.test_dir)
+
+    def tearDown(self):
+        from taurex.cache import OpacityCache
+        OpacityCache().set_dtype('float64')
+        OpacityCache().clear_cache()
+        shutil.rmtree(self.test_dir)
+
+    def test_fused_absorption(self):
+        model = build_transmission_model()
+        model.model()
+        absorption = model.contribution_list[0]
+        wngrid = model.nativeWavenumberGrid
+
+        expected = np.zeros_like(absorption.sigma)
+        for gas, sigma in absorption.prepare_each(model, wngrid):
+            expected += sigma
+
+        absorption.prepare(model, wngrid)
+        np.testing.assert_allclose(absorption.sigma, expected, rtol=1e-10)
+
+    def test_ktables(self):
+        from taurex.cache import OpacityCache
+        from taurex.opacity import PickleOpacity
+        from taurex.opacity.ktableopacity import build_ktable
+        from taurex.contributions import KTableContribution
+        # Cross-sections that scale with temperature and pressure are
+        # perfectly correlated so correlated-k is near exact
+        rng = np.random.RandomState(1)
+        t = np.linspace(300, 3000, 10)
+        p = np.logspace(-5, 2, 8)
+        wno = np.linspace(300, 10000, 20000)
+        scale = (t[None, :]/1000)**1.5*p[:, None]**0.1
+        data = {'t': t, 'p': p, 'name': 'H2O', 'wno': wno,
+                'xsecarr': scale[..., None]*10**rng.normal(-20, 1.5, 20000)}
+        filename = path.join(self.test_dir, 'H2O.pickle')
+        with open(filename, 'wb') as f:
+            pickle.dump(data, f)
+
+        edges = np.geomspace(400, 9000, 51)
+        for mol in ('H2O', 'CH4'):
+            opacity = PickleOpacity(path.join(self.test_dir,
+                                              '{}.pickle'.format(mol)))
+            opacity._molecule_name = mol
+            build_ktable(opacity, edges,
+                         path.join(self.test_dir,
+                                   '{}.ktable.h5'.format(mol)))
+        OpacityCache().clear_cache()
+
+        # Line-by-line with only H2O then averaged in each bin
+        model = build_transmission_model()
+        model['CH4'] = 1e-20
+        native_grid, spectrum = model.model()[:2]
+        bins = np.digitize(native_grid, edges) - 1
+        reference = np.array([spectrum[bins == b].mean() for b in range(50)])
+        # k-tables are not used as cross-sections
+        self.assertIsInstance(OpacityCache()['H2O'], PickleOpacity)
+
+        for method in ('rorr', 'ro'):
+            model = build_transmission_model()
+            model.contribution_list[0] = KTableContribution(method=method)
+            OpacityCache().clear_cache()
+            model.build()
+            model['CH4'] = 1e-20
+            grid, ck_spectrum = model.model()[:2]
+            np.testing.assert_allclose(grid, 0.5*(edges[1:] + edges[:-1]))
+            np.testing.assert_allclose(ck_spectrum, reference, rtol=2e-3)
+            # Only the k-tables are loaded
+            self.assertEqual(len(OpacityCache().opacity_dict), 0)
+            self.assertIn('H2O', OpacityCache().ktable_dict)
+
+        # Absorption would be counted twice
+        from taurex.exceptions import InvalidModelException
+        model = build_transmission_model()
+        model.add_contribution(KTableContribution())
+        with self.assertRaises(InvalidModelException):
+            model.build()
+
+    def build_full_model(self, **kwargs):
+        """Transmission model with CIA and clouds as well"""
+        from taurex.cache import CIACache
+        from taurex.cia import PickleCIA
+        from taurex.contributions import CIAContribution, \
+            SimpleCloudsContribution
+        if 'H2-He' not in CIACache().cia_dict:
+            cia_file = path.join(self.test_dir, 'H2-He.db')
+            with open(cia_file, 'wb') as f:
+                pickle.dump({'t': np.linspace(200, 3000, 5),
+                             'wno': np.linspace(100, 12000, 500),
+                             'xsecarr': np.random.rand(5, 500)*1e-45}, f)
+            CIACache().cia_dict['H2-He'] = PickleCIA(cia_file)
+            self.addCleanup(CIACache().cia_dict.pop, 'H2-He')
+
+        model = build_transmission_model(**kwargs)
+        model.add_contribution(CIAContribution(cia_pairs=['H2-He']))
+        model.add_contribution(SimpleCloudsContribution(1e4))
+        model.build()
+        return model
+
+    def test_matrix_path_integral(self):
+        spectra = []
+        for mode in ('layer', 'matrix'):
+            model = self.build_full_model(path_integral_mode=mode,
+                                          saturation_threshold=None)
+            spectra.append(model.model()[1])
+        np.testing.assert_allclose(spectra[1], spectra[0], rtol=1e-9)
+
+        # Chord through each layer from the radius of its top
+        z = model.altitudeProfile
+        dz = np.gradient(z)
+        radius = model.planet.fullRadius + dz[0]/2 + z
+        top = radius + dz/2
+        path_matrix = model.compute_path_length_matrix(dz)
+        self.assertTrue(np.all(np.tril(path_matrix, -1) == 0))
+        for layer in range(model.nLayers):
+            chord = 2*np.sqrt(top[layer:]**2 - radius[layer]**2)
+            np.testing.assert_allclose(
+                path_matrix[layer, layer:],
+                np.diff(chord, prepend=0.0), rtol=1e-10)
+
+        with self.assertRaises(ValueError):
+            build_transmission_model(path_integral_mode='bad')
+
+    def test_contribution_fusion(self):
+        from taurex.contributions import FusedContribution
+        reference = self.build_full_model(saturation_threshold=None)
+        reference.fuse_contributions = lambda contributions: contributions
+        spectrum = reference.model()[1]
+
+        model = self.build_full_model(saturation_threshold=None)
+        np.testing.assert_allclose(model.model()[1], spectrum, rtol=1e-12)
+
+        contribs = {c.name: c for c in model.contribution_list}
+        fused = model.fuse_contributions(model.contribution_list)
+        self.assertEqual(sorted(c.name for c in fused),
+                         ['CIA', 'Fused', 'SimpleClouds'])
+        fused = [c for c in fused if isinstance(c, FusedContribution)][0]
+        np.testing.assert_allclose(
+            fused.sigma,
+            contribs['Absorption'].sigma + contribs['Rayleigh'].sigma,
+            rtol=1e-15)
+
+        # Buffer is reused
+        sigma = fused.sigma
+        model.model()
+        self.assertIs(fused.sigma, sigma)
+
+    def test_hydrostatic_profile(self):
+        import numba
+        from taurex.constants import KBOLTZ
+        from taurex.data.planet import Planet
+
+        def reference(model):
+            levels = model.pressure.pressure_profile_levels
+            T = model.temperatureProfile
+            mu = model.chemistry.muProfile
+            nlayers = model.nLayers
+            z, g, H = np.zeros((3, nlayers))
+            g[0] = model.planet.gravity_at_height(0.0)
+            H[0] = KBOLTZ*T[0]/(mu[0]*g[0])
+            for i in range(1, nlayers):
+                z[i] = z[i-1] - H[i-1]*np.log(levels[i]/levels[i-1])
+                g[i] = model.planet.gravity_at_height(z[i])
+                H[i] = KBOLTZ*T[i]/(mu[i]*g[i])
+            return z, g, H
+
+        @numba.njit
+        def constant_gravity(height, params):
+            return params[0]
+
+        class PythonGravity(Planet):
+            def gravity_at_height(self, height):
+                return self.gravity*0.5
+
+        class CompiledGravity(PythonGravity):
+            def gravity_law(self):
+                return constant_gravity, np.array([self.gravity*0.5])
+
+        for planet in (Planet(), PythonGravity(), CompiledGravity()):
+            model = build_transmission_model()
+            model._planet = planet
+            model.initialize_profiles()
+            for test, ref in zip((model.altitudeProfile,
+                                  model.gravity_profile,
+                                  model.scaleheight_profile),
+                                 reference(model)):
+                np.testing.assert_allclose(test, ref, rtol=1e-12)
+        np.testing.assert_allclose(model.gravity_profile,
+                                   planet.gravity*0.5)
+
+    def test_density_profile(self):
+        from taurex.constants import KBOLTZ
+        model = build_transmission_model()
+        density = model.densityProfile
+        self.assertIs(model.densityProfile, density)
+
+        model['T_irr'] = 1000.0
+        np.testing.assert_allclose(
+            model.densityProfile,
+            model.pressureProfile/(KBOLTZ*model.temperatureProfile))
+        self.assertFalse(np.array_equal(model.densityProfile, density))
+
+    def test_incremental_prepare(self):
+        model = self.build_full_model()
+        model.model()
+        contribs = {c.name: c for c in model.contribution_list}
+        sigmas = {name: c.sigma for name, c in contribs.items()}
+
+        # Temperature only changes absorption and CIA
+        model['T_irr'] = 1000.0
+        model['clouds_pressure'] = 1e2
+        spectrum = model.model()[1]
+        for name, changed in (('Absorption', True), ('CIA', True),
+                              ('Rayleigh', False), ('SimpleClouds', True)):
+            self.assertEqual(contribs[name].sigma is not sigmas[name],
+                             changed)
+
+        reference = self.build_full_model()
+        reference['T_irr'] = 1000.0
+        reference['clouds_pressure'] = 1e2
+        np.testing.assert_array_equal(spectrum, reference.model()[1])
+
+        # Per-component models replace the cross-sections
+        model.model_full_contrib()
+        np.testing.assert_array_equal(model.model()[1], spectrum)
+
+    def test_saturation(self):
+        # Opt-in
+        self.assertIsNone(build_transmission_model().saturationThreshold)
+        reference = self.build_full_model(saturation_threshold=None)
+        __, spectrum, transmittance, __ = reference.model()
+        self.assertTrue(np.any(transmittance < np.exp(-10)))
+
+        for threshold, overhead in ((5.0, 0), (10.0, 0), (10.0, 8)):
+            model = self.build_full_model(saturation_threshold=threshold)
+            # No overhead always skips saturated wavenumbers
+            model.range_overhead = overhead
+            __, test_spectrum, test_transmittance, __ = model.model()
+            self.assertIsNone(model.activeWavenumberRanges)
+            self.assertTrue(np.all(np.abs(test_transmittance -
+                                          transmittance) <=
+                                   np.exp(-threshold)))
+        np.testing.assert_allclose(test_spectrum, spectrum, rtol=1e-5)
+
+    def test_pressure_tables(self):
+        from taurex.cache import OpacityCache
+        cache = OpacityCache()
+        reference = build_transmission_model().model()[1]
+        xsec_bytes = cache.current_bytes
+
+        model = build_transmission_model()
+        model.contribution_list[0]._use_pressure_tables = True
+        np.testing.assert_allclose(model.model()[1], reference, rtol=1e-12)
+        self.assertEqual(len(cache._pressure_tables), 2)
+
+        # Tables count towards the memory budget
+        table_bytes = sum(t.nbytes for t in cache._pressure_tables.values())
+        self.assertEqual(cache.current_bytes, xsec_bytes + table_bytes)
+
+        # Changing temperature reuses tables
+        tables = dict(cache._pressure_tables)
+        model['T_irr'] = 1500.0
+        model.model()
+        self.assertIs(tables['H2O'], cache._pressure_tables['H2O'])
+
+        # and are evicted with their molecule
+        cache.set_max_bytes(cache.molecule_nbytes('H2O') +
+                            cache.molecule_nbytes('CH4') - 1)
+        self.assertEqual(len(cache._pressure_tables), 1)
+        cache.set_max_bytes(None)
+
+        # Not used when fitting pressure
+        name, latex, fget, fset, mode, to_fit, bounds = \
+            model.fittingParameters['atm_min_pressure']
+        model.fittingParameters['atm_min_pressure'] = \
+            (name, latex, fget, fset, mode, True, bounds)
+        model.model()
+        self.assertEqual(len(cache._pressure_tables), 0)
+
+    def test_float32_accuracy(self):
+        from taurex.cache import OpacityCache
+        reference = build_transmission_model().model()[1]
+
+        OpacityCache().set_dtype('float32')
+        model = build_transmission_model()
+        test = model.model()[1]
+        self.assertEqual(model.contribution_list[0].sigma.dtype, np.float32)
+
+        self.assertEqual(test.dtype, np.float64)
+        np.testing.assert_allclose(test, reference, rtol=1e-5)
+
+    def test_chisq_batch(self):
+        from taurex.contributions import AbsorptionContribution
+        from taurex.data.spectrum.array import ArraySpectrum
+        from taurex.optimizer.optimizer import Optimizer
+        model = self.build_full_model()
+        wavelength = np.linspace(1.2, 10.0, 40)
+        observed = ArraySpectrum(np.column_stack(
+            (wavelength, np.full(40, 1e-2), np.full(40, 1e-4))))
+        opt = Optimizer('test', observed=observed, model=model)
+        opt.enable_fit('T_irr')
+        opt.enable_fit('H2O')
+        opt.enable_fit('planet_radius')
+        opt.compile_params()
+
+        params = np.array([[1500.0, -4.0, 1.0], [1200.0, -3.0, 1.1],
+                           [2000.0, -5.0, 0.9]])
+        data = observed.spectrum
+        datastd = observed.errorBar
+        with patch.object(AbsorptionContribution, 'prepare') as prepare:
+            chisq = opt.chisq_batch(params, data, datastd)
+        # Cross-sections are only interpolated for the whole batch
+        prepare.assert_not_called()
+        self.assertEqual(model['T_irr'], 1500.0)
+
+        expected = [opt.chisq_trans(row, data, datastd) for row in params]
+        np.testing.assert_allclose(chisq, expected, rtol=1e-10)
+
+
+def layer_by_layer_emission(model, wngrid):
+    """The original emission integral, calling contributions per layer"""
+    from taurex.util.emission import black_body
+    from taurex.constants import PI
+    dz = np.gradient(model.altitudeProfile)
+    density = model.densityProfile
+    total_layers = model.nLayers
+    temperature = model.temperatureProfile
+    tau = np.zeros(shape=(total_layers, wngrid.shape[0]))
+    surface_tau = np.zeros(shape=(1, wngrid.shape[0]))
+    layer_tau = np.zeros(shape=(1, wngrid.shape[0]))
+    dtau = np.zeros(shape=(1, wngrid.shape[0]))
+    for contrib in model.contribution_list:
+        contrib.contribute(model, 0, total_layers, 0, 0,
+                           density, surface_tau, path_length=dz)
+    BB = black_body(wngrid, temperature[0])/PI
+    _mu = 1.0/model._mu_quads[:, None]
+    _w = model._wi_quads[:, None]
+    I = BB * (np.exp(-surface_tau*_mu))
+    for layer in range(total_layers):
+        layer_tau[...] = 0.0
+        dtau[...] = 0.0
+        for contrib in model.contribution_list:
+            contrib.contribute(model, layer+1, total_layers,
+                               0, 0, density, layer_tau, path_length=dz)
+            contrib.contribute(model, layer, layer+1, 0,
+                               0, density, dtau, path_length=dz)
+        tau[layer] += (np.exp(-layer_tau) - np.exp(-dtau))[0]
+        dtau += layer_tau
+        BB = black_body(wngrid, temperature[layer])/PI
+        I += BB * (np.exp(-layer_tau*_mu) - np.exp(-dtau*_mu))
+    flux_total = 2.0 * np.pi * sum(I * (_w / _mu))
+    return model.compute_final_flux(flux_total).flatten(), tau
+
+
+class EmissionModelTest(unittest.TestCase):
+
+    def setUp(self):
+        from taurex.cache import OpacityCache
+        self.test_dir = tempfile.mkdtemp()
+        gen_opacities(self.test_dir)
+        OpacityCache().clear_cache()
+        OpacityCache().set_opacity_path(self.test_dir)
+
+    def tearDown(self):
+        from taurex.cache import OpacityCache
+        OpacityCache().clear_cache()
+        shutil.rmtree(self.test_dir)
+
+    def test_path_integral(self):
+        from taurex.model import EmissionModel, DirectImageModel
+        from taurex.data.profiles.chemistry import TaurexChemistry, \
+            ConstantGas
+        from taurex.data.profiles.temperature import Guillot2010
+        from taurex.contributions import AbsorptionContribution, \
+            RayleighContribution, FlatMieContribution
+
+        class LayerRayleigh(RayleighContribution):
+            # Only available one layer at a time
+            def contribute(self, *args, **kwargs):
+                super().contribute(*args, **kwargs)
+
+        for klass in (EmissionModel, DirectImageModel):
+            chemistry = TaurexChemistry()
+            chemistry.addGas(ConstantGas('H2O', 1e-6))
+            chemistry.addGas(ConstantGas('CH4', 1e-7))
+            model = klass(chemistry=chemistry,
+                          temperature_profile=Guillot2010(), nlayers=30)
+            model.add_contribution(AbsorptionContribution())
+            model.add_contribution(LayerRayleigh())
+            model.add_contribution(FlatMieContribution(flat_mix_ratio=1e-6))
+            model.build()
+            self.assertIsNone(model.contribution_list[1].path_opacity(
+                model, model.densityProfile))
+
+            native_grid, flux, tau, __ = model.model()
+            ref_flux, ref_tau = layer_by_layer_emission(model, native_grid)
+            np.testing.assert_allclose(flux, ref_flux, rtol=1e-10)
+            np.testing.assert_allclose(tau, ref_tau, rtol=1e-8, atol=1e-14)
+
+    def test_simple_clouds(self):
+        from taurex.model import EmissionModel
+        from taurex.data.profiles.chemistry import TaurexChemistry, \
+            ConstantGas
+        from taurex.data.profiles.temperature import Guillot2010
+        from taurex.contributions import AbsorptionContribution, \
+            SimpleCloudsContribution
+        chemistry = TaurexChemistry()
+        chemistry.addGas(ConstantGas('H2O', 1e-6))
+        model = EmissionModel(chemistry=chemistry,
+                              temperature_profile=Guillot2010(), nlayers=30)
+        model.add_contribution(AbsorptionContribution())
+        model.add_contribution(SimpleCloudsContribution(1e3))
+        model.build()
+
+        native_grid, flux, tau, __ = model.model()
+        ref_flux, ref_tau = layer_by_layer_emission(model, native_grid)
+        np.testing.assert_allclose(flux, ref_flux, rtol=1e-10)
+        np.testing.assert_allclose(tau, ref_tau, rtol=1e-8, atol=1e-14)
+
+        # Layers below the cloud top are hidden, the cloud top and
+        # the layers above it emit
+        cloud_top = np.flatnonzero(model.pressureProfile >= 1e3)[-1]
+        self.assertTrue(np.all(tau[:cloud_top] == 0))
+        self.assertGreater(tau[cloud_top].max(), 0)
+        self.assertTrue(np.all(flux > 0))
@@ -53,3 +53,410 @@ class PickleOpacityTest(unittest.TestCase):
             test = self.pop.compute_opacity(t_idx, p_idx*1e5)
             self.assertEqual(test.shape[0], xsec.shape[0])
             np.testing.assert_almost_equal(xsec/10000, test, decimal=4)
+
+
+class OpacityProfileTest(unittest.TestCase):
+
+    def setUp(self):
+        import pickle
+        import tempfile
+        import os
+        data = {'t': np.linspace(300, 2000, 8),
+                'p': np.logspace(-4, 2, 6),
+                'name': 'testMol',
+                'wno': np.linspace(300, 10000, 200),
+                'xsecarr': np.random.rand(6, 8, 200) + 0.1}
+        fd, self.filename = tempfile.mkstemp(suffix='.pickle')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(data, f)
+        self.pop = PickleOpacity(self.filename)
+
+        # In range, beyond and below both grids
+        self.temperature = np.array([400.0, 1234.5, 2000.0, 2500.0,
+                                     1500.0, 200.0, 700.0, 2200.0, 100.0,
+                                     200.0])
+        self.pressure = np.array([50.0, 1e4, 1e3, 5e6,
+                                  1e8, 1e6, 1.0, 1.0, 1.0, 1e8])
+
+    def tearDown(self):
+        import os
+        os.remove(self.filename)
+
+    def _compare(self, wngrid=None):
+        expected = np.array([self.pop.opacity(t, p, wngrid) for t, p in
+                             zip(self.temperature, self.pressure)])
+        test = self.pop.opacity_profile(self.temperature, self.pressure,
+                                        wngrid)
+        self.assertEqual(test.shape, expected.shape)
+        np.testing.assert_allclose(test, expected, rtol=1e-10)
+
+    def test_linear(self):
+        self._compare()
+        self._compare(np.linspace(1000, 5000, 50))
+
+    def test_exp(self):
+        self.pop.set_interpolation_mode('exp')
+        self._compare()
+        self._compare(np.linspace(1000, 5000, 50))
+
+    def test_shared_weights(self):
+        weights = self.pop.interpolation_weights(self.temperature,
+                                                 self.pressure)
+        scale = np.random.rand(self.temperature.shape[0])
+        for mode in ('linear', 'exp'):
+            self.pop.set_interpolation_mode(mode)
+            for wngrid in (None, np.linspace(1000, 5000, 50)):
+                expected = self.pop.opacity_profile(
+                    self.temperature, self.pressure, wngrid)*scale[:, None]
+                out = np.ones_like(expected)
+                self.pop.accumulate_opacity_profile(weights, scale, out,
+                                                    wngrid)
+                np.testing.assert_allclose(out - 1, expected, rtol=1e-7,
+                                           atol=1e-20)
+
+    def test_pressure_table(self):
+        for mode in ('linear', 'exp'):
+            self.pop.set_interpolation_mode(mode)
+            for wngrid in (None, np.linspace(1000, 5000, 50)):
+                table = self.pop.pressure_table(self.pressure, wngrid)
+                self.assertTrue(table.matches(self.pop, self.pressure, wngrid))
+                self.assertFalse(table.matches(self.pop, self.pressure*2,
+                                               wngrid))
+                np.testing.assert_allclose(
+                    table.opacity_profile(self.temperature),
+                    self.pop.opacity_profile(self.temperature, self.pressure,
+                                             wngrid), rtol=1e-12)
+
+
+class MMapOpacityTest(unittest.TestCase):
+
+    def setUp(self):
+        import pickle
+        import tempfile
+        import os
+        self.test_dir = tempfile.mkdtemp()
+        self.data = {'t': np.linspace(300, 2000, 8),
+                     'p': np.logspace(-4, 2, 6),
+                     'name': 'testMol',
+                     'wno': np.linspace(300, 10000, 200),
+                     'xsecarr': np.random.rand(6, 8, 200) + 0.1}
+        self.pickle_file = os.path.join(self.test_dir, 'testMol.pickle')
+        with open(self.pickle_file, 'wb') as f:
+            pickle.dump(self.data, f)
+        self.pop = PickleOpacity(self.pickle_file)
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.test_dir)
+
+    def test_convert(self):
+        import os
+        from taurex.opacity.mmapopacity import MMapOpacity, convert_to_mmap
+        filename = os.path.join(self.test_dir, 'testMol.mmap')
+        convert_to_mmap(self.pop, filename)
+
+        mop = MMapOpacity(filename)
+        self.assertIsInstance(mop.xsecGrid, np.memmap)
+        self.assertEqual(mop.moleculeName, 'testMol')
+        np.testing.assert_equal(mop.temperatureGrid, self.pop.temperatureGrid)
+        np.testing.assert_equal(mop.pressureGrid, self.pop.pressureGrid)
+        np.testing.assert_equal(mop.wavenumberGrid, self.pop.wavenumberGrid)
+        np.testing.assert_equal(mop.xsecGrid, self.data['xsecarr'])
+
+        temperature = np.array([400.0, 1234.5, 2500.0])
+        pressure = np.array([50.0, 1e4, 1e8])
+        np.testing.assert_equal(
+            mop.opacity_profile(temperature, pressure),
+            self.pop.opacity_profile(temperature, pressure))
+
+    def test_cache_discovery(self):
+        import os
+        from taurex.cache import OpacityCache
+        from taurex.opacity.mmapopacity import MMapOpacity, convert_to_mmap
+        convert_to_mmap(self.pop, os.path.join(self.test_dir, 'test.mmap'))
+
+        cache = OpacityCache()
+        cache.clear_cache()
+        cache.set_opacity_path(self.test_dir)
+        self.assertIn('testMol', cache.find_list_of_molecules())
+        self.assertIsInstance(cache['testMol'], MMapOpacity)
+        cache.clear_cache()
+
+
+class KTableOpacityTest(unittest.TestCase):
+
+    def setUp(self):
+        import pickle
+        import tempfile
+        import os
+        self.test_dir = tempfile.mkdtemp()
+        rng = np.random.RandomState(0)
+        self.data = {'t': np.linspace(300, 2000, 8),
+                     'p': np.logspace(-4, 2, 6),
+                     'name': 'testMol',
+                     'wno': np.linspace(300, 10000, 2000),
+                     'xsecarr': 10**rng.normal(-20, 0.5, (6, 8, 2000))}
+        self.filename = os.path.join(self.test_dir, 'test.pickle')
+        with open(self.filename, 'wb') as f:
+            pickle.dump(self.data, f)
+        self.pop = PickleOpacity(self.filename)
+        self.pop._molecule_name = 'testMol'
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.test_dir)
+
+    def test_build(self):
+        import os
+        from taurex.opacity.ktableopacity import KTableOpacity, build_ktable
+        edges = np.linspace(1000, 9000, 11)
+        filename = os.path.join(self.test_dir, 'test.ktable.h5')
+        build_ktable(self.pop, edges, filename, ngauss=30)
+
+        ktable = KTableOpacity(filename)
+        self.assertEqual(ktable.moleculeName, 'testMol')
+        self.assertEqual(ktable.kcoeffGrid.shape, (6, 8, 10, 30))
+        np.testing.assert_allclose(ktable.weights.sum(), 1.0)
+        np.testing.assert_allclose(ktable.pressureGrid, self.pop.pressureGrid)
+        self.assertTrue(np.all(np.diff(ktable.kcoeffGrid, axis=-1) >= 0))
+
+        # At the grid nodes the mean k is the mean cross-section in a bin
+        wno = self.data['wno']
+        in_bin = (wno >= edges[3]) & (wno < edges[4])
+        expected = self.data['xsecarr'][2, 5, in_bin].mean()/10000
+        mean_k = ktable.opacity_profile(ktable.temperatureGrid[[5]],
+                                        ktable.pressureGrid[[2]])
+        np.testing.assert_allclose(mean_k[0, 3], expected, rtol=5e-2)
+
+        temperature = np.array([ktable.temperatureGrid[4], 1234.5])
+        pressure = np.array([ktable.pressureGrid[1], 1e4])
+        kcoeff = ktable.kcoeff_profile(temperature, pressure)
+        self.assertEqual(kcoeff.shape, (2, 10, 30))
+        np.testing.assert_allclose(kcoeff[0], ktable.kcoeffGrid[1, 4]/10000)
+        np.testing.assert_allclose(
+            kcoeff[1].dot(ktable.weights),
+            ktable.opacity(1234.5, 1e4))
+
+        # Indexing reads the grids but not the k-coefficients
+        from taurex.cache.manifest import OpacityManifest
+        with patch.object(KTableOpacity, '_load_ktable_file',
+                          side_effect=AssertionError):
+            entries = OpacityManifest(self.test_dir).entries('ktable')
+        self.assertEqual(entries[0]['molecule'], 'testMol')
+        self.assertEqual(entries[0]['shape'], [6, 8, 10])
+        self.assertEqual(entries[0]['p_range'],
+                         [ktable.pressureGrid.min(), ktable.pressureGrid.max()])
+
+        # Clearing the cache drops loaded k-tables
+        from taurex.cache import OpacityCache
+        cache = OpacityCache()
+        cache.clear_cache()
+        cache.set_opacity_path(self.test_dir)
+        self.assertEqual(cache.get_ktable('testMol').moleculeName, 'testMol')
+        self.assertIn('testMol', cache.ktable_dict)
+        cache.clear_cache()
+        self.assertEqual(len(cache.ktable_dict), 0)
+
+    def test_resort_rebin(self):
+        from taurex.util.math import resort_rebin_kcoeff
+        from taurex.opacity.ktableopacity import gauss_legendre_g
+        __, weights = gauss_legendre_g(10)
+        g_edges = np.concatenate(([0.0], np.cumsum(weights)))
+        k_a = np.sort(10**np.random.normal(0, 2, (5, 10)), axis=1)
+        k_b = np.sort(10**np.random.normal(0, 2, (5, 10)), axis=1)
+        k_b[0] = 0.0
+        out = np.empty_like(k_a)
+        resort_rebin_kcoeff(k_a, k_b, weights, g_edges, out)
+
+        np.testing.assert_equal(out[0], k_a[0])
+        # Mean absorption is conserved and the result stays sorted
+        np.testing.assert_allclose(out.dot(weights),
+                                   k_a.dot(weights) + k_b.dot(weights))
+        self.assertTrue(np.all(np.diff(out, axis=1) >= 0))
+
+        # Compare against sorting every combination
+        for row in range(1, 5):
+            pair_k = (k_a[row][:, None] + k_b[row][None, :]).ravel()
+            pair_w = np.outer(weights, weights).ravel()
+            order = np.argsort(pair_k)
+            upper = np.cumsum(pair_w[order])
+            lower = upper - pair_w[order]
+            overlap = np.clip(np.minimum(upper[:, None], g_edges[None, 1:]) -
+                              np.maximum(lower[:, None], g_edges[None, :-1]),
+                              0, None)
+            expected = pair_k[order].dot(overlap)/weights
+            np.testing.assert_allclose(out[row], expected, rtol=1e-10)
+
+
+class ExoTransmitOpacityTest(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        import os
+        self.test_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.test_dir, 'opacCH4.dat')
+        self.t = np.array([100.0, 200.0, 300.0])
+        self.p = np.array([1e-4, 1e-2])
+        self.wl = np.array([1e-6, 2e-6, 1.5e-6, 5e-7])
+        self.xsec = np.random.rand(4, 2, 3)*1e-20
+        self.write_file()
+
+    def write_file(self):
+        with open(self.filename, 'w') as f:
+            f.write(' '.join(str(t) for t in self.t) + '\n')
+            f.write(' '.join(str(p) for p in self.p) + '\n')
+            for wl_idx, wl in enumerate(self.wl):
+                f.write('{}\n'.format(wl))
+                for p_idx, p in enumerate(self.p):
+                    f.write('{} {}\n'.format(p, ' '.join(
+                        '{:.6e}'.format(x) for x in self.xsec[wl_idx, p_idx])))
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.test_dir)
+
+    def check(self, op):
+        order = np.argsort(0.01/self.wl)
+        np.testing.assert_allclose(op.wavenumberGrid, 0.01/self.wl[order])
+        np.testing.assert_equal(op.temperatureGrid, self.t)
+        np.testing.assert_allclose(op.pressureGrid, self.p*1e5)
+        self.assertEqual(op.xsecGrid.shape, (2, 3, 4))
+        np.testing.assert_allclose(
+            op.xsecGrid, (np.transpose(self.xsec[order], (1, 2, 0)) +
+                          1e-60)*10000, rtol=1e-6)
+
+    def test_load(self):
+        import os
+        from taurex.opacity.exotransmit import ExoTransmitOpacity
+        op = ExoTransmitOpacity(self.filename)
+        self.assertEqual(op.moleculeName, 'CH4')
+        self.check(op)
+
+        sidecar = self.filename + ExoTransmitOpacity.sidecar_extension
+        self.assertTrue(os.path.exists(sidecar))
+        mtime = os.stat(sidecar).st_mtime_ns
+        self.check(ExoTransmitOpacity(self.filename))
+        self.assertEqual(os.stat(sidecar).st_mtime_ns, mtime)
+
+        # Changing the file invalidates the binary copy
+        self.xsec = self.xsec*2
+        self.write_file()
+        os.utime(self.filename, ns=(mtime + 10**9, mtime + 10**9))
+        self.check(ExoTransmitOpacity(self.filename))
+
+
+class WavenumberPlanTest(unittest.TestCase):
+
+    def test_plan(self):
+        from taurex.opacity.opacity import WavenumberPlan
+        native = np.linspace(300, 10000, 200)
+        wngrid = np.sort(np.random.uniform(1000, 5000, 50))
+        values = np.random.rand(3, 200)
+
+        plan = WavenumberPlan(native, wngrid)
+        clipped = native[plan.wn_slice]
+        np.testing.assert_equal(
+            clipped, native[(native >= wngrid.min()) &
+                            (native <= wngrid.max())])
+        self.assertFalse(plan.is_native)
+
+        expected = np.array([np.interp(wngrid, clipped, v)
+                             for v in values[:, plan.wn_slice]])
+        np.testing.assert_allclose(plan.resample(values[:, plan.wn_slice]),
+                                   expected, rtol=1e-12)
+
+        native_plan = WavenumberPlan(native, native[10:50])
+        self.assertTrue(native_plan.is_native)
+
+    def test_memoized(self):
+        import pickle
+        import tempfile
+        import os
+        data = {'t': np.linspace(300, 2000, 8),
+                'p': np.logspace(-4, 2, 6),
+                'name': 'testMol',
+                'wno': np.linspace(300, 10000, 200),
+                'xsecarr': np.random.rand(6, 8, 200)}
+        fd, filename = tempfile.mkstemp(suffix='.pickle')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(data, f)
+        pop = PickleOpacity(filename)
+        os.remove(filename)
+
+        wngrid = np.linspace(1000, 5000, 50)
+        plan = pop.wavenumber_plan(wngrid)
+        with patch('taurex.opacity.opacity.np.array_equal') as array_equal:
+            self.assertIs(plan, pop.wavenumber_plan(wngrid))
+            array_equal.assert_not_called()
+        self.assertIs(plan, pop.wavenumber_plan(wngrid.copy()))
+        self.assertIsNot(plan, pop.wavenumber_plan(wngrid*1.1))
+
+        wn_filter = np.where((pop.wavenumberGrid >= wngrid.min()) &
+                             (pop.wavenumberGrid <= wngrid.max()))[0]
+        np.testing.assert_allclose(
+            pop.opacity(1000.0, 1e4, wngrid),
+            np.interp(wngrid, pop.wavenumberGrid[wn_filter],
+                      pop.compute_opacity(1000.0, 1e4, wn_filter)),
+            rtol=1e-12)
+
+
+class HDF5BlockCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        import h5py
+        import tempfile
+        import os
+        fd, self.filename = tempfile.mkstemp(suffix='.h5')
+        os.close(fd)
+        with h5py.File(self.filename, 'w') as f:
+            f['bin_edges'] = np.linspace(300, 10000, 200)
+            f['t'] = np.linspace(300, 2000, 8)
+            p = f.create_dataset('p', data=np.logspace(-4, 2, 6))
+            p.attrs['units'] = 'bar'
+            f['xsecarr'] = np.random.rand(6, 8, 200) + 0.1
+            f['mol_name'] = 'testMol'
+
+    def tearDown(self):
+        import os
+        os.remove(self.filename)
+
+    def test_block_cache(self):
+        from taurex.opacity.hdf5opacity import HDF5Opacity, BlockCachedGrid
+        in_memory = HDF5Opacity(self.filename, in_memory=True)
+        # Disabled by default
+        streamed = HDF5Opacity(self.filename, in_memory=False)
+        self.assertNotIsInstance(streamed.xsecGrid, BlockCachedGrid)
+        streamed = HDF5Opacity(self.filename, in_memory=False,
+                               block_cache_bytes=2**20)
+        grid = streamed.xsecGrid
+
+        wngrid = np.linspace(1000, 5000, 50)
+        for temperature, pressure in [(400.0, 1e3), (1234.5, 1e6),
+                                      (2500.0, 1e8), (400.0, 1e3)]:
+            np.testing.assert_equal(
+                streamed.opacity(temperature, pressure, wngrid),
+                in_memory.opacity(temperature, pressure, wngrid))
+
+        info = grid.cache_info()
+        self.assertEqual(info['misses'], 4 + 4 + 1)
+        self.assertEqual(info['hits'], 4)
+
+    def test_bounded(self):
+        from taurex.opacity.hdf5opacity import HDF5Opacity
+        streamed = HDF5Opacity(self.filename, in_memory=False,
+                               block_cache_bytes=3*200*8)
+        for t_idx in range(8):
+            streamed.xsecGrid[0, t_idx]
+        self.assertEqual(streamed.xsecGrid.cache_info()['blocks'], 3)
+        self.assertLessEqual(streamed.xsecGrid.nbytes, 3*200*8)
+        # Most recently used are kept
+        streamed.xsecGrid[0, 7]
+        self.assertEqual(streamed.xsecGrid.hits, 1)
+
+        # The block cache counts towards the memory budget
+        from taurex.cache import OpacityCache
+        axes_bytes = sum(grid.nbytes for grid in (streamed.wavenumberGrid,
+                                                  streamed.temperatureGrid,
+                                                  streamed.pressureGrid))
+        self.assertEqual(OpacityCache.opacity_nbytes(streamed),
+                         axes_bytes + 3*200*8)
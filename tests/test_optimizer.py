@@ -1,9 +1,44 @@
 import unittest
+import numpy as np
 from taurex.optimizer.optimizer import Optimizer
 from taurex.model import TransmissionModel
+from taurex.model.model import ForwardModel
 from unittest.mock import patch
 
 
+class LinearModel(ForwardModel):
+    """Spectrum of ``scale*wngrid + offset``, negative offsets are invalid"""
+
+    def __init__(self):
+        super().__init__('Linear')
+        self.scale = 1e-6
+        self.offset = 0.0
+        self.add_fittable_param('scale', 'a', self._get_scale,
+                                self._set_scale, 'log', True, [1e-7, 1e-5])
+        self.add_fittable_param('offset', 'b', self._get_offset,
+                                self._set_offset, 'linear', True, [0, 1])
+        self._fitting_parameters = self.fitting_parameters()
+
+    def _get_scale(self):
+        return self.scale
+
+    def _set_scale(self, value):
+        self.scale = value
+
+    def _get_offset(self):
+        return self.offset
+
+    def _set_offset(self, value):
+        self.offset = value
+
+    def model(self, wngrid=None, cutoff_grid=True):
+        from taurex.exceptions import InvalidModelException
+        if self.offset < 0:
+            raise InvalidModelException('Negative offset')
+        native_grid = np.linspace(1000, 10000, 2000)
+        return native_grid, self.scale*native_grid + self.offset, None, None
+
+
 class OptimizerTest(unittest.TestCase):
 
     def test_fit_params(self):
@@ -49,3 +84,33 @@ class OptimizerTest(unittest.TestCase):
 
         self.assertEqual(opt.fit_boundaries[t_index][0], 1000.0)
         self.assertEqual(opt.fit_boundaries[t_index][1], 3000.0)
+
+    def test_chisq_batch(self):
+        from taurex.data.spectrum.array import ArraySpectrum
+        wavelength = np.linspace(1.5, 8.0, 20)
+        observed = ArraySpectrum(np.column_stack(
+            (wavelength, 1e-2 + 1e-3*np.sin(wavelength),
+             np.full(20, 1e-4))))
+        model = LinearModel()
+        opt = Optimizer('test', observed=observed, model=model)
+        opt.compile_params()
+        self.assertEqual(opt.fit_names, ['log_scale', 'offset'])
+
+        params = np.array([[-6.0, 0.0], [-5.5, 1e-3], [-6.0, -1.0],
+                           [-6.5, 2e-3]])
+        data = observed.spectrum
+        datastd = observed.errorBar
+        chisq = opt.chisq_batch(params, data, datastd)
+        self.assertEqual(model.scale, 1e-6)
+        self.assertEqual(model.offset, 0.0)
+
+        expected = [opt.chisq_trans(row, data, datastd) for row in params]
+        np.testing.assert_allclose(chisq, expected, rtol=1e-12)
+        self.assertEqual(chisq[2], 1e100)
+
+        model.offset = 0.0
+        native_grid, spectra, valid = model.model_batch(
+            10**params[:, :1], ['scale'])
+        np.testing.assert_allclose(spectra,
+                                   10**params[:, :1]*native_grid[None, :])
+        self.assertTrue(valid.all())
@@ -40,6 +40,21 @@ class IsoThermalTest(unittest.TestCase):
     def test_compute_profile(self):
         self.tp.profile
 
+    def test_cached_profile(self):
+        profile = self.tp.profile
+        self.assertIs(self.tp.profile, profile)
+
+        # Setting a parameter either way recomputes
+        self.tp.isoTemperature = 200.0
+        self.assertEqual(self.tp.profile[0], 200.0)
+        self.tp['T'] = 300.0
+        self.assertEqual(self.tp.profile[0], 300.0)
+        profile = self.tp.profile
+
+        self.tp.initialize_profile(None, 5, np.ones(5))
+        self.assertIsNot(self.tp.profile, profile)
+        self.assertEqual(self.tp.profile.shape[0], 5)
+
 
 class GuillotTest(unittest.TestCase):
 
@@ -153,6 +168,11 @@ class RodgersTest(unittest.TestCase):
 
         rp.profile
 
+        # Layers set through their generated parameters
+        profile = rp.profile.copy()
+        rp['T_1'] = 1000.0
+        self.assertFalse(np.array_equal(rp.profile, profile))
+
 
 class TemperatureArrayTest(unittest.TestCase):
 
@@ -1,43 +1,208 @@
-
-
-
 import argparse
 import glob
-import h5py
 import os
-import argparse
-import pandas as pd
-def run_conversion(*args):
-    
-    temp,press,f = args[0]
-    df = pd.read_csv(f,delim_whitespace=True,usecols=[1],header=None)
-    return temp,press,f,df[1].values
+import time
+import numpy as np
+
+
+def parse_xsec_file(filename):
+    """
+    Reads an ExoCross ``.xsec`` file in a single vectorized pass
+
+    Returns
+    -------
+    wavenumber: :obj:`array`
+        First column
+
+    xsec: :obj:`array`
+        Second column
+
+    """
+    with open(filename, 'r') as f:
+        data = np.fromstring(f.read(), sep=' ')
+    data = data.reshape(-1, 2)
+    return data[:, 0], data[:, 1]
+
 
+_bin_edges = None
 
 
-def xsec_iterator(xsec_list,sep,t_pos,p_pos):
+def init_worker(bin_edges):
+    """
+    Gives each worker process the wavenumber grid files are checked
+    against, sent once per worker rather than with every file
+    """
+    global _bin_edges
+    _bin_edges = bin_edges
+
+
+def run_conversion(item):
+    """
+    Parses one file in a worker process and checks its wavenumber grid,
+    only the cross-sections are sent back
+
+    Raises
+    ------
+    ValueError
+        If the file has a different wavenumber grid
+    """
+    temp, press, f = item
+    wavenumber, xsec = parse_xsec_file(f)
+    if wavenumber.shape != _bin_edges.shape or \
+            not np.allclose(wavenumber, _bin_edges):
+        raise ValueError('{} has a different wavenumber grid'.format(f))
+    return temp, press, f, xsec
+
+
+def xsec_iterator(xsec_list, sep, t_pos, p_pos):
     import re
     import pathlib
-    regex = re.compile("\d+\.*\d+")
+    regex = re.compile(r"\d+\.*\d+")
     for xsec in xsec_list:
         clean_path = pathlib.Path(xsec).stem
         split = clean_path.split(sep)
 
         T = float(regex.search(split[t_pos]).group(0))
         P = float(regex.search(split[p_pos]).group(0))
-        #split=xsec.split(sep)
-        #T = regex.search(split[t_pos])
-        #P = regex.search(split[p_pos])
-        yield T,P,xsec
-        
-        #float(P.group(0)),float(T.group(0))
-
-
+        yield T, P, xsec
+
+
+def collect_grid(xsec_list, sep, t_pos, p_pos):
+    """
+    Determines the temperature and pressure grid from the filenames and
+    checks every point of the grid has exactly one file
+
+    Raises
+    ------
+    ValueError
+        If points are missing or duplicated
+
+    """
+    items = list(xsec_iterator(xsec_list, sep, t_pos, p_pos))
+    temp_list = np.unique([T for T, P, f in items])
+    press_list = np.unique([P for T, P, f in items])
+
+    seen = {}
+    duplicates = []
+    for T, P, f in items:
+        if (T, P) in seen:
+            duplicates.append((T, P, seen[(T, P)], f))
+        seen[(T, P)] = f
+    missing = [(T, P) for P in press_list for T in temp_list
+               if (T, P) not in seen]
+
+    if duplicates:
+        for T, P, first, second in duplicates:
+            print('Duplicate T={} P={}: {} and {}'.format(T, P, first, second))
+        raise ValueError('{} duplicate grid points'.format(len(duplicates)))
+    if missing:
+        for T, P in missing:
+            print('Missing T={} P={}'.format(T, P))
+        raise ValueError('Grid is incomplete, {} of {} points are '
+                         'missing'.format(len(missing),
+                                          len(temp_list)*len(press_list)))
+    return temp_list, press_list, items
+
+
+def create_output(filename, mol_name, temp_list, press_list, bin_edges,
+                  p_unit, compression=None, compression_level=None,
+                  chunk_size=None):
+    """
+    Creates the output file with a pre-allocated chunked ``xsecarr``
+    dataset and a ``completed`` flag for every grid point
+    """
+    import h5py
+    fd = h5py.File(filename, 'w')
+    fd.create_dataset('bin_edges', data=bin_edges, shape=bin_edges.shape)
+    fd.create_dataset('mol_name', data=mol_name)
+    fd.create_dataset('key_iso_II', data='exocross')
+    press = fd.create_dataset('p', data=press_list)
+    press.attrs['units'] = p_unit
+    fd.create_dataset('t', data=temp_list)
+
+    xsecarr_shape = (len(press_list), len(temp_list), len(bin_edges))
+    chunk_size = min(chunk_size or len(bin_edges), len(bin_edges))
+    compression_opts = compression_level if compression == 'gzip' else None
+    fd.create_dataset('xsecarr', dtype=np.float64, shape=xsecarr_shape,
+                      chunks=(1, 1, chunk_size), compression=compression,
+                      compression_opts=compression_opts,
+                      shuffle=compression is not None)
+    fd.create_dataset('completed', dtype=bool, shape=xsecarr_shape[:2],
+                      fillvalue=False)
+    return fd
+
+
+def open_for_resume(filename, temp_list, press_list, bin_edges):
+    """
+    Reopens a partially converted file, checking it was created for
+    the same grid
+    """
+    import h5py
+    fd = h5py.File(filename, 'r+')
+    if 'completed' not in fd:
+        fd.close()
+        raise ValueError('{} cannot be resumed'.format(filename))
+    if not np.array_equal(fd['t'][:], temp_list) or \
+            not np.array_equal(fd['p'][:], press_list) or \
+            not np.array_equal(fd['bin_edges'][:], bin_edges):
+        fd.close()
+        raise ValueError('{} was created for a different grid'.format(
+            filename))
+    return fd
+
+
+def convert(fd, items, temp_list, press_list, bin_edges, num_workers=2,
+            max_pending=None):
+    """
+    Parses files in a process pool and writes each into its place in the
+    output as soon as it arrives. At most ``max_pending`` files are
+    parsed or waiting to be written at any time so memory use is bounded
+    regardless of the number of files.
+    """
+    from concurrent.futures import ProcessPoolExecutor, wait, \
+        FIRST_COMPLETED
+    xsecarr = fd['xsecarr']
+    completed = fd['completed']
+    done = completed[...]
+
+    todo = [(T, P, f) for T, P, f in items
+            if not done[press_list.searchsorted(P),
+                        temp_list.searchsorted(T)]]
+    num_files = len(items)
+    files_process = num_files - len(todo)
+    if files_process > 0:
+        print('Resuming, {}/{} already converted'.format(files_process,
+                                                         num_files))
+    max_pending = max_pending or 2*num_workers
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(num_workers, initializer=init_worker,
+                             initargs=(bin_edges,)) as executor:
+        pending = set()
+        todo = iter(todo)
+        while True:
+            for item in todo:
+                pending.add(executor.submit(run_conversion, item))
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                T, P, f, xsec = future.result()
+                temp_idx = temp_list.searchsorted(T)
+                press_idx = press_list.searchsorted(P)
+                xsecarr[press_idx, temp_idx, :] = xsec
+                # Only mark as complete once written
+                completed[press_idx, temp_idx] = True
+                fd.flush()
+                files_process += 1
+                elapsed = time.perf_counter() - start
+                print('Converted {}/{} {} ({:.1f} s)'.format(
+                    files_process, num_files, f, elapsed))
 
 
 def main():
-    import numpy as np
-    import concurrent.futures
     parser = argparse.ArgumentParser(description='Exocross-to-hdf5-converter')
     parser.add_argument("-d", "--xsec-dir",dest='dir',type=str,required=True,help="directory containing Exocross xsec outputs")
     parser.add_argument("-s","--seperator",dest="sep",type=str,default="_",help="seperator to split filename string by")
@@ -47,93 +212,64 @@ def main():
 
     parser.add_argument("-u","--pressure-unit",dest="p_unit",type=str,default="bar",help="units for pressure (see astropy.units for compatable names")
     parser.add_argument("-o","--output",dest="output",type=str,required=True,help="Output filename")
-    parser.add_argument("-n","--num-threads",dest="nthreads",type=int,default=2,help="number of cores to use in conversion")
+    parser.add_argument("-n","--num-threads",dest="nthreads",type=int,default=2,help="number of processes to use in conversion")
+    parser.add_argument("--max-pending",dest="max_pending",type=int,default=None,help="Maximum number of files held in memory at once, defaults to twice the number of processes")
+    parser.add_argument("-z","--compression",dest="compression",type=str,default=None,choices=['gzip','lzf'],help="(Optional) Compress the cross-sections")
+    parser.add_argument("--compression-level",dest="compression_level",type=int,default=4,help="gzip compression level")
+    parser.add_argument("--chunk-size",dest="chunk_size",type=int,default=None,help="Wavenumber points per HDF5 chunk, defaults to the full grid")
+    parser.add_argument("-r","--resume",dest="resume",action='store_true',default=False,help="Resume an interrupted conversion into an existing output")
+    parser.add_argument("--mmap",dest="mmap",action='store_true',default=False,help="Also write the memory-mappable .mmap format")
     args=parser.parse_args()
 
-    xsec_list = glob.glob(os.path.join(args.dir,'*.xsec'))
-    
+    xsec_list = sorted(glob.glob(os.path.join(args.dir,'*.xsec')))
+    if len(xsec_list) == 0:
+        raise FileNotFoundError('No .xsec files found in {}'.format(args.dir))
+
     mol_name = args.mol
     if args.mol is None:
         import pathlib
         mol_name = pathlib.Path(xsec_list[0]).stem.split(args.sep)[0]
-    
-    
-    print('Molecule is {}'.format(mol_name))
 
-    #Collect temperature and pressure list
-    temp_list = []
-    press_list = []
-    #Get the temperature list and pressure list
-    for T,P,f in xsec_iterator(xsec_list,args.sep,args.T,args.P):
-        temp_list.append(T)
-        press_list.append(P)
+    print('Molecule is {}'.format(mol_name))
 
-    temp_list = np.sort(np.array(list(set(temp_list))))
-    press_list = np.sort(np.array(list(set(press_list))))
+    temp_list, press_list, items = collect_grid(xsec_list, args.sep, args.T, args.P)
 
     print('Found temperatures:')
     print(temp_list)
     print('Found pressures:')
     print(press_list)
 
-
     #Now get the bin edges
-    bin_edges = np.loadtxt(xsec_list[0],usecols=(0)).reshape(-1)
+    bin_edges, _ = parse_xsec_file(xsec_list[0])
 
     print ('Determined bin edges: {}'.format(bin_edges))
-
-    xsecarr_shape = (len(press_list),len(temp_list),len(bin_edges))
-    print ('Cross-section grid is shaped {}'.format(xsecarr_shape))
-    #Now lets write it!!!
-    print('creating file ',args.output)
-
-    num_files = len(xsec_list)
-    files_process= 0
-    with h5py.File(args.output,'w') as fd:
-        import concurrent
-        fd.create_dataset('bin_edges',data=bin_edges,shape=bin_edges.shape)
-        fd.create_dataset('mol_name',data=mol_name)
-        fd.create_dataset('key_iso_II',data='exocross')
-        press = fd.create_dataset('p',data=press_list)
-        press.attrs['units'] = args.p_unit
-        fd.create_dataset('t',data=temp_list)
-
-        xsecarr = fd.create_dataset('xsecarr',dtype=np.float64,shape=xsecarr_shape)
-
-        with concurrent.futures.ProcessPoolExecutor(args.nthreads) as executor: 
-            for T,P,f,xsec in executor.map(run_conversion,  xsec_iterator(xsec_list,args.sep,args.T,args.P)):
-
-                files_process+=1
-                print('Reading in {}/{}'.format(files_process,num_files)) 
-                temp_idx = temp_list.searchsorted(T)
-                press_idx = press_list.searchsorted(P)
-                xsecarr[press_idx,temp_idx,:] =  xsec
-
-        # for T,P,f in xsec_iterator(xsec_list,args.sep,args.T,args.P):
-        #     files_process+=1
-        #     print('Reading in {}/{}'.format(files_process,num_files)) 
-        #     temp_idx = temp_list.searchsorted(T)
-        #     press_idx = press_list.searchsorted(P)
-        #     df = pd.read_csv(f,delim_whitespace=True,usecols=[1],header=None)
-        #     #return temp,press,f,df[1].values
-        #     xsecarr[press_idx,temp_idx,:] = df[1].values
-            
-
-
-
-    
-    
-
-
-
-
-
+    print ('Cross-section grid is shaped {}'.format((len(press_list),len(temp_list),len(bin_edges))))
+
+    if args.resume and os.path.exists(args.output):
+        print('resuming file ',args.output)
+        fd = open_for_resume(args.output, temp_list, press_list, bin_edges)
+    else:
+        print('creating file ',args.output)
+        fd = create_output(args.output, mol_name, temp_list, press_list, bin_edges,
+                           args.p_unit, compression=args.compression,
+                           compression_level=args.compression_level,
+                           chunk_size=args.chunk_size)
+
+    with fd:
+        convert(fd, items, temp_list, press_list, bin_edges,
+                num_workers=args.nthreads, max_pending=args.max_pending)
+        if not fd['completed'][...].all():
+            raise RuntimeError('Conversion is incomplete, rerun with --resume')
+
+    if args.mmap:
+        from taurex.opacity.hdf5opacity import HDF5Opacity
+        from taurex.opacity.mmapopacity import convert_to_mmap
+        output = os.path.splitext(args.output)[0] + '.mmap'
+        print('Writing memory-mappable copy to', output)
+        opacity = HDF5Opacity(args.output, in_memory=False)
+        convert_to_mmap(opacity, output)
+        opacity._spec_dict.close()
 
 
 if __name__=="__main__":
     main()
-
-
-
-
-
@@ -0,0 +1,58 @@
+import time
+import numpy as np
+
+
+def run_model(pp, dtype, repeats):
+    from taurex.cache import OpacityCache
+    OpacityCache().set_dtype(dtype)
+    model = pp.generate_appropriate_model()
+    model.build()
+
+    # First call includes loading and jit compilation
+    native_grid, spectrum = model.model()[:2]
+
+    start = time.perf_counter()
+    for i in range(repeats):
+        model.model()
+    elapsed = (time.perf_counter() - start)/repeats
+
+    return native_grid, spectrum, elapsed
+
+
+def accuracy_report(reference, test):
+    abs_diff = np.abs(test - reference)
+    rel_diff = abs_diff/np.abs(reference)
+    return {'max_abs': abs_diff.max(),
+            'max_rel': rel_diff.max(),
+            'mean_rel': rel_diff.mean(),
+            'rms_rel': np.sqrt(np.mean(rel_diff**2))}
+
+
+if __name__ == "__main__":
+    import argparse
+    from taurex.parameter import ParameterParser
+    parser = argparse.ArgumentParser(description='Compares the spectrum of a model using single '
+                                                 'and double precision cross-sections')
+    parser.add_argument("-i", "--input", dest="input_file", type=str, required=True,
+                        help="Input par file of the reference model")
+    parser.add_argument("-n", "--repeats", dest="repeats", type=int, default=10,
+                        help="Number of model evaluations to time")
+    args = parser.parse_args()
+
+    pp = ParameterParser()
+    pp.read(args.input_file)
+    pp.setup_globals()
+
+    wngrid, spec64, time64 = run_model(pp, 'float64', args.repeats)
+    _, spec32, time32 = run_model(pp, 'float32', args.repeats)
+
+    report = accuracy_report(spec64, spec32)
+
+    print('Spectrum points:        ', wngrid.shape[0])
+    print('Max absolute difference:', report['max_abs'])
+    print('Max relative difference:', report['max_rel'])
+    print('Mean relative difference:', report['mean_rel'])
+    print('RMS relative difference:', report['rms_rel'])
+    print('float64 time per model:  {:.4f} s'.format(time64))
+    print('float32 time per model:  {:.4f} s'.format(time32))
+    print('Speedup:                 {:.2f}x'.format(time64/time32))
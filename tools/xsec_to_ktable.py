@@ -0,0 +1,51 @@
+import pathlib
+import numpy as np
+
+
+def log_bin_edges(wn_min, wn_max, resolution):
+    """Bin edges in wavenumber with constant resolving power"""
+    nbins = int(np.ceil(resolution*np.log(wn_max/wn_min)))
+    return np.geomspace(wn_min, wn_max, nbins + 1)
+
+
+if __name__ == "__main__":
+    import argparse
+    from xsec_to_mmap import load_opacity
+    from taurex.opacity.ktableopacity import build_ktable, KTableOpacity
+    parser = argparse.ArgumentParser(description='xsec-to-ktable-converter')
+    parser.add_argument("-i", "--input", dest="input", type=str, nargs='+', required=True,
+                        help="HDF5 or pickle cross-section file(s) to convert")
+    parser.add_argument("-o", "--output-dir", dest="output", type=str, default=None,
+                        help="Output directory, defaults to the directory of each input")
+    parser.add_argument("-R", "--resolution", dest="resolution", type=float, required=True,
+                        help="Resolving power of the bins")
+    parser.add_argument("-w", "--wn-range", dest="wn_range", type=float, nargs=2, default=None,
+                        help="Wavenumber range of the bins in cm-1, defaults to that of the "
+                             "first input")
+    parser.add_argument("-g", "--ngauss", dest="ngauss", type=int, default=20,
+                        help="Number of g-points in each bin")
+    args = parser.parse_args()
+
+    bin_edges = None
+    if args.wn_range is not None:
+        bin_edges = log_bin_edges(*args.wn_range, args.resolution)
+
+    for filename in args.input:
+        path = pathlib.Path(filename)
+        out_dir = pathlib.Path(args.output) if args.output else path.parent
+        output = str(out_dir / (path.stem + '.ktable.h5'))
+
+        opacity = load_opacity(filename)
+        if bin_edges is None:
+            # Share the bins between all molecules
+            wngrid = opacity.wavenumberGrid
+            bin_edges = log_bin_edges(max(wngrid.min(), 1.0), wngrid.max(),
+                                      args.resolution)
+
+        print('Building k-table for', opacity.moleculeName, 'from', filename,
+              'with', bin_edges.shape[0] - 1, 'bins to', output)
+        build_ktable(opacity, bin_edges, output, ngauss=args.ngauss)
+
+        ktable = KTableOpacity(output)
+        print('Molecule name is', ktable.moleculeName)
+        print('Grid shape is', ktable.kcoeffGrid.shape)
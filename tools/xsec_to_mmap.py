@@ -0,0 +1,43 @@
+import pathlib
+
+
+def load_opacity(filename):
+    from taurex.opacity.hdf5opacity import HDF5Opacity
+    from taurex.opacity.pickleopacity import PickleOpacity
+
+    if filename.lower().endswith(('.hdf5', '.h5')):
+        return HDF5Opacity(filename, in_memory=False)
+    elif filename.endswith('.pickle'):
+        op = PickleOpacity(filename)
+        op._molecule_name = pathlib.Path(filename).stem.split('.')[0]
+        return op
+    else:
+        raise ValueError('Unsupported opacity file {}'.format(filename))
+
+
+if __name__ == "__main__":
+    import argparse
+    from taurex.opacity.mmapopacity import convert_to_mmap, MMapOpacity
+    parser = argparse.ArgumentParser(description='xsec-to-mmap-converter')
+    parser.add_argument("-i", "--input", dest="input", type=str, nargs='+', required=True,
+                        help="HDF5 or pickle cross-section file(s) to convert")
+    parser.add_argument("-o", "--output-dir", dest="output", type=str, default=None,
+                        help="Output directory, defaults to the directory of each input")
+    parser.add_argument("-f", "--float32", dest="float32", action='store_true', default=False,
+                        help="Store cross-sections in single precision")
+    args = parser.parse_args()
+
+    dtype = 'float32' if args.float32 else None
+
+    for filename in args.input:
+        path = pathlib.Path(filename)
+        out_dir = pathlib.Path(args.output) if args.output else path.parent
+        output = str(out_dir / (path.stem + '.mmap'))
+
+        opacity = load_opacity(filename)
+        print('Converting', opacity.moleculeName, 'from', filename, 'to', output)
+        convert_to_mmap(opacity, output, dtype=dtype)
+
+        converted = MMapOpacity(output)
+        print('Molecule name is', converted.moleculeName)
+        print('Grid shape is', converted.xsecGrid.shape)